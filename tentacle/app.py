@@ -1,16 +1,20 @@
 """Main App Window."""
 
+import os
 import logging
 
 from PyQt5.QtWidgets import (
     QMainWindow, QTabWidget, QStatusBar, QLabel, QMenu, QPushButton
 )
-from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtCore import Qt, QPoint, QTimer
 
-from tentacle.client import DataModel, FileModel
+from tentacle.client import (
+    DataModel, FileModel, LayerLoader, MetaCache, Snapshot, ThumbCache,
+    Uploader
+)
 from tentacle.ui import (
     MoveWidget, FilesWidget, JobWidget, TempWidget, GCodeWidget,
-    CameraWidget, SerialWidget, ToolWidget
+    CameraWidget, SerialWidget, ToolWidget, RenderScheduler
 )
 from .cmds import Commands
 
@@ -44,6 +48,9 @@ class App(QMainWindow):
         self._setup_tabs()
         self.setCentralWidget(self.table_widget)
 
+        self._setup_snapshot()
+        self._octo_client.start()
+
         self._screen_no = 0
 
     def keyPressEvent(self, event):
@@ -91,6 +98,11 @@ class App(QMainWindow):
         """Handle close event of Window."""
         logging.info("closing app")
         self._octo_client.stop()
+        self._file_model.stop()
+        self._thumbs.stop()
+        self._uploader.stop()
+        self._layers.stop()
+        self._save_snapshot(True)
         event.accept()
         logging.info("done closing app")
 
@@ -102,11 +114,96 @@ class App(QMainWindow):
         self._data_model.disconnected.connect(self._status_bar.showMessage)
         self._data_model.updateState.connect(self._l_status.setText)
         self._data_model.waitTemp.connect(self._wait_temp)
-        self._file_model = FileModel()
+        self._data_model.updateStale.connect(self._on_stale)
+        self._file_model = FileModel(self._setup_meta_cache())
         self._file_model.attach(octo_client)
+        self._file_model.updateStale.connect(self._on_stale)
         self._data_model.files = self._file_model
+        self._data_model.thumbs = self._setup_thumbs(octo_client)
+        self._uploader = Uploader(octo_client)
+        self._data_model.uploader = self._uploader
+        self._data_model.layers = self._setup_layers(octo_client)
+        self._data_model.render = self._setup_render()
+        self._data_model.updateBusyFiles.connect(
+            self._file_model.prefetch_meta_list)
         self._octo_client.error.connect(self._status_bar.showMessage)
-        self._octo_client.start()
+
+    def _get_cache_dir(self):
+        if 'cache' in self.cfg and 'dir' in self.cfg['cache']:
+            return os.path.expanduser(self.cfg['cache']['dir'])
+
+    def _setup_meta_cache(self):
+        cache_dir = self._get_cache_dir()
+        if not cache_dir:
+            return None
+        cfg = self.cfg['cache']
+        max_entries = int(cfg.get('meta_entries', 1000))
+        file_name = os.path.join(cache_dir, "meta.json")
+        meta_cache = MetaCache(file_name, max_entries)
+        meta_cache.load()
+        return meta_cache
+
+    def _setup_thumbs(self, octo_client):
+        cache_dir = self._get_cache_dir()
+        max_disk = 2000
+        if cache_dir:
+            cache_dir = os.path.join(cache_dir, "thumbs")
+            max_disk = int(self.cfg['cache'].get('thumb_entries', max_disk))
+        self._thumbs = ThumbCache(octo_client, cache_dir, max_disk=max_disk)
+        return self._thumbs
+
+    def _setup_layers(self, octo_client):
+        cache_dir = self._get_cache_dir()
+        if cache_dir:
+            cache_dir = os.path.join(cache_dir, "gcode")
+        self._layers = LayerLoader(octo_client, cache_dir)
+        return self._layers
+
+    def _setup_render(self):
+        fps = 15
+        if 'app' in self.cfg:
+            fps = float(self.cfg['app'].get('fps', fps))
+        return RenderScheduler(fps)
+
+    def _setup_snapshot(self):
+        self._snapshot = None
+        cache_dir = self._get_cache_dir()
+        if not cache_dir:
+            return
+        cfg = self.cfg['cache']
+        interval = float(cfg.get('snapshot_interval', 60))
+        file_name = os.path.join(cache_dir, "snapshot.json")
+        self._snapshot = Snapshot(file_name, interval)
+        # warm start with last known state
+        data = self._snapshot.load()
+        self._snapshot_data = data or {}
+        if data:
+            if 'files' in data:
+                self._file_model.restore_snapshot(data['files'])
+            if 'model' in data:
+                self._data_model.restore_snapshot(data['model'])
+        # periodic save. rate limit is done by snapshot itself
+        self._snapshot_timer = QTimer(self)
+        self._snapshot_timer.timeout.connect(self._save_snapshot)
+        self._snapshot_timer.start(int(interval * 1000))
+
+    def _save_snapshot(self, force=False):
+        self._file_model.save_meta_cache(force)
+        if not self._snapshot:
+            return
+        # stale parts keep their restored state
+        data = self._snapshot_data
+        if not self._file_model.is_stale():
+            data['files'] = self._file_model.get_snapshot()
+        if not self._data_model.is_stale():
+            data['model'] = self._data_model.get_snapshot()
+        self._snapshot.save(data, force)
+
+    def _on_stale(self, _):
+        if self._data_model.is_stale() or self._file_model.is_stale():
+            self._status_bar.showMessage("Showing cached data...")
+        else:
+            self._status_bar.clearMessage()
 
     def _setup_tabs(self):
         self._tab_widgets = {}
@@ -119,6 +216,20 @@ class App(QMainWindow):
             self._tab_widgets[name] = w
             self.table_widget.addTab(w, name)
         self.table_widget.setCurrentWidget(self._tab_widgets["Job"])
+        # only the visible tab keeps its display up to date
+        self._cur_tab = self.table_widget.currentWidget()
+        for w in self._tab_widgets.values():
+            if w is not self._cur_tab and hasattr(w, "suspend"):
+                w.suspend()
+        self.table_widget.currentChanged.connect(self._on_tab_changed)
+
+    def _on_tab_changed(self, _):
+        w = self.table_widget.currentWidget()
+        if hasattr(self._cur_tab, "suspend"):
+            self._cur_tab.suspend()
+        self._cur_tab = w
+        if hasattr(w, "resume"):
+            w.resume()
 
     def _setup_status(self):
         self._status_bar = QStatusBar()
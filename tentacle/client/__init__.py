@@ -2,11 +2,23 @@
 
 from .model import (  # noqa: F401
     JobData, ProgressData, TempData,
-    DataModel
+    DataModel, heater_sort_key, heater_tool_no
 )
 from .files import (  # noqa: F401
     FileBase, FileDir, FileRoot, FileGCode,
     FileModel
 )
+from .analyzer import LocalAnalyzer  # noqa: F401
+from .fetch import MetaFetcher  # noqa: F401
+from .fileindex import FileIndex  # noqa: F401
+from .layers import LayerLoader  # noqa: F401
+from .metacache import FileMeta, MetaCache  # noqa: F401
 from .octo import OctoClient  # noqa: F401
 from .cam import CamClient  # noqa: F401
+from .mjpeg import MJPEGParser, parse_boundary  # noqa: F401
+from .snapshot import Snapshot  # noqa: F401
+from .thumbs import ThumbCache  # noqa: F401
+from .upload import Uploader  # noqa: F401
+from .temphist import (  # noqa: F401
+    TempRing, TempBucketRing, TempSpanRing, TempHistory
+)
@@ -0,0 +1,125 @@
+"""Run the local G-code analyzer in a separate process."""
+
+import collections
+import json
+import logging
+import os
+import sys
+
+from PyQt5.QtCore import QObject, QProcess, QProcessEnvironment, pyqtSignal
+
+import tentacle
+
+
+class LocalAnalyzer(QObject):
+    """Analyze files of OctoPrint locally when its analysis is missing.
+
+    Files are analyzed one at a time by a ``python -m tentacle.gcode``
+    process that streams the file from the server, so neither the GUI
+    nor the OctoPrint host are loaded with it.
+    """
+
+    # path, gcodeAnalysis like dict or None
+    analyzed = pyqtSignal(str, object)
+
+    def __init__(self, client, max_queue=16):
+        """Create analyzer for given OctoClient."""
+        super().__init__()
+        self._client = client
+        self._max_queue = max_queue
+        self._queue = collections.deque()
+        self._process = None
+        self._path = None
+
+    def is_available(self):
+        """Return True if files can be analyzed."""
+        return bool(self._client.get_download_url(""))
+
+    def is_pending(self, path):
+        """Return True if path is queued or analyzed right now."""
+        return path == self._path or path in self._queue
+
+    def analyze(self, path):
+        """Queue path for analysis. Return False if not possible."""
+        if not self.is_available():
+            return False
+        if self.is_pending(path):
+            return True
+        if len(self._queue) >= self._max_queue:
+            # the oldest request is the least interesting one
+            dropped = self._queue.popleft()
+            self.analyzed.emit(dropped, None)
+        self._queue.append(path)
+        self._start_next()
+        return True
+
+    def cancel(self, path):
+        """Drop a queued or running analysis of path."""
+        if path == self._path:
+            self._kill()
+            self._start_next()
+        elif path in self._queue:
+            self._queue.remove(path)
+
+    def stop(self):
+        """Drop queue and kill a running analysis."""
+        self._queue.clear()
+        self._kill(1000)
+
+    def _kill(self, wait=0):
+        # the killed process is deleted by _on_finished once it exited
+        proc = self._process
+        if proc:
+            self._process = None
+            self._path = None
+            proc.kill()
+            if wait:
+                proc.waitForFinished(wait)
+
+    def _start_next(self):
+        if self._process or not self._queue:
+            return
+        path = self._queue.popleft()
+        url = self._client.get_download_url(path)
+        logging.info("analyze: start %s", path)
+        env = QProcessEnvironment.systemEnvironment()
+        api_key = self._client.get_api_key()
+        if api_key:
+            env.insert("TENTACLE_API_KEY", api_key)
+        # make sure our package is found when run from source tree
+        base_dir = os.path.dirname(os.path.dirname(tentacle.__file__))
+        py_path = env.value("PYTHONPATH")
+        if py_path:
+            base_dir += os.pathsep + py_path
+        env.insert("PYTHONPATH", base_dir)
+        proc = QProcess(self)
+        proc.setProcessEnvironment(env)
+        proc.finished.connect(self._on_finished)
+        self._process = proc
+        self._path = path
+        proc.start(sys.executable, ["-m", "tentacle.gcode", url])
+
+    def _on_finished(self, code, status):
+        proc = self.sender()
+        if proc is not self._process:
+            # killed by cancel or stop
+            proc.deleteLater()
+            return
+        path = self._path
+        self._process = None
+        self._path = None
+        result = None
+        if status == QProcess.NormalExit and code == 0:
+            out = bytes(proc.readAllStandardOutput())
+            try:
+                result = json.loads(out.decode("utf-8"))
+            except ValueError as e:
+                logging.error("analyze: %s: invalid result: %s", path, e)
+        else:
+            err = bytes(proc.readAllStandardError()).decode("utf-8", "replace")
+            logging.error("analyze: %s: failed (%d): %s", path, code,
+                          err.strip())
+        proc.deleteLater()
+        logging.info("analyze: done %s", path)
+        self.analyzed.emit(path, result)
+        self._start_next()
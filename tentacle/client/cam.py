@@ -7,6 +7,8 @@ import urllib.parse
 
 from PyQt5.QtCore import QObject, pyqtSignal, QThread
 
+from .mjpeg import MJPEGParser, parse_boundary
+
 
 class CamWorker(QThread):
     """Worker Thread of camera capture."""
@@ -57,34 +59,15 @@ class CamWorker(QThread):
 
     def _data_loop(self, reader):
         self._reset_frame_time()
-        while self._stay:
-            # read header
-            size = self._parse_header(reader)
-            # data
-            jpeg_data = reader.read(size)
-            # read line after data
-            reader.readline()
-            self._client.jpegData.emit(jpeg_data)
+        boundary = parse_boundary(reader.getheader("Content-Type"))
+        parser = MJPEGParser(boundary)
+        for frame in parser.read_frames(reader):
+            if not self._stay:
+                return
+            # the only copy: the parser reuses its buffer for the next one
+            self._client.jpegData.emit(bytes(frame))
             self._update_frame_time()
-
-    def _parse_header(self, reader):
-        # parse header
-        def get():
-            return reader.readline().strip().decode("utf-8")
-        # now the header entries. size needs to be found.
-        size = None
-        while True:
-            line = get()
-            if line == "":
-                break
-            elif line.startswith("Content-Length:"):
-                pair = line.split()
-                size = int(pair[1])
-        # got a size?
-        if not size:
-            raise IOError("multi: no size found!")
-        else:
-            return size
+        raise IOError("cam: end of stream")
 
     def _reset_frame_time(self):
         self._sum_frame_time = 0.0
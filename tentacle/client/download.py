@@ -0,0 +1,63 @@
+"""Download files from the OctoPrint server."""
+
+import logging
+import http.client
+import urllib.parse
+
+
+def _connect(url, timeout):
+    if url.scheme == "https":
+        return http.client.HTTPSConnection(url.netloc, timeout=timeout)
+    return http.client.HTTPConnection(url.netloc, timeout=timeout)
+
+
+def open_download(url, api_key=None, start=0, end=None, timeout=10.0):
+    """Start a download and return (connection, response).
+
+    A byte range [start, end) is requested if start or end is given.
+    The caller reads the response and closes the connection. Raises
+    IOError on failure.
+    """
+    url = urllib.parse.urlparse(url)
+    req = url.path
+    if url.query:
+        req += "?" + url.query
+    headers = {}
+    if api_key:
+        headers["X-Api-Key"] = api_key
+    if start or end is not None:
+        last = "" if end is None else str(end - 1)
+        headers["Range"] = "bytes=%d-%s" % (start, last)
+    con = _connect(url, timeout)
+    try:
+        con.request("GET", req, headers=headers)
+        resp = con.getresponse()
+    except (IOError, http.client.HTTPException) as e:
+        con.close()
+        raise IOError("download %s: %s" % (req, e))
+    if resp.status not in (200, 206):
+        con.close()
+        raise IOError("download %s: %d %s" % (req, resp.status, resp.reason))
+    if start and resp.status == 200:
+        con.close()
+        raise IOError("download %s: range not supported" % req)
+    return con, resp
+
+
+def download_range(url, api_key=None, start=0, end=None, timeout=10.0):
+    """Return bytes [start, end) of a download.
+
+    If the server ignores the range the body is cut after end.
+    """
+    con, resp = open_download(url, api_key, start, end, timeout)
+    try:
+        if end is None:
+            data = resp.read()
+        else:
+            data = resp.read(end - start)
+    except (IOError, http.client.HTTPException) as e:
+        raise IOError("download: %s" % e)
+    finally:
+        con.close()
+    logging.debug("download: %s: %d bytes", url, len(data))
+    return data
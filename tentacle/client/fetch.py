@@ -0,0 +1,129 @@
+"""Fetch file infos in the background."""
+
+import logging
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class FetchTask(QRunnable):
+    """A worker task that retrieves the info of a single file."""
+
+    def __init__(self, fetcher, path):
+        """Create task for given path."""
+        super().__init__()
+        self._fetcher = fetcher
+        self._path = path
+
+    def run(self):
+        """Run the blocking REST call in a pool thread."""
+        try:
+            info = self._fetcher.get_client().file_info(self._path)
+        except IOError as e:
+            logging.error("fetch: %s: %s", self._path, e)
+            info = None
+        except Exception as e:  # pylint: disable=broad-except
+            # never leak out of the pool thread and leave path pending
+            logging.error("fetch: %s: unexpected error: %r", self._path, e)
+            info = None
+        self._fetcher.taskDone.emit(self._path, info)
+
+
+class FolderTask(QRunnable):
+    """A worker task that retrieves the direct children of a folder."""
+
+    def __init__(self, fetcher, path):
+        """Create task for given folder path."""
+        super().__init__()
+        self._fetcher = fetcher
+        self._path = path
+
+    def run(self):
+        """Run the blocking REST call in a pool thread."""
+        try:
+            info = self._fetcher.get_client().folder_info(self._path)
+        except IOError as e:
+            logging.error("fetch: %s: %s", self._path, e)
+            info = None
+        except Exception as e:  # pylint: disable=broad-except
+            # never leak out of the pool thread and leave path pending
+            logging.error("fetch: %s: unexpected error: %r", self._path, e)
+            info = None
+        self._fetcher.folderDone.emit(self._path, info)
+
+
+class MetaFetcher(QObject):
+    """Fetch file infos with a small pool of worker threads.
+
+    Requests for a path that is already in flight are merged. Results
+    are delivered in the GUI thread via the fetchedInfo signal.
+    """
+
+    # path, info dict or None
+    fetchedInfo = pyqtSignal(str, object)
+    fetchedFolder = pyqtSignal(str, object)
+    # internal: emitted by pool threads
+    taskDone = pyqtSignal(str, object)
+    folderDone = pyqtSignal(str, object)
+
+    # milliseconds to wait for running requests on stop
+    stop_timeout = 5000
+
+    def __init__(self, client, num_workers=2):
+        """Create fetcher for given OctoClient."""
+        super().__init__()
+        self._client = client
+        self._pending = set()
+        self._pending_folders = set()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(num_workers)
+        self.taskDone.connect(self._on_task_done)
+        self.folderDone.connect(self._on_folder_done)
+
+    def get_client(self):
+        """Return the OctoClient used for fetching."""
+        return self._client
+
+    def is_pending(self, path):
+        """Return True if path is being fetched."""
+        return path in self._pending
+
+    def fetch(self, path):
+        """Start fetching path. Return False if already in flight."""
+        if path in self._pending:
+            logging.debug("fetch: already pending: %s", path)
+            return False
+        logging.info("fetch: start: %s", path)
+        self._pending.add(path)
+        self._pool.start(FetchTask(self, path))
+        return True
+
+    def fetch_folder(self, path):
+        """Start fetching folder. Return False if already in flight."""
+        if path in self._pending_folders:
+            return False
+        logging.info("fetch: start folder: %s", path)
+        self._pending_folders.add(path)
+        self._pool.start(FolderTask(self, path))
+        return True
+
+    def stop(self):
+        """Drop queued requests and wait a while for running ones."""
+        self._pool.clear()
+        if not self._pool.waitForDone(self.stop_timeout):
+            logging.error("fetch: requests still running on stop")
+        self._pending.clear()
+        self._pending_folders.clear()
+
+    def _on_task_done(self, path, info):
+        if path not in self._pending:
+            return
+        self._pending.discard(path)
+        logging.info("fetch: done: %s", path)
+        self.fetchedInfo.emit(path, info)
+
+    def _on_folder_done(self, path, info):
+        if path not in self._pending_folders:
+            return
+        self._pending_folders.discard(path)
+        logging.info("fetch: done folder: %s", path)
+        self.fetchedFolder.emit(path, info)
@@ -0,0 +1,144 @@
+"""Search index over the G-code files of a FileModel."""
+
+
+class FileIndex:
+    """An incrementally maintained search index of G-code files.
+
+    Files are found by a case-insensitive prefix or substring of their
+    name. A search text starting with prefix_anchor is a prefix search.
+    Prefix search uses the sorted name list and substring search scans
+    the table of lower case names, which is faster than keeping a
+    trigram index up to date for the library sizes we see. A sorted
+    list of all files is kept for each sort key so filtered results
+    never need a full sort. Changes to these lists are collected and
+    merged in on the next search, which keeps add and remove cheap
+    during event bursts.
+    """
+
+    sort_keys = ("name", "date", "size", "printed")
+    # search text starting with it only matches the start of names
+    prefix_anchor = "^"
+
+    def __init__(self):
+        """Create an empty index."""
+        self.clear()
+
+    def __len__(self):
+        """Return number of indexed files."""
+        return len(self._nodes)
+
+    def __contains__(self, path):
+        """Check if path is indexed."""
+        return path in self._nodes
+
+    def clear(self):
+        """Remove all files."""
+        # path -> node
+        self._nodes = {}
+        # path -> (lower case name, date, size, last printed)
+        self._keys = {}
+        # paths sorted by each sort key
+        self._sorted = [[] for _ in self.sort_keys]
+        # paths added to each sorted list since it was merged last
+        self._added = [[] for _ in self.sort_keys]
+        self._dirty = [False] * len(self.sort_keys)
+
+    def add(self, path, node):
+        """Add a file or update its keys. Return True if keys changed."""
+        keys = (node.name.lower(), node.date or 0, node.size or 0,
+                node.last_print or 0)
+        self._nodes[path] = node
+        if self._keys.get(path) == keys:
+            return False
+        self._keys[path] = keys
+        for added in self._added:
+            added.append(path)
+        return True
+
+    def remove(self, path):
+        """Remove a file. Return False if it was not indexed."""
+        if self._keys.pop(path, None) is None:
+            return False
+        del self._nodes[path]
+        # removed paths are dropped on the next merge
+        self._dirty = [True] * len(self.sort_keys)
+        return True
+
+    def _get_sorted(self, pos):
+        """Return paths sorted by key pos with pending changes merged."""
+        lst = self._sorted[pos]
+        added = self._added[pos]
+        if not added and not self._dirty[pos]:
+            return lst
+        keys = self._keys
+        lst = [path for path in lst if path in keys]
+        if added:
+            lst.extend(path for path in added if path in keys)
+            added.clear()
+            # sort merges the old run and the new paths. an updated path
+            # shows up twice next to each other then
+            lst.sort(key=lambda p: (keys[p][pos], p))
+            last = None
+            result = []
+            for path in lst:
+                if path != last:
+                    result.append(path)
+                    last = path
+            lst = result
+        self._sorted[pos] = lst
+        self._dirty[pos] = False
+        return lst
+
+    def find_prefix(self, text):
+        """Return paths of files whose name starts with text."""
+        text = text.lower()
+        names = self._get_sorted(0)
+        keys = self._keys
+        # bisect for first name >= text
+        lo = 0
+        hi = len(names)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[names[mid]][0] < text:
+                lo = mid + 1
+            else:
+                hi = mid
+        result = []
+        for path in names[lo:]:
+            if not keys[path][0].startswith(text):
+                break
+            result.append(path)
+        return result
+
+    def find(self, text):
+        """Return paths of files whose name contains text."""
+        text = text.lower()
+        return [path for path, keys in self._keys.items()
+                if text in keys[0]]
+
+    def search(self, text="", sort_key="name", reverse=False):
+        """Return nodes of files containing text sorted by sort_key.
+
+        If text starts with prefix_anchor only names starting with the
+        rest of text are returned.
+        """
+        pos = self.sort_keys.index(sort_key)
+        nodes = self._nodes
+        if not text:
+            result = [nodes[path] for path in self._get_sorted(pos)]
+        else:
+            if text.startswith(self.prefix_anchor):
+                paths = self.find_prefix(text[len(self.prefix_anchor):])
+            else:
+                paths = self.find(text)
+            if len(paths) * 8 < len(nodes):
+                keys = self._keys
+                paths.sort(key=lambda p: (keys[p][pos], p))
+                result = [nodes[path] for path in paths]
+            else:
+                paths = set(paths)
+                result = [nodes[path] for path in self._get_sorted(pos)
+                          if path in paths]
+        if reverse:
+            result.reverse()
+        return result
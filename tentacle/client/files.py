@@ -1,9 +1,16 @@
 """Files Model for OctoClient."""
 
 import logging
+import time
 
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 
+from .analyzer import LocalAnalyzer
+from .fetch import MetaFetcher
+from .fileindex import FileIndex
+from .metacache import FileMeta, MetaCache
+from .model import heater_tool_no
+
 
 class FileBase:
     """File node base class."""
@@ -20,6 +27,12 @@ class FileBase:
         else:
             return self.name
 
+    def get_row(self):
+        """Return position of node in its parent directory."""
+        if self.parent:
+            return self.parent.get_child_row(self.name)
+        return 0
+
 
 class FileDir(FileBase):
     """File system directory."""
@@ -28,16 +41,68 @@ class FileDir(FileBase):
         """Create a file system directory."""
         super().__init__(name)
         self.childs = []
+        # name -> child
+        self._names = {}
+        # name -> position in childs. only rows below _rows_valid are
+        # up to date after a removal and the rest is rebuilt on demand
+        self._rows = {}
+        self._rows_valid = 0
+        # a lazy folder is not loaded until it is opened. its listing
+        # may already be known from a recursive file set
+        self.loaded = True
+        self.pending_items = None
 
     def __repr__(self):
         """Dump dir."""
         return "Dir(%r,%r)" % (self.name, self.childs)
 
     def add_child(self, child):
-        """Add a new child to directory."""
-        self.childs.append(child)
+        """Add a new child to directory. Replace a child of same name."""
+        old = self._names.get(child.name)
+        if old is None:
+            row = len(self.childs)
+            if self._rows_valid == row:
+                self._rows[child.name] = row
+                self._rows_valid = row + 1
+            self.childs.append(child)
+        else:
+            old.parent = None
+            self.childs[self._get_row(old, False)] = child
+        self._names[child.name] = child
         child.parent = self
 
+    def get_child_row(self, name, build=True):
+        """Return position of child with given name or None.
+
+        With build=False outdated rows are searched instead of rebuilt,
+        which is cheaper for removals that outdate the rows again.
+        """
+        child = self._names.get(name)
+        if child is not None:
+            return self._get_row(child, build)
+
+    def _get_row(self, child, build):
+        row = self._rows.get(child.name)
+        if row is not None and row < self._rows_valid:
+            return row
+        valid = self._rows_valid
+        if not build:
+            return self.childs.index(child, valid)
+        # rebuild outdated rows
+        rows = self._rows
+        childs = self.childs
+        for i in range(valid, len(childs)):
+            rows[childs[i].name] = i
+        self._rows_valid = len(childs)
+        return rows[child.name]
+
+    def walk(self):
+        """Yield all nodes below this directory."""
+        for c in self.childs:
+            yield c
+            if isinstance(c, FileDir):
+                yield from c.walk()
+
     def num_children(self):
         """Return number of children."""
         return len(self.childs)
@@ -48,19 +113,41 @@ class FileDir(FileBase):
 
     def get_child_by_name(self, name):
         """Return child with given name or None."""
-        for c in self.childs:
-            if c.name == name:
-                return c
+        return self._names.get(name)
 
     def remove_child_by_name(self, name):
         """Remove a child given by name."""
-        i = 0
-        for c in self.childs:
-            if c.name == name:
-                del self.childs[i]
-                return True
-            i += 1
-        return False
+        child = self._names.pop(name, None)
+        if child is None:
+            return False
+        row = self._get_row(child, False)
+        del self.childs[row]
+        child.parent = None
+        # rows of following children are outdated now
+        self._rows.pop(name, None)
+        if row < self._rows_valid:
+            self._rows_valid = row
+        return True
+
+    def dump(self):
+        """Return a compact dict of this dir for persistence."""
+        if not self.loaded:
+            return {"n": self.name, "c": [], "u": 1}
+        return {"n": self.name, "c": [c.dump() for c in self.childs]}
+
+    def load(self, data):
+        """Add children from a dict created by dump()."""
+        for item in data["c"]:
+            if "c" in item:
+                node = FileDir(item["n"])
+                node.load(item)
+                node.loaded = not item.get("u")
+            else:
+                node = FileGCode(item["n"])
+                node.date = item.get("d")
+                node.size = item.get("s")
+                node.last_print = item.get("p")
+            self.add_child(node)
 
 
 class FileRoot(FileDir):
@@ -77,6 +164,20 @@ class FileRoot(FileDir):
         return "Root(total=%d,free=%d,%r)" % (
             self.total, self.free, self.childs)
 
+    def dump(self):
+        """Return a compact dict of the whole tree for persistence."""
+        data = super().dump()
+        data["t"] = self.total
+        data["f"] = self.free
+        return data
+
+    @classmethod
+    def from_dump(cls, data):
+        """Create a new root from a dict created by dump()."""
+        root = cls(data["t"], data["f"])
+        root.load(data)
+        return root
+
 
 class FileGCode(FileBase):
     """A GCode File."""
@@ -85,25 +186,22 @@ class FileGCode(FileBase):
         """Create a gcode file."""
         super().__init__(name)
         self.meta = None
+        self.date = None
+        self.size = None
+        self.last_print = None
 
     def __repr__(self):
         """Represent gcode file."""
         return "FileGCode(%s, meta=%r)" % (self.name, self.meta)
 
+    def get_key(self):
+        """Return (date, size) key that identifies the file version."""
+        return self.date, self.size
 
-class FileMeta:
-    """File Meta Data."""
-
-    def __init__(self, range_x, range_y, range_z):
-        """Create file meta data."""
-        self.range_x = range_x
-        self.range_y = range_y
-        self.range_z = range_z
-
-    def __repr__(self):
-        """Represent file meta data."""
-        return "Meta(X=%r, Y=%r, Z=%r)" % (
-            self.range_x, self.range_y, self.range_z)
+    def dump(self):
+        """Return a compact dict of this file for persistence."""
+        return {"n": self.name, "d": self.date, "s": self.size,
+                "p": self.last_print}
 
 
 class FileModel(QObject):
@@ -116,33 +214,264 @@ class FileModel(QObject):
     selectedFile = pyqtSignal(str)
     addedFolder = pyqtSignal(str)
     removedFolder = pyqtSignal(str)
-
-    def __init__(self):
+    updateStale = pyqtSignal(bool)
+    # fine-grained tree changes: (dir node, row)
+    beginInsertNode = pyqtSignal(object, int)
+    endInsertNode = pyqtSignal(object, int)
+    beginRemoveNode = pyqtSignal(object, int)
+    endRemoveNode = pyqtSignal(object, int)
+    # contents of a node changed
+    updateNode = pyqtSignal(object)
+    # contents of a lazy folder were loaded: (dir node, num children)
+    beginLoadDir = pyqtSignal(object, int)
+    endLoadDir = pyqtSignal(object, int)
+    # meta data of path became available. None if fetching failed
+    updateMeta = pyqtSignal(str, object)
+
+    def __init__(self, meta_cache=None):
         """Create a new DataModel instance."""
         super().__init__()
         self._selected_file = ""
         self._files = FileRoot(0, 0)
-        self._meta_cache = {}
+        # path -> node of all nodes in tree
+        self._index = {}
+        # search index of all loaded gcode files
+        self._file_index = FileIndex()
+        if meta_cache is None:
+            meta_cache = MetaCache()
+        self._meta_cache = meta_cache
         self._client = None
+        self._fetcher = None
+        self._analyzer = None
+        self._stale = False
+
+    def get_root(self):
+        """Return root of file tree."""
+        return self._files
+
+    def get_node(self, path):
+        """Return node with given path or None."""
+        return self._index.get(path)
+
+    def search(self, text="", sort_key="name", reverse=False):
+        """Return loaded gcode nodes whose name contains text.
+
+        Results are sorted by one of FileIndex.sort_keys. Call
+        load_all_folders() first to include files of lazy folders.
+        """
+        return self._file_index.search(text, sort_key, reverse)
+
+    def _set_root(self, root):
+        self._files = root
+        self._index = {}
+        self._file_index.clear()
+        self._add_to_index(root, "")
+
+    def _add_to_index(self, dir_node, prefix):
+        index = self._index
+        for c in dir_node.childs:
+            path = prefix + c.name
+            index[path] = c
+            if isinstance(c, FileDir):
+                self._add_to_index(c, path + "/")
+            else:
+                self._file_index.add(path, c)
+
+    def _remove_from_index(self, dir_node, prefix):
+        index = self._index
+        for c in dir_node.childs:
+            path = prefix + c.name
+            index.pop(path, None)
+            if isinstance(c, FileDir):
+                self._remove_from_index(c, path + "/")
+            else:
+                self._file_index.remove(path)
+
+    def is_stale(self):
+        """Return True if the file set was restored from a snapshot."""
+        return self._stale
+
+    def get_snapshot(self):
+        """Return a dict with the state to persist."""
+        return {"root": self._files.dump()}
+
+    def restore_snapshot(self, data):
+        """Restore state from a snapshot and mark it stale."""
+        try:
+            root = FileRoot.from_dump(data["root"])
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error("files: invalid snapshot: %s", e)
+            return
+        self._set_root(root)
+        self._set_stale(True)
+        self.updateFileSet.emit(root)
+
+    def save_meta_cache(self, force=False):
+        """Persist the meta cache if it changed."""
+        self._meta_cache.save(force)
+
+    def _set_stale(self, stale):
+        if stale != self._stale:
+            self._stale = stale
+            self.updateStale.emit(stale)
 
     def attach(self, client):
         """Attach data model to octo client."""
         client.file_set.connect(self.on_file_set)
         client.event.connect(self.on_event)
         self._client = client
+        self._fetcher = MetaFetcher(client)
+        self._fetcher.fetchedInfo.connect(self._on_fetched_info)
+        self._fetcher.fetchedFolder.connect(self._on_fetched_folder)
+        self._analyzer = LocalAnalyzer(client)
+        self._analyzer.analyzed.connect(self._on_analyzed)
+
+    def stop(self):
+        """Stop background fetching and analysis."""
+        if self._fetcher:
+            self._fetcher.stop()
+        if self._analyzer:
+            self._analyzer.stop()
 
     def get_meta(self, path):
-        """Retrieve meta info of file."""
-        if path in self._meta_cache:
+        """Return cached meta info of file or None.
+
+        If the meta info is not cached yet it is fetched in the
+        background and updateMeta is emitted once it is available.
+        """
+        meta = self._get_cached_meta(path)
+        if meta:
             logging.info("file meta from cache: %s", path)
-            return self._meta_cache[path]
-        # try to get info
-        file_info = self._client.file_info(path)
-        if file_info:
-            logging.info("file meta retrieved: %s: %s", path, file_info)
-            return self._files_set_meta(path, file_info)
+            return meta
+        self.prefetch_meta(path)
+
+    def _get_cached_meta(self, path):
+        node = self._index.get(path)
+        key = node.get_key() if isinstance(node, FileGCode) else None
+        meta = self._meta_cache.get(path, key)
+        if meta and node and node.meta is None:
+            node.meta = meta
+        return meta
+
+    def prefetch_meta(self, path):
+        """Fetch meta info of file in background if not cached."""
+        if path and self._fetcher and not self._get_cached_meta(path):
+            self._fetcher.fetch(path)
+
+    @pyqtSlot(object)
+    def prefetch_meta_list(self, paths):
+        """Fetch meta info of all given files in background."""
+        if paths:
+            for path in paths:
+                self.prefetch_meta(path)
+
+    def _on_fetched_info(self, path, info):
+        meta = None
+        if info:
+            logging.info("file info retrieved: %s: %s", path, info)
+            node = self._index.get(path)
+            if isinstance(node, FileGCode):
+                node.date = info.get('date')
+                node.size = info.get('size')
+                if self._file_index.add(path, node):
+                    self.updateNode.emit(node)
+            gca = info.get('gcodeAnalysis')
+            if gca and 'printingArea' in gca:
+                meta = self._files_set_meta(path, gca)
+            else:
+                logging.info("no 'gcodeAnalysis' for %s", path)
+                if self._analyzer and self._analyzer.analyze(path):
+                    return
         else:
             logging.error("can't get file info: %s", path)
+        if not meta:
+            self.updateMeta.emit(path, None)
+
+    def _on_analyzed(self, path, result):
+        meta = None
+        if result:
+            meta = self._files_set_meta(path, result)
+        if not meta:
+            self.updateMeta.emit(path, None)
+
+    def load_folder(self, dir_node):
+        """Load contents of a lazy folder.
+
+        The folder is fetched in background if its listing is not known
+        yet. beginLoadDir and endLoadDir are emitted once it is loaded.
+        """
+        if dir_node.loaded:
+            return
+        if dir_node.pending_items is not None:
+            items = dir_node.pending_items
+            dir_node.pending_items = None
+            self._set_dir_items(dir_node, items)
+        elif self._fetcher:
+            self._fetcher.fetch_folder(dir_node.get_path())
+
+    def load_all_folders(self):
+        """Load all lazy folders so a search covers the whole library.
+
+        Return number of folders that are still fetched in background.
+        Their contents arrive with endLoadDir.
+        """
+        num_pending = 0
+        stack = [self._files]
+        while stack:
+            dir_node = stack.pop()
+            if not dir_node.loaded:
+                self.load_folder(dir_node)
+                if not dir_node.loaded:
+                    num_pending += 1
+                    continue
+            stack.extend(c for c in dir_node.childs if isinstance(c, FileDir))
+        return num_pending
+
+    def _on_fetched_folder(self, path, info):
+        node = self._index.get(path)
+        if not isinstance(node, FileDir) or node.loaded:
+            return
+        if info is None:
+            logging.error("can't get folder: %s", path)
+            return
+        self._set_dir_items(node, info.get('children', []))
+
+    def _set_dir_items(self, dir_node, items):
+        tmp = FileDir(dir_node.name)
+        self._convert_file_children(items, tmp)
+        num = tmp.num_children()
+        logging.info("load folder %r: %d entries", dir_node.name, num)
+        self.beginLoadDir.emit(dir_node, num)
+        for c in tmp.get_children():
+            dir_node.add_child(c)
+        dir_node.loaded = True
+        prefix = dir_node.get_path()
+        if prefix:
+            prefix += "/"
+        self._add_to_index(dir_node, prefix)
+        self.endLoadDir.emit(dir_node, num)
+
+    def _get_unloaded_dir(self, path):
+        """Return the unloaded folder that contains path or None."""
+        while path:
+            path = path.rpartition('/')[0]
+            node = self._index.get(path) if path else self._files
+            if node is not None:
+                if isinstance(node, FileDir) and not node.loaded:
+                    return node
+                return None
+
+    def _check_loaded(self, path):
+        """Return False and drop cached data if path is not loaded."""
+        dir_node = self._get_unloaded_dir(path)
+        if dir_node is None:
+            return True
+        # folder is fetched again when it is opened
+        logging.info("ignore change in unloaded folder: %s", path)
+        dir_node.pending_items = None
+        self._meta_cache.remove(path)
+        self._meta_cache.remove_prefix(path + "/")
+        return False
 
     @pyqtSlot(dict)
     def on_file_set(self, data):
@@ -152,8 +481,9 @@ class FileModel(QObject):
         total = data['total']
         root = FileRoot(free, total)
         self._convert_file_children(data['files'], root)
+        self._set_root(root)
+        self._set_stale(False)
         self.updateFileSet.emit(root)
-        self._files = root
 
     @pyqtSlot(dict)
     def on_event(self, data):
@@ -164,97 +494,163 @@ class FileModel(QObject):
             if event_type == 'FileAdded':
                 path = payload['path']
                 file_type = payload['type']
-                if file_type[0] == 'machinecode':
+                if file_type[0] == 'machinecode' and \
+                        self._check_loaded(path):
                     self._files_add_gcode_file(path)
+                    self.prefetch_meta(path)
             elif event_type == 'FileRemoved':
                 path = payload['path']
                 file_type = payload['type']
-                if file_type[0] == 'machinecode':
+                if file_type[0] == 'machinecode' and \
+                        self._check_loaded(path):
                     self._files_del_gcode_file(path)
             elif event_type == 'FileSelected':
                 path = payload['path']
                 self.selectedFile.emit(path)
                 self._selected_file = path
+                self.prefetch_meta(path)
+            elif event_type == 'PrintDone':
+                self._files_set_last_print(payload['path'])
             elif event_type == 'FileDeselected':
                 self.selectedFile.emit("")
                 self._selected_file = ""
             elif event_type == 'FolderAdded':
                 path = payload['path']
-                self._files_add_dir(path)
+                if self._check_loaded(path):
+                    self._files_add_dir(path)
             elif event_type == 'FolderRemoved':
                 path = payload['path']
-                self._files_del_dir(path)
+                if self._check_loaded(path):
+                    self._files_del_dir(path)
             elif event_type == 'MetadataAnalysisFinished':
                 path = payload['path']
                 result = payload['result']
+                if self._analyzer:
+                    self._analyzer.cancel(path)
                 self._files_set_meta(path, result)
 
     def _get_dir_and_name(self, path):
-        p = path.split('/')
-        n = len(p)
-        if n == 0:
+        dir_path, _, name = path.rpartition('/')
+        if not name:
             logging.error("invalid path: %s", path)
             return None, None
-        elif n == 1:
-            return self._files, p[0]
-        else:
-            node = self._files
-            for name in p[:-1]:
-                node = node.get_child_by_name(name)
-                if node is None:
-                    logging.error("invalid path: %s", path)
-                    return None, None
-            return node, p[-1]
+        if not dir_path:
+            return self._files, name
+        node = self._index.get(dir_path)
+        if not isinstance(node, FileDir):
+            logging.error("invalid path: %s", path)
+            return None, None
+        return node, name
 
     def _files_add_gcode_file(self, path):
         dir_node, name = self._get_dir_and_name(path)
         if dir_node:
-            logging.info("add file %s to %r", name, dir_node)
-            dir_node.add_child(FileGCode(name))
-            self.addedFile.emit(path)
-            self.updateFileSet.emit(self._files)
+            old_node = dir_node.get_child_by_name(name)
+            if isinstance(old_node, FileGCode):
+                # file was overwritten: keep node but drop its meta
+                logging.info("update file %s in %r", name, dir_node.name)
+                old_node.meta = None
+                old_node.date = None
+                old_node.size = None
+                self._meta_cache.remove(path)
+                self._file_index.add(path, old_node)
+                self.addedFile.emit(path)
+                self.updateNode.emit(old_node)
+            elif old_node is None:
+                logging.info("add file %s to %r", name, dir_node.name)
+                self._insert_node(dir_node, FileGCode(name), path)
+                self.addedFile.emit(path)
+            else:
+                logging.error("can't replace dir with file %s", path)
         else:
             logging.error("invalid add file %s", path)
 
-    def _files_set_meta(self, path, meta):
-        dir_node, name = self._get_dir_and_name(path)
-        if dir_node:
-            node = dir_node.get_child_by_name(name)
-            if node:
-                if 'gcodeAnalysis' in meta:
-                    gca = meta['gcodeAnalysis']
-                    if 'printingArea' in gca:
-                        pa = gca['printingArea']
-                        sxi = pa['minX']
-                        sxa = pa['maxX']
-                        syi = pa['minY']
-                        sya = pa['maxY']
-                        szi = pa['minZ']
-                        sza = pa['maxZ']
-                        meta = FileMeta((sxi, sxa), (syi, sya), (szi, sza))
-                        node.meta = meta
-                        self._meta_cache[path] = meta
-                        logging.info("set meta data: %s: %s", path, meta)
-                        return meta
-                    else:
-                        logging.error("no 'printingArea' in %s", gca)
-                else:
-                    logging.error("no 'gcodeAnalysis' in %s", meta)
-            else:
-                logging.error("invaid node: %s", path)
-        else:
+    def _insert_node(self, dir_node, node, path):
+        row = dir_node.num_children()
+        self.beginInsertNode.emit(dir_node, row)
+        dir_node.add_child(node)
+        self._index[path] = node
+        if isinstance(node, FileGCode):
+            self._file_index.add(path, node)
+        self.endInsertNode.emit(dir_node, row)
+
+    def _remove_node(self, dir_node, name, path):
+        node = dir_node.get_child_by_name(name)
+        if node is None:
+            return None
+        row = dir_node.get_child_row(name, False)
+        self.beginRemoveNode.emit(dir_node, row)
+        dir_node.remove_child_by_name(name)
+        self._index.pop(path, None)
+        self._file_index.remove(path)
+        self._meta_cache.remove(path)
+        if isinstance(node, FileDir):
+            self._remove_from_index(node, path + "/")
+            self._meta_cache.remove_prefix(path + "/")
+        self.endRemoveNode.emit(dir_node, row)
+        return node
+
+    def _files_set_meta(self, path, gca):
+        node = self._index.get(path)
+        if node is None and self._get_unloaded_dir(path) is None:
             logging.error("invalid node: %s", path)
+            return None
+        if not gca or 'printingArea' not in gca:
+            logging.error("no 'printingArea' in %s", gca)
+            return None
+        meta = self._convert_meta(node, gca)
+        self._meta_cache.put(path, meta)
+        logging.info("set meta data: %s: %s", path, meta)
+        if node:
+            node.meta = meta
+            self.updateNode.emit(node)
+        self.updateMeta.emit(path, meta)
+        return meta
+
+    def _convert_meta(self, node, gca):
+        pa = gca['printingArea']
+        sxi = pa['minX']
+        sxa = pa['maxX']
+        syi = pa['minY']
+        sya = pa['maxY']
+        szi = pa['minZ']
+        sza = pa['maxZ']
+        dims = None
+        if 'dimensions' in gca:
+            dim = gca['dimensions']
+            dims = (dim['width'], dim['depth'], dim['height'])
+        filament = ()
+        if gca.get('filament'):
+            lengths = {}
+            for name, entry in gca['filament'].items():
+                tool_no = heater_tool_no(name)
+                if tool_no is not None and entry:
+                    lengths[tool_no] = entry.get('length') or 0.0
+            if lengths:
+                filament = [0.0] * (max(lengths) + 1)
+                for tool_no, length in lengths.items():
+                    filament[tool_no] = length
+                filament = tuple(filament)
+        return FileMeta((sxi, sxa), (syi, sya), (szi, sza),
+                        dims=dims, filament=filament,
+                        est_time=gca.get('estimatedPrintTime'),
+                        size=node.size if node else None,
+                        date=node.date if node else None,
+                        layers=gca.get('layers'))
+
+    def _files_set_last_print(self, path):
+        node = self._index.get(path)
+        if isinstance(node, FileGCode):
+            node.last_print = int(time.time())
+            self._file_index.add(path, node)
+            self.updateNode.emit(node)
 
     def _files_del_gcode_file(self, path):
         dir_node, name = self._get_dir_and_name(path)
         if dir_node:
-            if dir_node.remove_child_by_name(name):
-                logging.info("del file %s in %r", name, dir_node)
+            if self._remove_node(dir_node, name, path):
+                logging.info("del file %s in %r", name, dir_node.name)
                 self.removedFile.emit(path)
-                self.updateFileSet.emit(self._files)
-                # remove file from cache
-                if path in self._meta_cache:
-                    del self._meta_cache[path]
             else:
                 logging.error("can't remove file %s", path)
         else:
@@ -263,20 +659,21 @@ class FileModel(QObject):
     def _files_add_dir(self, path):
         dir_node, name = self._get_dir_and_name(path)
         if dir_node:
-            logging.info("add dir %s to %r", name, dir_node)
-            dir_node.add_child(FileDir(name))
-            self.addedFolder.emit(path)
-            self.updateFileSet.emit(self._files)
+            if dir_node.get_child_by_name(name) is None:
+                logging.info("add dir %s to %r", name, dir_node.name)
+                self._insert_node(dir_node, FileDir(name), path)
+                self.addedFolder.emit(path)
+            else:
+                logging.info("dir %s already exists", path)
         else:
             logging.error("invalid add dir %s", path)
 
     def _files_del_dir(self, path):
         dir_node, name = self._get_dir_and_name(path)
         if dir_node:
-            if dir_node.remove_child_by_name(name):
-                logging.info("del dir %s in %r", name, dir_node)
+            if self._remove_node(dir_node, name, path):
+                logging.info("del dir %s in %r", name, dir_node.name)
                 self.removedFolder.emit(path)
-                self.updateFileSet.emit(self._files)
             else:
                 logging.error("can't remove dir %s", path)
         else:
@@ -287,9 +684,17 @@ class FileModel(QObject):
             item_type = item['type']
             name = item['display']
             if item_type == "folder":
+                # keep a known listing until the folder is opened
                 new_node = FileDir(name)
-                self._convert_file_children(item['children'], new_node)
+                new_node.loaded = False
+                if item.get('children'):
+                    new_node.pending_items = item['children']
                 node.add_child(new_node)
             elif item_type == "machinecode":
                 new_node = FileGCode(name)
+                new_node.date = item.get('date')
+                new_node.size = item.get('size')
+                last = item.get('prints', {}).get('last')
+                if last:
+                    new_node.last_print = last.get('date')
                 node.add_child(new_node)
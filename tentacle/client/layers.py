@@ -0,0 +1,240 @@
+"""Download and index the G-code file being printed."""
+
+import hashlib
+import http.client
+import logging
+import os
+import tempfile
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from tentacle.gcode.layers import LayerIndexer, decode_layer
+from .download import open_download
+
+
+class IndexTask(QRunnable):
+    """Download a file into the cache and index its layers."""
+
+    def __init__(self, loader, path, file_name, reuse=True):
+        """Create task for file path stored in file_name.
+
+        With reuse a file_name already in the cache is not downloaded.
+        """
+        super().__init__()
+        self._loader = loader
+        self._path = path
+        self._file_name = file_name
+        self._reuse = reuse
+
+    def run(self):
+        """Run download and indexing in a pool thread."""
+        index = None
+        try:
+            if self._reuse and os.path.exists(self._file_name):
+                index = self._index_file()
+            else:
+                index = self._download()
+            logging.info("layers: %s: %r", self._path, index)
+        except IOError as e:
+            logging.error("layers: %s: %s", self._path, e)
+        self._loader.taskIndexed.emit(self._path, index)
+
+    def _index_file(self):
+        indexer = LayerIndexer()
+        rest = b""
+        chunk_size = self._loader.get_chunk_size()
+        with open(self._file_name, "rb") as fobj:
+            while not self._loader.is_cancelled(self._path):
+                data = fobj.read(chunk_size)
+                if not data:
+                    break
+                rest = indexer.feed_data(rest, data)
+        return indexer.finish(rest)
+
+    def _download(self):
+        # index while downloading so the file is read only once
+        loader = self._loader
+        client = loader.get_client()
+        url = client.get_download_url(self._path)
+        if not url:
+            raise IOError("download not available")
+        indexer = LayerIndexer()
+        rest = b""
+        tmp_name = self._file_name + ".tmp"
+        con, resp = open_download(url, client.get_api_key(), timeout=30.0)
+        try:
+            with open(tmp_name, "wb") as fobj:
+                while True:
+                    if loader.is_cancelled(self._path):
+                        raise IOError("cancelled")
+                    data = resp.read(loader.get_chunk_size())
+                    if not data:
+                        break
+                    fobj.write(data)
+                    rest = indexer.feed_data(rest, data)
+            os.replace(tmp_name, self._file_name)
+        except (IOError, http.client.HTTPException) as e:
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
+            raise IOError("download: %s" % e)
+        finally:
+            con.close()
+        return indexer.finish(rest)
+
+
+class DecodeTask(QRunnable):
+    """Decode the moves of a layer from the cached file."""
+
+    def __init__(self, loader, path, file_name, index, layer):
+        """Create task for a layer of an indexed file."""
+        super().__init__()
+        self._arc_tolerance = loader.get_arc_tolerance()
+        self._loader = loader
+        self._path = path
+        self._file_name = file_name
+        self._index = index
+        self._layer = layer
+
+    def run(self):
+        """Run decoding in a pool thread."""
+        layer = None
+        if not self._loader.is_cancelled(self._path):
+            try:
+                with open(self._file_name, "rb") as fobj:
+                    layer = decode_layer(fobj, self._index, self._layer,
+                                         self._arc_tolerance)
+            except IOError as e:
+                logging.error("layers: %s: %s", self._file_name, e)
+        self._loader.taskDecoded.emit(self._path, self._layer, layer)
+
+
+class LayerLoader(QObject):
+    """Keep a layer index of the active print file.
+
+    The file is downloaded once into the cache directory and indexed
+    in background. Layers are then decoded on demand and delivered by
+    layerReady.
+    """
+
+    # path, LayerIndex or None if it failed
+    indexReady = pyqtSignal(str, object)
+    # path, layer number, decoded Layer
+    layerReady = pyqtSignal(str, int, object)
+    # internal: emitted by pool threads
+    taskIndexed = pyqtSignal(str, object)
+    taskDecoded = pyqtSignal(str, int, object)
+
+    def __init__(self, client, cache_dir=None, chunk_size=65536):
+        """Create loader for given OctoClient."""
+        super().__init__()
+        self._client = client
+        if not cache_dir:
+            cache_dir = os.path.join(tempfile.gettempdir(), "tentacle-gcode")
+        self._cache_dir = cache_dir
+        self._chunk_size = chunk_size
+        self._arc_tolerance = 0.05
+        self._path = None
+        self._file_name = None
+        self._index = None
+        self._pending = set()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self.taskIndexed.connect(self._on_indexed)
+        self.taskDecoded.connect(self._on_decoded)
+
+    def get_client(self):
+        """Return the OctoClient used for downloads."""
+        return self._client
+
+    def get_chunk_size(self):
+        """Return size of chunks read."""
+        return self._chunk_size
+
+    def get_arc_tolerance(self):
+        """Return the precision of decoded arcs in mm."""
+        return self._arc_tolerance
+
+    def set_arc_tolerance(self, tolerance):
+        """Set the precision of arcs in layers decoded from now on."""
+        self._arc_tolerance = tolerance
+
+    def get_path(self):
+        """Return path of the active file or None."""
+        return self._path
+
+    def get_index(self):
+        """Return LayerIndex of the active file or None."""
+        return self._index
+
+    def is_cancelled(self, path):
+        """Return True if path is no longer the active file."""
+        return path != self._path
+
+    def load(self, path, date=None):
+        """Make path the active file and index it in background."""
+        if path == self._path:
+            return
+        self._path = path
+        self._index = None
+        self._pending.clear()
+        if not path:
+            return
+        self._file_name = self._get_file_name(path, date)
+        # without date a cached file may be of an older upload
+        self._pool.start(IndexTask(self, path, self._file_name,
+                                   reuse=bool(date)))
+
+    def request_layer(self, layer):
+        """Decode layer of the active file. Return False if not possible."""
+        index = self._index
+        if index is None or not 0 <= layer < len(index):
+            return False
+        if layer not in self._pending:
+            self._pending.add(layer)
+            self._pool.start(DecodeTask(self, self._path, self._file_name,
+                                        index, layer))
+        return True
+
+    def stop(self):
+        """Cancel background work and wait for it."""
+        self._path = None
+        self._pool.clear()
+        self._pool.waitForDone()
+
+    def _get_file_name(self, path, date):
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+        except OSError as e:
+            logging.error("layers: can't create %s: %s", self._cache_dir, e)
+        key = hashlib.sha1(path.encode("utf-8")).hexdigest()
+        name = "%s-%s.gcode" % (key, date or 0)
+        self._cleanup(name)
+        return os.path.join(self._cache_dir, name)
+
+    def _cleanup(self, keep):
+        # only the active file is kept
+        try:
+            names = os.listdir(self._cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if name != keep:
+                try:
+                    os.remove(os.path.join(self._cache_dir, name))
+                except OSError as e:
+                    logging.error("layers: can't remove %s: %s", name, e)
+
+    def _on_indexed(self, path, index):
+        if path != self._path:
+            return
+        self._index = index
+        self.indexReady.emit(path, index)
+
+    def _on_decoded(self, path, number, layer):
+        if path != self._path:
+            return
+        self._pending.discard(number)
+        if layer is not None:
+            self.layerReady.emit(path, number, layer)
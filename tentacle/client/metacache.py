@@ -0,0 +1,149 @@
+"""Persistent LRU cache of file meta data."""
+
+import collections
+import logging
+
+from .snapshot import Snapshot
+
+
+class FileMeta:
+    """File Meta Data."""
+
+    def __init__(self, range_x, range_y, range_z, dims=None, filament=(),
+                 est_time=None, size=None, date=None, layers=None):
+        """Create file meta data."""
+        self.range_x = range_x
+        self.range_y = range_y
+        self.range_z = range_z
+        # (width, depth, height) of model
+        self.dims = dims
+        # filament length per tool number
+        self.filament = filament
+        self.est_time = est_time
+        self.size = size
+        self.date = date
+        self.layers = layers
+
+    def __repr__(self):
+        """Represent file meta data."""
+        return "Meta(X=%r, Y=%r, Z=%r)" % (
+            self.range_x, self.range_y, self.range_z)
+
+    def get_key(self):
+        """Return (date, size) key that identifies the file version."""
+        return self.date, self.size
+
+    def dump(self):
+        """Return a compact list of the meta data for persistence."""
+        return [self.range_x, self.range_y, self.range_z, self.dims,
+                list(self.filament), self.est_time, self.size, self.date,
+                self.layers]
+
+    @classmethod
+    def from_dump(cls, data):
+        """Create meta data from a list created by dump()."""
+        ranges = [tuple(r) for r in data[0:3]]
+        if len(data) == 3:
+            return cls(*ranges)
+        dims, filament, est_time, size, date = data[3:8]
+        layers = data[8] if len(data) > 8 else None
+        if dims:
+            dims = tuple(dims)
+        return cls(*ranges, dims=dims, filament=tuple(filament),
+                   est_time=est_time, size=size, date=date, layers=layers)
+
+
+class MetaCache:
+    """A size bounded LRU cache of FileMeta that persists to disk.
+
+    Entries are keyed by path and validated by the (date, size) of the
+    file, so a changed file with the same name is never served stale
+    data.
+    """
+
+    def __init__(self, file_name=None, max_entries=1000, min_interval=30.0):
+        """Create a cache. Without file name it is kept in memory only."""
+        self._entries = collections.OrderedDict()
+        self._max_entries = max_entries
+        self._store = Snapshot(file_name, min_interval) if file_name else None
+        self._dirty = False
+
+    def __len__(self):
+        """Return number of entries."""
+        return len(self._entries)
+
+    def __contains__(self, path):
+        """Check if path is cached."""
+        return path in self._entries
+
+    def get(self, path, key=None):
+        """Return meta of path or None.
+
+        If a (date, size) key is given the entry must match it. Unknown
+        parts of the key are ignored.
+        """
+        meta = self._entries.get(path)
+        if meta is None:
+            return None
+        if key and not self._key_matches(meta.get_key(), key):
+            logging.info("meta cache: outdated: %s", path)
+            self.remove(path)
+            return None
+        self._entries.move_to_end(path)
+        return meta
+
+    def _key_matches(self, have, want):
+        for h, w in zip(have, want):
+            if h is not None and w is not None and h != w:
+                return False
+        return True
+
+    def put(self, path, meta):
+        """Store meta of path and evict the least recently used entry."""
+        self._entries[path] = meta
+        self._entries.move_to_end(path)
+        while len(self._entries) > self._max_entries:
+            old_path, _ = self._entries.popitem(last=False)
+            logging.debug("meta cache: evict %s", old_path)
+        self._dirty = True
+
+    def remove(self, path):
+        """Drop meta of path."""
+        if self._entries.pop(path, None):
+            self._dirty = True
+
+    def remove_prefix(self, prefix):
+        """Drop meta of all paths starting with prefix."""
+        paths = [p for p in self._entries if p.startswith(prefix)]
+        for path in paths:
+            del self._entries[path]
+        if paths:
+            self._dirty = True
+
+    def items(self):
+        """Return (path, meta) items from least to most recently used."""
+        return self._entries.items()
+
+    def load(self):
+        """Load entries from disk."""
+        if not self._store:
+            return
+        data = self._store.load()
+        if not data:
+            return
+        try:
+            for path, m in data["entries"]:
+                self._entries[path] = FileMeta.from_dump(m)
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error("meta cache: invalid file: %s", e)
+            self._entries.clear()
+        logging.info("meta cache: loaded %d entries", len(self._entries))
+        self._dirty = False
+
+    def save(self, force=False):
+        """Save entries to disk if they changed. Writes are rate-limited."""
+        if not self._store or not self._dirty:
+            return
+        entries = [[path, m.dump()] for path, m in self._entries.items()]
+        if self._store.save({"entries": entries}, force):
+            self._dirty = False
@@ -0,0 +1,206 @@
+"""Split a multipart MJPEG stream into JPEG frames."""
+
+import re
+
+
+_LENGTH_RE = re.compile(rb"content-length:[ \t]*(\d+)", re.IGNORECASE)
+_HEADER_END = b"\r\n\r\n"
+_JPEG_END = b"\xff\xd9"
+
+# parser states
+_HEADER = 0
+_DATA = 1
+_SCAN = 2
+
+
+def parse_boundary(content_type):
+    """Return boundary of a multipart content type or None."""
+    if not content_type:
+        return None
+    value = content_type.partition("boundary=")[2]
+    value = value.split(";")[0].strip().strip('"')
+    if not value:
+        return None
+    if not value.startswith("--"):
+        value = "--" + value
+    return value.encode("latin-1")
+
+
+class MJPEGParser:
+    """Read a multipart MJPEG stream in chunks and return the frames.
+
+    All data is read with readinto() into one buffer that is reused
+    for the whole stream. Frames are returned as memoryviews of this
+    buffer, so a frame is only valid until the next one is requested.
+
+    The part headers are scanned in place for the Content-Length. If
+    a part has none, its end is searched for: the next boundary line
+    or the JPEG end marker if the boundary is not known.
+    """
+
+    chunk_size = 64 * 1024
+    header_size = 256
+    max_header_size = 4096
+    max_frame_size = 16 * 1024 * 1024
+
+    def __init__(self, boundary=None, buffer_size=256 * 1024):
+        """Create parser with the boundary line of the content type."""
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+        # unparsed data is in [_pos, _end)
+        self._pos = 0
+        self._end = 0
+        self._state = _HEADER
+        self._size = 0
+        self._scan = 0
+        self._caught_up = False
+        self._marker = None
+        if boundary:
+            self._marker = b"\r\n" + boundary
+
+    def read_frames(self, reader):
+        """Yield all frames of the stream until the reader hits EOF."""
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                if self._fill(reader):
+                    continue
+                # last frame is only ended by the stream
+                self._caught_up = True
+                frame = self._last_frame()
+                if frame is None:
+                    return
+            start, end = frame
+            view = self._view[start:end]
+            yield view
+            view.release()
+
+    def _next_frame(self):
+        """Return (start, end) of the next frame or None if incomplete."""
+        buf = self._buf
+        while True:
+            pos = self._pos
+            end = self._end
+            if self._state == _HEADER:
+                # skip empty lines before the boundary
+                while pos < end and buf[pos] in b"\r\n":
+                    pos += 1
+                self._pos = pos
+                idx = buf.find(_HEADER_END, pos, end)
+                if idx == -1:
+                    if end - pos > self.max_header_size:
+                        raise IOError("mjpeg: no header found!")
+                    return None
+                self._parse_header(pos, idx)
+                self._pos = idx + len(_HEADER_END)
+            elif self._state == _DATA:
+                if end - pos < self._size:
+                    return None
+                self._pos = pos + self._size
+                self._state = _HEADER
+                return pos, pos + self._size
+            else:
+                marker = self._marker or _JPEG_END
+                idx = buf.find(marker, max(self._scan, pos), end)
+                if idx == -1:
+                    if end - pos > self.max_frame_size:
+                        raise IOError("mjpeg: no frame end found!")
+                    if self._caught_up:
+                        # sender paused after a JPEG: do not wait for
+                        # the boundary of the next frame
+                        frame = self._last_frame()
+                        if frame:
+                            return frame
+                    # continue search with the next data
+                    self._scan = max(end - len(marker) + 1, pos)
+                    return None
+                if not self._marker:
+                    idx += len(_JPEG_END)
+                self._pos = idx
+                self._state = _HEADER
+                # a JPEG never ends with an empty line
+                while idx > pos and buf[idx - 1] in b"\r\n":
+                    idx -= 1
+                return pos, idx
+
+    def _last_frame(self):
+        """Return (start, end) if all data left is a complete frame."""
+        if self._state != _SCAN:
+            return None
+        pos = self._pos
+        end = self._end
+        while end > pos and self._buf[end - 1] in b"\r\n":
+            end -= 1
+        if not self._buf.endswith(_JPEG_END, pos, end):
+            return None
+        self._pos = self._end
+        self._state = _HEADER
+        return pos, end
+
+    def _parse_header(self, start, end):
+        buf = self._buf
+        # boundary line is the first line of the part
+        if buf.startswith(b"--", start):
+            eol = buf.find(b"\r\n", start, end)
+            if eol == -1:
+                eol = end
+            self._marker = b"\r\n" + bytes(buf[start:eol]).rstrip()
+        match = _LENGTH_RE.search(buf, start, end)
+        if match:
+            size = int(match.group(1))
+            if size > self.max_frame_size:
+                raise IOError("mjpeg: frame too large: %d" % size)
+            self._size = size
+            self._state = _DATA
+        else:
+            self._scan = end + len(_HEADER_END)
+            self._state = _SCAN
+
+    def _fill(self, reader):
+        """Read next chunk and return False on EOF."""
+        exact = False
+        if self._state == _DATA:
+            # read no more than the frame to not wait for the next one
+            size = self._size - (self._end - self._pos)
+            exact = True
+        elif self._state == _HEADER:
+            size = self.header_size
+        else:
+            size = self.chunk_size
+        self._make_room(size)
+        view = self._view[self._end:self._end + size]
+        if exact:
+            num = reader.readinto(view)
+        else:
+            # take what is available and do not block for a full chunk
+            readinto = getattr(reader, "readinto1", reader.readinto)
+            num = readinto(view)
+        view.release()
+        if not num:
+            return False
+        self._end += num
+        self._caught_up = num < size
+        return True
+
+    def _make_room(self, size):
+        """Make sure size bytes are free after the unparsed data."""
+        buf = self._buf
+        if self._end + size <= len(buf):
+            return
+        pos = self._pos
+        num = self._end - pos
+        if num + size > len(buf):
+            # a new buffer as frames handed out may still be referenced
+            new_size = max(len(buf) * 2, num + size)
+            if new_size > self.max_frame_size + self.max_header_size:
+                raise IOError("mjpeg: buffer too large: %d" % new_size)
+            new_buf = bytearray(new_size)
+            new_buf[:num] = self._view[pos:self._end]
+            self._view.release()
+            self._buf = new_buf
+            self._view = memoryview(new_buf)
+        else:
+            buf[:num] = buf[pos:self._end]
+        self._pos = 0
+        self._end = num
+        self._scan = max(self._scan - pos, 0)
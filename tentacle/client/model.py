@@ -1,19 +1,47 @@
 """Process OctoPrint Data Model and Emit Python Model Objects."""
 
+import logging
+import re
+from array import array
+
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 
+from .temphist import TempHistory
+
+
+_TOOL_RE = re.compile(r"tool(\d+)$")
+
+
+def heater_sort_key(name):
+    """Sort heaters: bed, chamber and then tools by number."""
+    if name == "bed":
+        return (0, 0, name)
+    elif name == "chamber":
+        return (1, 0, name)
+    m = _TOOL_RE.match(name)
+    if m:
+        return (2, int(m.group(1)), name)
+    return (3, 0, name)
+
+
+def heater_tool_no(name):
+    """Return tool number of a tool heater or None."""
+    m = _TOOL_RE.match(name)
+    if m:
+        return int(m.group(1))
+
 
 class JobData:
     """Represent Jobs."""
 
-    def __init__(self, user, file, size, est_time, fl0, fl1):
+    def __init__(self, user, file, size, est_time, filament):
         """Create a new JobData."""
         self.user = user
         self.file = file
         self.size = size
         self.est_time = est_time
-        self.fl0 = fl0
-        self.fl1 = fl1
+        # filament length per tool number
+        self.filament = filament
 
 
 class ProgressData:
@@ -29,14 +57,40 @@ class ProgressData:
 
 
 class TempData:
-    """Temperature Data."""
+    """Temperature Data.
+
+    One sample holds the (actual, target) pairs of all heaters in a flat
+    array. The heaters tuple is shared by all samples of the same layout.
+    """
 
-    def __init__(self, time, bed, tool0, tool1):
+    def __init__(self, time, heaters, values):
         """Create a new TempData."""
         self.time = time
-        self.bed = bed
-        self.tool0 = tool0
-        self.tool1 = tool1
+        self.heaters = heaters
+        self.values = values
+
+    def get_num_heaters(self):
+        """Return number of heaters in sample."""
+        return len(self.heaters)
+
+    def get_values(self):
+        """Return flat array of all (actual, target) values."""
+        return self.values
+
+    def get(self, idx):
+        """Return (actual, target) of heater with given index."""
+        off = idx * 2
+        return self.values[off], self.values[off + 1]
+
+    def get_by_name(self, name):
+        """Return (actual, target) of given heater or None."""
+        if name in self.heaters:
+            return self.get(self.heaters.index(name))
+
+    @classmethod
+    def from_values(cls, time, heaters, values):
+        """Create TempData from time stamp and flat values."""
+        return cls(time, heaters, array('d', values))
 
 
 class SubModel:
@@ -71,6 +125,21 @@ class SubModel:
                 setattr(self, var, value)
         return dirty
 
+    def dump(self):
+        """Return a dict of all model values for persistence."""
+        entries = {}
+        for entry in self._model:
+            var = entry[0]
+            entries[var] = getattr(self, var)
+        return entries
+
+    def load(self, data):
+        """Restore model values from a dict created by dump()."""
+        for entry in self._model:
+            var, _, vtyp, _ = entry
+            if var in data:
+                setattr(self, var, vtyp(data[var]))
+
     def _lookup(self, obj, path, default):
         if isinstance(path, str):
             if path in obj:
@@ -103,10 +172,47 @@ class JobModel(SubModel):
             ("path", ("file", "path"), str, ""),
             ("size", ("file", "size"), int, 0),
             ("estTime", ("estimatedPrintTime"), float, 0.0),
-            ("fl0", ("filament", "tool0", "length"), float, 0.0),
-            ("fl1", ("filament", "tool1", "length"), float, 0.0),
         ]
         super().__init__(model)
+        # filament lengths are indexed by tool number
+        self.filament = ()
+
+    def update(self, obj):
+        """Update model and the filament of all tools."""
+        dirty = super().update(obj)
+        filament = self._parse_filament(obj.get("filament"))
+        if filament != self.filament:
+            self.filament = filament
+            dirty = True
+        return dirty
+
+    def dump(self):
+        """Return a dict of all model values for persistence."""
+        entries = super().dump()
+        entries["filament"] = list(self.filament)
+        return entries
+
+    def load(self, data):
+        """Restore model values from a dict created by dump()."""
+        super().load(data)
+        if "filament" in data:
+            self.filament = tuple(float(v) for v in data["filament"])
+
+    def _parse_filament(self, filament):
+        if not filament:
+            return ()
+        lengths = {}
+        for name, entry in filament.items():
+            tool_no = heater_tool_no(name)
+            if tool_no is not None and isinstance(entry, dict):
+                length = entry.get("length")
+                lengths[tool_no] = float(length) if length else 0.0
+        if not lengths:
+            return ()
+        result = [0.0] * (max(lengths) + 1)
+        for tool_no, length in lengths.items():
+            result[tool_no] = length
+        return tuple(result)
 
 
 class ProgressModel(SubModel):
@@ -140,6 +246,12 @@ class DataModel(QObject):
     sendRaw = pyqtSignal(str)
     recvRaw = pyqtSignal(str)
     waitTemp = pyqtSignal(bool)
+    updateStale = pyqtSignal(bool)
+
+    updateHeaters = pyqtSignal(object)
+
+    # number of recent temperature samples kept for snapshots
+    recent_temps_len = 320
 
     def __init__(self):
         """Create a new DataModel instance."""
@@ -151,6 +263,64 @@ class DataModel(QObject):
         self._current_z = -1.0
         self._wait_temp = False
         self._busy_files = None
+        self._heaters = ()
+        self._heater_map = {}
+        self._temp_history = TempHistory(0)
+        self._stale = False
+
+    def get_temp_history(self):
+        """Return the TempHistory of all received temperatures."""
+        return self._temp_history
+
+    def get_heaters(self):
+        """Return tuple of heater names discovered so far."""
+        return self._heaters
+
+    def is_stale(self):
+        """Return True if the shown data was restored from a snapshot."""
+        return self._stale
+
+    def get_snapshot(self):
+        """Return a dict with the state to persist."""
+        temps = []
+        raw = self._temp_history.get_raw()
+        for ts, values in raw.get_last(self.recent_temps_len):
+            temps.append([ts] + values.tolist())
+        return {
+            "job": self._job.dump(),
+            "progress": self._progress.dump(),
+            "heaters": list(self._heaters),
+            "temps": temps
+        }
+
+    def restore_snapshot(self, data):
+        """Restore state from a snapshot and mark it stale."""
+        try:
+            self._job.load(data["job"])
+            self._progress.load(data["progress"])
+            heaters = tuple(data.get("heaters", ()))
+            num_values = len(heaters) * 2
+            temps = []
+            for t in data["temps"]:
+                if len(t) != num_values + 1:
+                    raise ValueError("invalid temp sample")
+                temps.append(TempData.from_values(t[0], heaters, t[1:]))
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            logging.error("model: invalid snapshot: %s", e)
+            return
+        self._set_stale(True)
+        self._emit_job()
+        self._emit_progress()
+        if heaters:
+            self._set_heaters(heaters)
+        for td in temps:
+            self._temp_history.add(td.time, td.values)
+            self.updateTemps.emit(td)
+
+    def _set_stale(self, stale):
+        if stale != self._stale:
+            self._stale = stale
+            self.updateStale.emit(stale)
 
     def attach(self, client):
         """Attach data model to octo client."""
@@ -176,6 +346,7 @@ class DataModel(QObject):
     @pyqtSlot(dict)
     def on_current(self, data):
         """React on new 'current' event."""
+        self._set_stale(False)
         if "job" in data:
             self._update_job(data["job"])
         if "state" in data:
@@ -217,29 +388,34 @@ class DataModel(QObject):
     def _update_job(self, job):
         dirty = self._job.update(job)
         if dirty:
-            # pylint: disable=E1101
-            jd = JobData(
-                self._job.user,
-                self._job.file,
-                self._job.size,
-                self._job.estTime,
-                self._job.fl0,
-                self._job.fl1,
-            )
-            self.updateJob.emit(jd)
+            self._emit_job()
+
+    def _emit_job(self):
+        # pylint: disable=E1101
+        jd = JobData(
+            self._job.user,
+            self._job.file,
+            self._job.size,
+            self._job.estTime,
+            self._job.filament,
+        )
+        self.updateJob.emit(jd)
 
     def _update_progress(self, progress):
         dirty = self._progress.update(progress)
         if dirty:
-            p = self._progress
-            # pylint: disable=E1101
-            pd = ProgressData(
-                p.completion,
-                p.filepos,
-                p.time,
-                p.timeLeft,
-                p.leftOrigin)
-            self.updateProgress.emit(pd)
+            self._emit_progress()
+
+    def _emit_progress(self):
+        p = self._progress
+        # pylint: disable=E1101
+        pd = ProgressData(
+            p.completion,
+            p.filepos,
+            p.time,
+            p.timeLeft,
+            p.leftOrigin)
+        self.updateProgress.emit(pd)
 
     def _update_state(self, state):
         if "text" in state:
@@ -251,21 +427,52 @@ class DataModel(QObject):
     def _update_temps(self, temps):
         for t in temps:
             ts = t["time"]
-            bed = self._get_temp_tuple(t, "bed")
-            tool0 = self._get_temp_tuple(t, "tool0")
-            tool1 = self._get_temp_tuple(t, "tool1")
-            self.updateTemps.emit(TempData(ts, bed, tool0, tool1))
-
-    def _get_temp_tuple(self, t, what):
-        actual = 0.0
-        target = 0.0
-        if what in t:
-            d = t[what]
-            if "actual" in d:
-                actual = d["actual"]
-            if "target" in d:
-                target = d["target"]
-        return actual, target
+            # history replayed on connect overlaps restored samples
+            end = self._temp_history.get_end_time()
+            if end is not None and ts <= end:
+                continue
+            self._discover_heaters(t)
+            heaters = self._heaters
+            values = array('d', [0.0]) * (len(heaters) * 2)
+            heater_map = self._heater_map
+            for name, d in t.items():
+                if name in heater_map and d:
+                    off = heater_map[name] * 2
+                    actual = d.get("actual")
+                    target = d.get("target")
+                    if actual is not None:
+                        values[off] = actual
+                    if target is not None:
+                        values[off + 1] = target
+            self._temp_history.add(ts, values)
+            self.updateTemps.emit(TempData(ts, heaters, values))
+
+    def _discover_heaters(self, temp):
+        new_names = []
+        for name, d in temp.items():
+            if name not in self._heater_map and isinstance(d, dict):
+                new_names.append(name)
+        if new_names:
+            heaters = sorted(self._heaters + tuple(new_names),
+                             key=heater_sort_key)
+            self._set_heaters(tuple(heaters))
+
+    def _set_heaters(self, heaters):
+        if heaters == self._heaters:
+            return
+        logging.info("model: heaters: %r", heaters)
+        old_heaters = self._heaters
+        # move all samples to the new layout
+        channel_map = []
+        for i, name in enumerate(old_heaters):
+            if name in heaters:
+                new = heaters.index(name)
+                channel_map += [(i * 2, new * 2), (i * 2 + 1, new * 2 + 1)]
+        history = self._temp_history.remap(len(heaters) * 2, channel_map)
+        self._temp_history = history
+        self._heaters = heaters
+        self._heater_map = {name: i for i, name in enumerate(heaters)}
+        self.updateHeaters.emit(heaters)
 
     def _parse_logs(self, logs):
         for entry in logs:
@@ -4,6 +4,7 @@ import logging
 import time
 import json
 import gzip
+import urllib.parse
 
 import octorest
 
@@ -88,7 +89,8 @@ class OctoEventEmitter(QThread):
                 # initially read files
                 if client:
                     logging.debug("get files()")
-                    files = client.files()
+                    # only top level. folders are loaded when opened
+                    files = client.files(recursive=False)
                     self.client.file_set.emit(files)
                 # setup event reader
                 logging.debug("enter gen.read_loop()")
@@ -146,6 +148,27 @@ class OctoClient(QObject):
                 self.client_factory = lambda: None
         self._thread = None
         self.client = None
+        self._url = None if sim_file else url
+        self._api_key = api_key
+
+    def get_api_key(self):
+        """Return API key used for requests."""
+        return self._api_key
+
+    def get_download_url(self, path):
+        """Return URL to download a local file or None in simulation."""
+        if not self._url:
+            return None
+        url = urllib.parse.urlparse(self._url)
+        return "%s://%s/downloads/files/local/%s" % (
+            url.scheme, url.netloc, urllib.parse.quote(path))
+
+    def get_upload_url(self):
+        """Return URL to upload local files or None in simulation."""
+        if not self._url:
+            return None
+        url = urllib.parse.urlparse(self._url)
+        return "%s://%s/api/files/local" % (url.scheme, url.netloc)
 
     def start(self):
         """Start worker thread."""
@@ -177,6 +200,16 @@ class OctoClient(QObject):
             logging.info("sim get files info")
             return {}
 
+    def folder_info(self, path):
+        """Return info with the direct children of given folder."""
+        if self.client:
+            try:
+                return self.client.files_info("local", path)
+            except RuntimeError as e:
+                self.error.emit(str(e))
+        else:
+            logging.info("sim folder info: %s", path)
+
     def connect(self):
         """Connect to printer."""
         if self.client:
@@ -381,6 +414,16 @@ class OctoClient(QObject):
         else:
             logging.info("sim bed_target: %r", temp)
 
+    def chamber_target(self, temp):
+        """Set target temperature of chamber."""
+        if self.client:
+            try:
+                self.client.chamber_target(temp)
+            except RuntimeError as e:
+                self.error.emit(str(e))
+        else:
+            logging.info("sim chamber_target: %r", temp)
+
 
 if __name__ == "__main__":
     from PyQt5.QtCore import QCoreApplication
@@ -0,0 +1,83 @@
+"""Persist a snapshot of the last known printer state."""
+
+import json
+import logging
+import os
+import time
+
+from tentacle.util import atomic_write
+
+
+class Snapshot:
+    """Store and restore a compact state snapshot on disk.
+
+    Writes are atomic and rate-limited to spare SD cards: a save is
+    skipped if the last write happened less than min_interval seconds
+    ago or if the contents did not change.
+    """
+
+    version = 1
+
+    def __init__(self, file_name, min_interval=60.0):
+        """Create a snapshot store for the given file."""
+        self._file_name = file_name
+        self._min_interval = min_interval
+        self._last_save = None
+        self._last_data = None
+
+    def get_file_name(self):
+        """Return path of snapshot file."""
+        return self._file_name
+
+    def load(self):
+        """Load the snapshot and return its dict or None."""
+        if not os.path.exists(self._file_name):
+            logging.info("snapshot: no file: %s", self._file_name)
+            return None
+        try:
+            with open(self._file_name, "rb") as fobj:
+                raw = fobj.read()
+            data = json.loads(raw.decode("utf-8"))
+        except (OSError, ValueError) as e:
+            logging.error("snapshot: can't load %s: %s", self._file_name, e)
+            return None
+        if data.get("version") != self.version:
+            logging.warning("snapshot: ignoring version %r",
+                            data.get("version"))
+            return None
+        ts = data.pop("time", 0)
+        self._last_data = self._encode(data)
+        logging.info("snapshot: loaded %s (%d bytes, age %ds)",
+                     self._file_name, len(raw), time.time() - ts)
+        return data
+
+    def save(self, data, force=False):
+        """Save the snapshot dict. Return True if it was written."""
+        now = time.time()
+        if not force and self._last_save is not None:
+            if now - self._last_save < self._min_interval:
+                return False
+        data = dict(data)
+        data["version"] = self.version
+        # time is excluded from change detection
+        raw = self._encode(data)
+        if raw == self._last_data:
+            logging.debug("snapshot: unchanged")
+            self._last_save = now
+            return False
+        data["time"] = now
+        out = self._encode(data)
+        try:
+            atomic_write(self._file_name, out)
+        except OSError as e:
+            logging.error("snapshot: can't save %s: %s", self._file_name, e)
+            return False
+        self._last_save = now
+        self._last_data = raw
+        logging.info("snapshot: saved %s (%d bytes)",
+                     self._file_name, len(out))
+        return True
+
+    def _encode(self, data):
+        return json.dumps(data, separators=(",", ":"),
+                          sort_keys=True).encode("utf-8")
@@ -0,0 +1,354 @@
+"""Multi-resolution history of temperature samples."""
+
+import copy
+from array import array
+from bisect import bisect_left
+
+
+class TempRing:
+    """A fixed size ring of time stamped records.
+
+    Each record consists of a time stamp and num_values floats. All
+    records are stored in flat arrays so memory usage is constant.
+    """
+
+    def __init__(self, size, num_values):
+        """Create an empty ring with room for size records."""
+        self._size = size
+        self._num_values = num_values
+        self._times = array('d', [0.0]) * size
+        self._values = array('d', [0.0]) * (size * num_values)
+        self._pos = 0
+        self._count = 0
+
+    def __len__(self):
+        """Return number of records stored."""
+        return self._count
+
+    def get_size(self):
+        """Return maximum number of records."""
+        return self._size
+
+    def get_num_values(self):
+        """Return number of values per record."""
+        return self._num_values
+
+    def get_period(self):
+        """Return length of a record in seconds, 0 for raw samples."""
+        return 0
+
+    def clear(self):
+        """Remove all records."""
+        self._pos = 0
+        self._count = 0
+
+    def append(self, ts, values):
+        """Add a new record and drop the oldest one if ring is full."""
+        pos = self._pos
+        n = self._num_values
+        self._times[pos] = ts
+        off = pos * n
+        self._values[off:off + n] = array('d', values)
+        pos += 1
+        if pos == self._size:
+            pos = 0
+        self._pos = pos
+        if self._count < self._size:
+            self._count += 1
+
+    def _slot(self, idx):
+        if idx < 0:
+            idx += self._count
+        if idx < 0 or idx >= self._count:
+            raise IndexError("ring index out of range")
+        return (self._pos - self._count + idx) % self._size
+
+    def get_time(self, idx):
+        """Return time stamp of record idx (0 is the oldest)."""
+        return self._times[self._slot(idx)]
+
+    def get_values(self, idx):
+        """Return values of record idx (0 is the oldest) as an array."""
+        off = self._slot(idx) * self._num_values
+        return self._values[off:off + self._num_values]
+
+    def get_last(self, num):
+        """Return list of (time, values) for the last num records."""
+        num = min(num, self._count)
+        result = []
+        for idx in range(self._count - num, self._count):
+            result.append((self.get_time(idx), self.get_values(idx)))
+        return result
+
+    def covers(self, ts):
+        """Return True if no record since time ts was dropped."""
+        return self._count < self._size or self.get_time(0) <= ts
+
+    def get_since(self, ts):
+        """Return list of (time, values) of all records from time ts on."""
+        # records are sorted by time
+        idx = bisect_left(_RingTimes(self), ts)
+        return self.get_last(self._count - idx)
+
+    def remap(self, num_channels, channel_map):
+        """Return a copy with channels moved by (old, new) index pairs."""
+        ring = self._new_ring(num_channels)
+        n = ring.get_num_values() // num_channels if num_channels else 1
+        for ts, values in self.get_last(self._count):
+            ring.append(ts, _remap_values(values, num_channels, n,
+                                          channel_map))
+        return ring
+
+    def _new_ring(self, num_channels):
+        return TempRing(self._size, num_channels)
+
+
+def _remap_values(values, num_channels, n, channel_map):
+    """Move groups of n values per channel, new channels are 0."""
+    result = array('d', [0.0]) * (num_channels * n)
+    for old, new in channel_map:
+        result[new * n:new * n + n] = values[old * n:old * n + n]
+    return result
+
+
+class _RingTimes:
+    """Sequence view on the time stamps of a ring for bisect."""
+
+    def __init__(self, ring):
+        self._ring = ring
+
+    def __len__(self):
+        return len(self._ring)
+
+    def __getitem__(self, idx):
+        return self._ring.get_time(idx)
+
+
+class TempBucketRing(TempRing):
+    """A ring that decimates samples into (min, max, avg) time buckets.
+
+    Samples are accumulated in the current bucket and a record with
+    min, max and average of each channel is appended once a sample of
+    a later bucket arrives.
+    """
+
+    def __init__(self, size, num_channels, period):
+        """Create a bucket ring with period seconds per record."""
+        super().__init__(size, num_channels * 3)
+        self._num_channels = num_channels
+        self._period = period
+        self._bucket = None
+        self._min = array('d', [0.0]) * num_channels
+        self._max = array('d', [0.0]) * num_channels
+        self._sum = array('d', [0.0]) * num_channels
+        self._num = 0
+
+    def get_period(self):
+        """Return length of a bucket in seconds."""
+        return self._period
+
+    def clear(self):
+        """Remove all records and the pending bucket."""
+        super().clear()
+        self._bucket = None
+        self._num = 0
+
+    def add_sample(self, ts, values):
+        """Add a raw sample to the current bucket."""
+        bucket = int(ts // self._period)
+        if bucket != self._bucket:
+            self.flush()
+            # flush may have changed the period
+            self._bucket = int(ts // self._period)
+            self._min[:] = array('d', values)
+            self._max[:] = array('d', values)
+            self._sum[:] = array('d', values)
+            self._num = 1
+            return
+        mins = self._min
+        maxs = self._max
+        sums = self._sum
+        for i, v in enumerate(values):
+            if v < mins[i]:
+                mins[i] = v
+            if v > maxs[i]:
+                maxs[i] = v
+            sums[i] += v
+        self._num += 1
+
+    def flush(self):
+        """Append the pending bucket as a record."""
+        if not self._num:
+            return
+        self.append(self._bucket * self._period, self._pending_values())
+        self._num = 0
+
+    def get_pending(self):
+        """Return (time, values) of the pending bucket or None."""
+        if not self._num:
+            return None
+        return self._bucket * self._period, self._pending_values()
+
+    def get_since(self, ts):
+        """Return list of (time, values) from time ts incl. pending bucket."""
+        result = super().get_since(ts)
+        pending = self.get_pending()
+        if pending:
+            result.append(pending)
+        return result
+
+    def remap(self, num_channels, channel_map):
+        """Return a copy with channels moved incl. the pending bucket."""
+        ring = super().remap(num_channels, channel_map)
+        ring._bucket = self._bucket
+        ring._num = self._num
+        ring._min = _remap_values(self._min, num_channels, 1, channel_map)
+        ring._max = _remap_values(self._max, num_channels, 1, channel_map)
+        ring._sum = _remap_values(self._sum, num_channels, 1, channel_map)
+        return ring
+
+    def _new_ring(self, num_channels):
+        return type(self)(self._size, num_channels, self._period)
+
+    def _pending_values(self):
+        rec = array('d')
+        num = self._num
+        for i in range(self._num_channels):
+            rec.append(self._min[i])
+            rec.append(self._max[i])
+            rec.append(self._sum[i] / num)
+        return rec
+
+
+class TempSpanRing(TempBucketRing):
+    """A bucket ring that covers all samples ever added.
+
+    If the ring is full, neighbouring buckets are merged and the period
+    is doubled, so the whole time since the first sample is kept at a
+    resolution that only depends on the ring size. Merged averages are
+    the mean of the bucket averages.
+    """
+
+    def flush(self):
+        """Append the pending bucket and merge buckets if ring is full."""
+        if self._num and len(self) == self.get_size():
+            self._compact()
+        super().flush()
+
+    def _compact(self):
+        records = self.get_last(len(self))
+        n = self._num_channels
+        period = self._period
+        while True:
+            period *= 2
+            merged = []
+            for ts, values in records:
+                bucket = int(ts // period)
+                if merged and merged[-1][0] == bucket:
+                    last = merged[-1]
+                    last[1] += 1
+                    vals = last[2]
+                    for i in range(0, n * 3, 3):
+                        vals[i] = min(vals[i], values[i])
+                        vals[i + 1] = max(vals[i + 1], values[i + 1])
+                        vals[i + 2] += values[i + 2]
+                else:
+                    merged.append([bucket, 1, array('d', values)])
+            if len(merged) <= self.get_size() // 2:
+                break
+        TempRing.clear(self)
+        for bucket, num, vals in merged:
+            for i in range(2, n * 3, 3):
+                vals[i] /= num
+            self.append(bucket * period, vals)
+        # keep pending samples in the bucket of the new period
+        self._bucket = int(self._bucket * self._period // period)
+        self._period = period
+
+
+class TempHistory:
+    """Keep temperature samples at several resolutions.
+
+    Level 0 holds the raw samples. The following levels hold
+    (min, max, avg) buckets of the given periods and the last level
+    is a TempSpanRing covering all samples. Memory is fixed
+    regardless of the time covered.
+    """
+
+    def __init__(self, num_channels, raw_size=600, levels=((5, 1500),),
+                 span=(60, 1024)):
+        """Create a history for samples with num_channels values."""
+        self._num_channels = num_channels
+        self._raw = TempRing(raw_size, num_channels)
+        self._buckets = []
+        for period, size in levels:
+            self._buckets.append(TempBucketRing(size, num_channels, period))
+        period, size = span
+        self._buckets.append(TempSpanRing(size, num_channels, period))
+        self._start_time = None
+
+    def get_num_channels(self):
+        """Return number of values per sample."""
+        return self._num_channels
+
+    def get_num_levels(self):
+        """Return number of resolution levels incl. the raw one."""
+        return len(self._buckets) + 1
+
+    def get_level(self, idx):
+        """Return ring of given level. 0 is raw, >0 are bucket rings."""
+        if idx == 0:
+            return self._raw
+        return self._buckets[idx - 1]
+
+    def get_raw(self):
+        """Return ring of raw samples."""
+        return self._raw
+
+    def get_span(self):
+        """Return the ring covering all samples."""
+        return self._buckets[-1]
+
+    def get_start_time(self):
+        """Return time of the first sample or None if empty."""
+        return self._start_time
+
+    def get_end_time(self):
+        """Return time of the newest sample or None if empty."""
+        if not len(self._raw):
+            return None
+        return self._raw.get_time(-1)
+
+    def find_level(self, period, ts):
+        """Return finest ring with period or less holding all since ts.
+
+        Falls back to the span ring if no level reaches back to ts.
+        """
+        for ring in [self._raw] + self._buckets:
+            if ring.get_period() <= period and ring.covers(ts):
+                return ring
+        return self.get_span()
+
+    def remap(self, num_channels, channel_map):
+        """Return a copy with channels moved by (old, new) index pairs."""
+        history = copy.copy(self)
+        history._num_channels = num_channels
+        history._raw = self._raw.remap(num_channels, channel_map)
+        history._buckets = [ring.remap(num_channels, channel_map)
+                            for ring in self._buckets]
+        return history
+
+    def clear(self):
+        """Remove all samples."""
+        self._raw.clear()
+        for ring in self._buckets:
+            ring.clear()
+        self._start_time = None
+
+    def add(self, ts, values):
+        """Add a new sample to all levels."""
+        if self._start_time is None:
+            self._start_time = ts
+        self._raw.append(ts, values)
+        for ring in self._buckets:
+            ring.add_sample(ts, values)
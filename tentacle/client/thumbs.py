@@ -0,0 +1,303 @@
+"""Thumbnails embedded in G-code files."""
+
+import base64
+import binascii
+import collections
+import hashlib
+import logging
+import os
+import re
+
+from PyQt5.QtCore import (
+    Qt, QObject, QRunnable, QThreadPool, QBuffer, QByteArray, QIODevice,
+    pyqtSignal
+)
+from PyQt5.QtGui import QImage, QPixmap, QIcon
+
+from tentacle.util import atomic_write
+from .download import download_range
+
+
+_BEGIN_RE = re.compile(
+    rb"^; thumbnail(?:_(PNG|JPG|QOI))? begin (\d+)x(\d+) (\d+)")
+_END_RE = re.compile(rb"^; thumbnail(?:_(?:PNG|JPG|QOI))? end")
+
+
+def parse_thumbnails(data):
+    """Find thumbnails in the header of a G-code file.
+
+    Return a list of (width, height, image data) of all complete
+    thumbnails and the number of bytes needed to complete a truncated
+    one or 0.
+    """
+    result = []
+    need = 0
+    pos = 0
+    size = len(data)
+    cur = None
+    while pos < size:
+        end = data.find(b"\n", pos)
+        if end < 0:
+            # incomplete last line
+            break
+        line = data[pos:end].rstrip()
+        start = pos
+        pos = end + 1
+        if cur is None:
+            m = _BEGIN_RE.match(line)
+            if m:
+                fmt, w, h, num = m.groups()
+                cur = (fmt, int(w), int(h), int(num), start, [])
+        elif _END_RE.match(line):
+            fmt, w, h, _, _, chunks = cur
+            cur = None
+            if fmt == b"QOI":
+                continue
+            try:
+                img = base64.b64decode(b"".join(chunks))
+            except (binascii.Error, ValueError):
+                logging.error("thumbs: invalid base64 data")
+                continue
+            result.append((w, h, img))
+        else:
+            chunks = cur[5]
+            chunks.append(line[2:] if line.startswith(b"; ") else line)
+    if cur is not None:
+        # "; " and line break every 78 chars
+        need = cur[4] + cur[3] * 81 // 78 + 256
+    return result, need
+
+
+def pick_thumbnail(thumbs, size):
+    """Return data of smallest thumbnail covering size or the largest."""
+    if not thumbs:
+        return None
+    thumbs = sorted(thumbs, key=lambda t: t[0] * t[1])
+    for w, h, img in thumbs:
+        if w >= size and h >= size:
+            return img
+    return thumbs[-1][2]
+
+
+class ThumbTask(QRunnable):
+    """Load a thumbnail from disk cache or from the server."""
+
+    def __init__(self, cache, path, date):
+        """Create task for file path with given date."""
+        super().__init__()
+        self._cache = cache
+        self._path = path
+        self._date = date
+
+    def run(self):
+        """Run download and decoding in a pool thread."""
+        cache = self._cache
+        file_name = cache.get_file_name(self._path, self._date)
+        image = None
+        found = False
+        if file_name and os.path.exists(file_name):
+            # empty file marks a file without thumbnail
+            if os.path.getsize(file_name):
+                image = QImage(file_name)
+            found = True
+        if not found:
+            try:
+                image = self._load()
+            except IOError as e:
+                logging.error("thumbs: %s: %s", self._path, e)
+                cache.taskDone.emit(self._path, self._date, None, False)
+                return
+            # None here means the downloaded head has no thumbnail
+            if file_name:
+                self._save(file_name, image)
+        cache.taskDone.emit(self._path, self._date, image, True)
+
+    def _load(self):
+        cache = self._cache
+        url = cache.get_client().get_download_url(self._path)
+        if not url:
+            # not a result: do not mark the file as without thumbnail
+            raise IOError("download not available")
+        api_key = cache.get_client().get_api_key()
+        head_size = cache.get_head_size()
+        data = download_range(url, api_key, 0, head_size)
+        thumbs, need = parse_thumbnails(data)
+        if not thumbs and need and len(data) == head_size:
+            # a large thumbnail did not fit. get the rest of it
+            need = min(need, cache.get_max_head_size())
+            if need > head_size:
+                data += download_range(url, api_key, head_size, need)
+                thumbs, _ = parse_thumbnails(data)
+        img_data = pick_thumbnail(thumbs, cache.get_icon_size())
+        if not img_data:
+            logging.info("thumbs: none in %s", self._path)
+            return None
+        image = QImage()
+        if not image.loadFromData(img_data):
+            logging.error("thumbs: can't decode %s", self._path)
+            return None
+        size = cache.get_icon_size()
+        return image.scaled(size, size, Qt.KeepAspectRatio,
+                            Qt.SmoothTransformation)
+
+    def _save(self, file_name, image):
+        data = b""
+        if image is not None:
+            buf = QByteArray()
+            dev = QBuffer(buf)
+            dev.open(QIODevice.WriteOnly)
+            image.save(dev, "PNG")
+            data = bytes(buf)
+        try:
+            atomic_write(file_name, data)
+        except OSError as e:
+            logging.error("thumbs: can't save %s: %s", file_name, e)
+
+
+class ThumbCache(QObject):
+    """A bounded memory and disk cache of file thumbnails.
+
+    Thumbnails are keyed by path and file date. Missing ones are loaded
+    in background and updateThumb is emitted once they are available.
+    """
+
+    # path of file whose thumbnail is available now
+    updateThumb = pyqtSignal(str)
+    # internal: emitted by pool threads. path, date, QImage, ok
+    taskDone = pyqtSignal(str, object, object, bool)
+
+    # milliseconds to wait for running downloads on stop
+    stop_timeout = 5000
+
+    def __init__(self, client, cache_dir=None, icon_size=20,
+                 max_memory=256, max_disk=2000, head_size=65536,
+                 max_head_size=524288, num_workers=2):
+        """Create a thumbnail cache for the given OctoClient."""
+        super().__init__()
+        self._client = client
+        self._cache_dir = cache_dir
+        self._icon_size = icon_size
+        self._max_memory = max_memory
+        self._max_disk = max_disk
+        self._head_size = head_size
+        self._max_head_size = max_head_size
+        # path -> (date, QIcon or None)
+        self._memory = collections.OrderedDict()
+        # disk file name -> None, oldest first
+        self._disk = collections.OrderedDict()
+        # path hash -> disk file name
+        self._disk_names = {}
+        self._pending = set()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(num_workers)
+        self.taskDone.connect(self._on_task_done)
+        if cache_dir:
+            self._scan_disk()
+
+    def get_client(self):
+        """Return the OctoClient used for downloads."""
+        return self._client
+
+    def get_icon_size(self):
+        """Return size of thumbnails in pixels."""
+        return self._icon_size
+
+    def get_head_size(self):
+        """Return number of bytes read from the start of a file."""
+        return self._head_size
+
+    def get_max_head_size(self):
+        """Return maximum number of bytes read for a large thumbnail."""
+        return self._max_head_size
+
+    def get_file_name(self, path, date):
+        """Return disk cache file of path and date or None."""
+        if not self._cache_dir:
+            return None
+        return os.path.join(self._cache_dir, "%s-%s.png" % (
+            self._hash(path), date or 0))
+
+    def _hash(self, path):
+        return hashlib.sha1(path.encode("utf-8")).hexdigest()
+
+    def _scan_disk(self):
+        try:
+            names = os.listdir(self._cache_dir)
+        except OSError:
+            return
+        entries = []
+        for name in names:
+            if name.endswith(".png") and "-" in name:
+                full = os.path.join(self._cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(full), name))
+                except OSError:
+                    pass
+        for _, name in sorted(entries):
+            self._add_disk(name)
+        logging.info("thumbs: %d on disk", len(self._disk))
+
+    def _add_disk(self, name):
+        key = name.partition("-")[0]
+        old = self._disk_names.get(key)
+        if old and old != name:
+            # older version of same file
+            self._remove_disk(old)
+        self._disk_names[key] = name
+        self._disk[name] = None
+        self._disk.move_to_end(name)
+        while len(self._disk) > self._max_disk:
+            self._remove_disk(next(iter(self._disk)))
+
+    def _remove_disk(self, name):
+        self._disk.pop(name, None)
+        key = name.partition("-")[0]
+        if self._disk_names.get(key) == name:
+            del self._disk_names[key]
+        try:
+            os.remove(os.path.join(self._cache_dir, name))
+        except OSError as e:
+            logging.error("thumbs: can't remove %s: %s", name, e)
+
+    def get_icon(self, path, date):
+        """Return icon of file, None if it is unknown yet or has none.
+
+        Unknown thumbnails are loaded in background.
+        """
+        entry = self._memory.get(path)
+        if entry is not None and entry[0] == date:
+            self._memory.move_to_end(path)
+            return entry[1]
+        if path not in self._pending:
+            self._pending.add(path)
+            self._pool.start(ThumbTask(self, path, date))
+        return None
+
+    def remove(self, path):
+        """Drop thumbnail of path from memory."""
+        self._memory.pop(path, None)
+
+    def stop(self):
+        """Drop queued requests and wait a while for running ones."""
+        self._pool.clear()
+        if not self._pool.waitForDone(self.stop_timeout):
+            logging.error("thumbs: downloads still running on stop")
+        self._pending.clear()
+
+    def _on_task_done(self, path, date, image, ok):
+        if path not in self._pending:
+            return
+        self._pending.discard(path)
+        icon = None
+        if image is not None and not image.isNull():
+            icon = QIcon(QPixmap.fromImage(image))
+        self._memory[path] = (date, icon)
+        self._memory.move_to_end(path)
+        while len(self._memory) > self._max_memory:
+            self._memory.popitem(last=False)
+        # failed downloads are retried once dropped from memory
+        file_name = self.get_file_name(path, date)
+        if file_name and ok:
+            self._add_disk(os.path.basename(file_name))
+        if icon is not None:
+            self.updateThumb.emit(path)
@@ -0,0 +1,193 @@
+"""Upload local files to OctoPrint."""
+
+import logging
+import os
+import time
+import uuid
+import http.client
+import urllib.parse
+
+from PyQt5.QtCore import QObject, pyqtSignal, QThread
+
+
+class UploadCancelled(Exception):
+    """Raised when an upload was cancelled."""
+
+
+def _quote(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def upload_file(url, api_key, file_name, target_dir="", chunk_size=65536,
+                progress=None, is_cancelled=None, timeout=30.0):
+    """Stream a local file as multipart form to the OctoPrint upload URL.
+
+    The file is sent in chunks of chunk_size bytes through one reused
+    buffer so memory use does not depend on the file size. progress is
+    called with (bytes sent, total bytes). Raises IOError on failure
+    and UploadCancelled if is_cancelled returns True.
+    """
+    boundary = uuid.uuid4().hex
+    name = os.path.basename(file_name)
+    head = ""
+    if target_dir:
+        head += ('--%s\r\nContent-Disposition: form-data; name="path"'
+                 '\r\n\r\n%s\r\n') % (boundary, target_dir)
+    head += ('--%s\r\nContent-Disposition: form-data; name="file"; '
+             'filename="%s"\r\nContent-Type: application/octet-stream'
+             '\r\n\r\n') % (boundary, _quote(name))
+    head = head.encode("utf-8")
+    tail = ("\r\n--%s--\r\n" % boundary).encode("ascii")
+    file_size = os.path.getsize(file_name)
+    total = len(head) + file_size + len(tail)
+
+    url = urllib.parse.urlparse(url)
+    if url.scheme == "https":
+        con = http.client.HTTPSConnection(url.netloc, timeout=timeout)
+    else:
+        con = http.client.HTTPConnection(url.netloc, timeout=timeout)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    sent = 0
+    try:
+        con.putrequest("POST", url.path)
+        if api_key:
+            con.putheader("X-Api-Key", api_key)
+        con.putheader("Content-Type",
+                      "multipart/form-data; boundary=" + boundary)
+        con.putheader("Content-Length", str(total))
+        con.endheaders()
+        con.send(head)
+        sent = len(head)
+        with open(file_name, "rb") as fobj:
+            while True:
+                if is_cancelled and is_cancelled():
+                    raise UploadCancelled()
+                num = fobj.readinto(buf)
+                if not num:
+                    break
+                con.send(view[:num])
+                sent += num
+                if progress:
+                    progress(sent, total)
+        con.send(tail)
+        sent += len(tail)
+        if progress:
+            progress(sent, total)
+        resp = con.getresponse()
+        body = resp.read()
+        if resp.status not in (200, 201):
+            raise IOError("upload: %d %s: %s" % (
+                resp.status, resp.reason, body[:200]))
+    except http.client.HTTPException as e:
+        raise IOError("upload: %s" % e)
+    finally:
+        con.close()
+    return total
+
+
+class UploadWorker(QThread):
+    """Worker thread that runs a single upload."""
+
+    def __init__(self, uploader, file_name, target_dir):
+        """Create worker for given local file."""
+        super().__init__()
+        self._uploader = uploader
+        self._file_name = file_name
+        self._target_dir = target_dir
+        self._cancel = False
+        self._last_progress = 0
+
+    def cancel(self):
+        """Request to cancel the upload."""
+        self._cancel = True
+
+    def run(self):
+        """Run the upload."""
+        up = self._uploader
+        client = up.get_client()
+        url = client.get_upload_url()
+        error = ""
+        t0 = time.monotonic()
+        try:
+            if not url:
+                raise IOError("upload not available")
+            total = upload_file(url, client.get_api_key(), self._file_name,
+                                self._target_dir, up.get_chunk_size(),
+                                self._progress, self._is_cancelled)
+            delta = max(time.monotonic() - t0, 0.001)
+            logging.info("upload: %s: %d bytes in %.1fs (%.0f KiB/s)",
+                         self._file_name, total, delta,
+                         total / delta / 1024)
+        except UploadCancelled:
+            logging.info("upload: cancelled: %s", self._file_name)
+            error = "cancelled"
+        except OSError as e:
+            logging.error("upload: %s: %s", self._file_name, e)
+            error = str(e)
+        up.uploadDone.emit(self._file_name, error)
+
+    def _is_cancelled(self):
+        return self._cancel
+
+    def _progress(self, sent, total):
+        # limit signal rate to keep GUI thread idle
+        now = time.monotonic()
+        if sent == total or now - self._last_progress >= 0.2:
+            self._last_progress = now
+            self._uploader.uploadProgress.emit(sent, total)
+
+
+class Uploader(QObject):
+    """Upload local files to OctoPrint one at a time in background."""
+
+    # bytes sent, total bytes
+    uploadProgress = pyqtSignal(object, object)
+    # local file name, error message or empty if ok
+    uploadDone = pyqtSignal(str, str)
+
+    def __init__(self, client, chunk_size=65536):
+        """Create uploader for given OctoClient."""
+        super().__init__()
+        self._client = client
+        self._chunk_size = chunk_size
+        self._thread = None
+        self.uploadDone.connect(self._on_done)
+
+    def get_client(self):
+        """Return the OctoClient used for uploads."""
+        return self._client
+
+    def get_chunk_size(self):
+        """Return size of chunks sent."""
+        return self._chunk_size
+
+    def is_busy(self):
+        """Return True if an upload is running."""
+        return self._thread is not None
+
+    def start(self, file_name, target_dir=""):
+        """Start uploading a file into target dir. Return False if busy."""
+        if self._thread:
+            return False
+        logging.info("upload: start %s -> %r", file_name, target_dir)
+        self._thread = UploadWorker(self, file_name, target_dir)
+        self._thread.start()
+        return True
+
+    def cancel(self):
+        """Cancel a running upload."""
+        if self._thread:
+            self._thread.cancel()
+
+    def stop(self):
+        """Cancel a running upload and wait for it."""
+        if self._thread:
+            self._thread.cancel()
+            self._thread.wait()
+            self._thread = None
+
+    def _on_done(self, file_name, error):
+        if self._thread:
+            self._thread.wait()
+            self._thread = None
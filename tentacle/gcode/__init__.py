@@ -0,0 +1,11 @@
+"""G-code processing without Qt dependencies."""
+
+from .analyze import GCodeAnalyzer, analyze_file  # noqa: F401
+from .cache import LayerCache  # noqa: F401
+from .heightmap import HeightMap  # noqa: F401
+from .interp import GCodeInterpreter  # noqa: F401
+from .layers import (  # noqa: F401
+    Layer, LayerIndex, LayerIndexer, build_index, decode_layer
+)
+from .segments import SegmentBuffer, SegmentDecimator  # noqa: F401
+from .track import PositionTracker  # noqa: F401
@@ -0,0 +1,7 @@
+"""Analyze a G-code file given on the command line."""
+
+import sys
+
+from .analyze import main
+
+sys.exit(main(sys.argv))
@@ -0,0 +1,166 @@
+"""Single pass streaming analysis of G-code files.
+
+Run as ``python -m tentacle.gcode <url or file>`` to analyze a file in
+a separate process. The result is printed as JSON in the
+format of OctoPrint's ``gcodeAnalysis``. The API key for downloads is
+taken from the TENTACLE_API_KEY environment variable.
+"""
+
+import os
+import sys
+import json
+import urllib.request
+
+from .interp import GCodeInterpreter
+
+
+class GCodeAnalyzer(GCodeInterpreter):
+    """Collect print area, layers, filament and extrusion statistics.
+
+    Lines are fed in one at a time, so memory use does not depend on
+    the size of the file.
+    """
+
+    # minimum Z step that starts a new layer
+    layer_step = 0.01
+
+    def __init__(self, arc_tolerance=0.05):
+        """Create an analyzer in the default state of a printer."""
+        super().__init__(arc_tolerance)
+        # extruded filament per tool
+        self._filament = {}
+        # print area of extruding moves
+        self._min = None
+        self._max = None
+        self._layers = 0
+        self._layer_z = None
+        # statistics
+        self._time = 0.0
+        self._num_extrude = 0
+        self._num_travel = 0
+        self._num_retract = 0
+        self._extrude_dist = 0.0
+        self._travel_dist = 0.0
+
+    def _on_move(self, old_x, old_y, old_z, de):
+        pos = self._pos
+        dx = pos[0] - old_x
+        dy = pos[1] - old_y
+        dz = pos[2] - old_z
+        dist = (dx * dx + dy * dy + dz * dz) ** 0.5
+        if de:
+            tool = self._tool
+            self._filament[tool] = self._filament.get(tool, 0.0) + de
+        if de > 0 and (dx or dy):
+            self._num_extrude += 1
+            self._extrude_dist += dist
+            self._update_area(old_x, old_y, pos[0], pos[1], pos[2])
+        elif dist:
+            self._num_travel += 1
+            self._travel_dist += dist
+        elif de < 0:
+            self._num_retract += 1
+        # time without acceleration
+        if dist:
+            self._time += dist * 60.0 / self._feed
+        elif de:
+            self._time += abs(de) * 60.0 / self._feed
+
+    def _update_area(self, x0, y0, x1, y1, z):
+        if self._min is None:
+            self._min = [min(x0, x1), min(y0, y1), z]
+            self._max = [max(x0, x1), max(y0, y1), z]
+        else:
+            mi = self._min
+            ma = self._max
+            for x in (x0, x1):
+                if x < mi[0]:
+                    mi[0] = x
+                elif x > ma[0]:
+                    ma[0] = x
+            for y in (y0, y1):
+                if y < mi[1]:
+                    mi[1] = y
+                elif y > ma[1]:
+                    ma[1] = y
+            if z < mi[2]:
+                mi[2] = z
+            elif z > ma[2]:
+                ma[2] = z
+        # count layers by increasing extrusion height
+        if self._layer_z is None or z >= self._layer_z + self.layer_step:
+            self._layers += 1
+            self._layer_z = z
+
+    def _on_retract(self, retract):
+        if retract:
+            self._num_retract += 1
+
+    def get_result(self):
+        """Return results in the format of OctoPrint's gcodeAnalysis."""
+        result = {
+            "estimatedPrintTime": self._time,
+            "filament": {},
+            "layers": self._layers,
+            "extrusion": {
+                "lines": self._num_lines,
+                "moves": self._num_extrude,
+                "travels": self._num_travel,
+                "retractions": self._num_retract,
+                "extrudeDistance": self._extrude_dist,
+                "travelDistance": self._travel_dist
+            },
+            "analyzer": "tentacle"
+        }
+        for tool, length in sorted(self._filament.items()):
+            result["filament"]["tool%d" % tool] = {"length": length}
+        if self._min is not None:
+            mi = self._min
+            ma = self._max
+            result["printingArea"] = {
+                "minX": mi[0], "maxX": ma[0],
+                "minY": mi[1], "maxY": ma[1],
+                "minZ": mi[2], "maxZ": ma[2]
+            }
+            result["dimensions"] = {
+                "width": ma[0] - mi[0],
+                "depth": ma[1] - mi[1],
+                "height": ma[2] - mi[2]
+            }
+        return result
+
+
+def analyze_file(fobj):
+    """Analyze a binary file object and return the result dict."""
+    analyzer = GCodeAnalyzer()
+    analyzer.feed(fobj)
+    return analyzer.get_result()
+
+
+def _open(name):
+    if "://" not in name:
+        return open(name, "rb")
+    headers = {}
+    api_key = os.environ.get("TENTACLE_API_KEY")
+    if api_key:
+        headers["X-Api-Key"] = api_key
+    req = urllib.request.Request(name, headers=headers)
+    return urllib.request.urlopen(req, timeout=30)
+
+
+def main(argv):
+    """Analyze the file or URL given on the command line."""
+    if len(argv) != 2:
+        print("Usage: %s <url or file>" % argv[0], file=sys.stderr)
+        return 1
+    # stay out of the way of the UI
+    if hasattr(os, "nice"):
+        os.nice(10)
+    try:
+        with _open(argv[1]) as fobj:
+            result = analyze_file(fobj)
+    except (IOError, ValueError) as e:
+        print("analyze: %s: %s" % (argv[1], e), file=sys.stderr)
+        return 2
+    json.dump(result, sys.stdout)
+    return 0
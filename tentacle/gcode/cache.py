@@ -0,0 +1,137 @@
+"""Bounded cache of layer moves that spills to a memory mapped file."""
+
+import bisect
+import collections
+import mmap
+import tempfile
+
+from .segments import SegmentBuffer
+
+
+class LayerCache:
+    """Keep the SegmentBuffers of the layers of a print by Z height.
+
+    At most max_layers buffers are held in memory. Older ones are
+    appended to an unnamed temp file and read back through a memory
+    map when they are needed again, so a whole print can be scrubbed
+    without parsing it again.
+    """
+
+    def __init__(self, max_layers=16):
+        """Create an empty cache."""
+        self._max_layers = max_layers
+        # key -> SegmentBuffer, least recently used first
+        self._memory = collections.OrderedDict()
+        # key -> (offset, num xy, num flags, num runs) in spill file
+        self._spilled = {}
+        # sorted keys of all layers
+        self._keys = []
+        self._file = None
+        self._map = None
+        self._file_size = 0
+
+    def __len__(self):
+        """Return number of layers."""
+        return len(self._keys)
+
+    def __contains__(self, z):
+        """Check if layer at height z is cached."""
+        key = self._key(z)
+        return key in self._memory or key in self._spilled
+
+    def _key(self, z):
+        # micrometers avoid float noise in Z
+        return int(round(z * 1000))
+
+    def get_heights(self):
+        """Return sorted Z heights of all cached layers."""
+        return [key / 1000.0 for key in self._keys]
+
+    def get_num_spilled(self):
+        """Return number of layers stored in the spill file."""
+        return len(self._spilled)
+
+    def get_spill_size(self):
+        """Return size of the spill file in bytes."""
+        return self._file_size
+
+    def put(self, z, segments):
+        """Store the moves of the layer at height z."""
+        key = self._key(z)
+        if key not in self._memory and key not in self._spilled:
+            bisect.insort(self._keys, key)
+        # a new version replaces the spilled one
+        self._spilled.pop(key, None)
+        self._memory[key] = segments
+        self._memory.move_to_end(key)
+        self._trim()
+
+    def get(self, z):
+        """Return SegmentBuffer of layer at height z or None."""
+        key = self._key(z)
+        segments = self._memory.get(key)
+        if segments is not None:
+            self._memory.move_to_end(key)
+            return segments
+        entry = self._spilled.get(key)
+        if entry is None:
+            return None
+        segments = self._load(entry)
+        # keep spilled copy, so it is dropped without writing again
+        self._memory[key] = segments
+        self._trim()
+        return segments
+
+    def clear(self):
+        """Drop all layers and the spill file."""
+        self._memory.clear()
+        self._spilled.clear()
+        self._keys = []
+        if self._map:
+            self._map.close()
+            self._map = None
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._file_size = 0
+
+    def _trim(self):
+        while len(self._memory) > self._max_layers:
+            key, segments = self._memory.popitem(last=False)
+            if key not in self._spilled:
+                self._spill(key, segments)
+
+    def _spill(self, key, segments):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix="tentacle-layers-")
+        offset = self._file_size
+        self._file.seek(offset)
+        size = 0
+        for arr in (segments.xy, segments.flags, segments.runs):
+            data = arr.tobytes()
+            self._file.write(data)
+            size += len(data)
+        self._file.flush()
+        self._file_size += size
+        self._spilled[key] = (offset, len(segments.xy), len(segments.flags),
+                              len(segments.runs))
+
+    def _load(self, entry):
+        offset, num_xy, num_flags, num_runs = entry
+        segments = SegmentBuffer()
+        if not num_flags:
+            return segments
+        if self._map is None or len(self._map) < self._file_size:
+            # file grew since it was mapped
+            if self._map:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), self._file_size,
+                                  access=mmap.ACCESS_READ)
+        with memoryview(self._map) as view:
+            for arr, num in ((segments.xy, num_xy),
+                             (segments.flags, num_flags),
+                             (segments.runs, num_runs)):
+                size = arr.itemsize * num
+                arr.frombytes(view[offset:offset + size])
+                offset += size
+        return segments
@@ -0,0 +1,103 @@
+"""Raster of the maximum height printed at every point of the bed."""
+
+import array
+import math
+
+from .segments import SegmentBuffer
+
+
+class HeightMap:
+    """Maximum Z and tool of all extrusions on a fixed grid.
+
+    The grid covers x0..x1 and y0..y1 with square cells of the given
+    size, so memory is constant for a print of any length. Segments are
+    rasterized as they arrive and only touch the cells they cross.
+
+    For display every cell also holds a byte in ``pixels`` (rows padded
+    to 4 bytes) that is 0 for empty cells and otherwise the tool in bit
+    7 and the Z level in bits 0-6. Z is quantized in 126 steps up to
+    max_z, so shading the levels only needs a new color table.
+    """
+
+    max_size = 1024
+    num_levels = 126
+
+    def __init__(self, x0, y0, x1, y1, cell, max_z=100.0):
+        """Create an empty map of an area."""
+        cell = max(cell, (x1 - x0) / self.max_size, (y1 - y0) / self.max_size)
+        self.cell = cell
+        self.x0 = x0
+        self.y0 = y0
+        self.width = max(int(math.ceil((x1 - x0) / cell)), 1)
+        self.height = max(int(math.ceil((y1 - y0) / cell)), 1)
+        self.stride = (self.width + 3) & ~3
+        num = self.stride * self.height
+        self.z = array.array('f', bytes(4 * num))
+        self.tool = array.array('B', bytes(num))
+        self.pixels = bytearray(num)
+        self._z_step = max_z / self.num_levels
+        # highest level set so far
+        self.max_level = 0
+        # cells changed since last take_dirty()
+        self._dirty = False
+
+    def __repr__(self):
+        """Represent map."""
+        return "HeightMap(%dx%d, cell=%g)" % (self.width, self.height,
+                                              self.cell)
+
+    def add_segment(self, x0, y0, x1, y1, z, tool):
+        """Raise the cells crossed by the line from x0, y0 to x1, y1."""
+        cell = self.cell
+        cx = (x0 - self.x0) / cell
+        cy = (y0 - self.y0) / cell
+        dx = (x1 - self.x0) / cell - cx
+        dy = (y1 - self.y0) / cell - cy
+        num = int(max(abs(dx), abs(dy))) + 1
+        dx /= num
+        dy /= num
+        level = min(int(z / self._z_step) + 1, self.num_levels)
+        pixel = level | (tool & 1) << 7
+        width = self.width
+        height = self.height
+        stride = self.stride
+        zs = self.z
+        tools = self.tool
+        pixels = self.pixels
+        changed = False
+        for _ in range(num + 1):
+            ix = int(cx)
+            iy = int(cy)
+            if 0 <= ix < width and 0 <= iy < height:
+                pos = iy * stride + ix
+                if z >= zs[pos]:
+                    zs[pos] = z
+                    tools[pos] = tool
+                    if pixels[pos] != pixel:
+                        pixels[pos] = pixel
+                        changed = True
+            cx += dx
+            cy += dy
+        if changed:
+            self._dirty = True
+            if level > self.max_level:
+                self.max_level = level
+
+    def add_moves(self, segments, start, end, z):
+        """Add extruding moves [start, end) of a SegmentBuffer at z."""
+        start = max(start, 1)
+        xy = segments.xy
+        extrude = SegmentBuffer.extrude_flag
+        for first, last, flag in segments.iter_runs(start, end):
+            if not flag & extrude:
+                continue
+            tool = flag >> 1
+            for n in range(first, last):
+                self.add_segment(xy[n * 2 - 2], xy[n * 2 - 1],
+                                 xy[n * 2], xy[n * 2 + 1], z, tool)
+
+    def take_dirty(self):
+        """Return True if cells changed since last call."""
+        dirty = self._dirty
+        self._dirty = False
+        return dirty
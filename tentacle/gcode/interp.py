@@ -0,0 +1,301 @@
+"""Interpret the motion commands of G-code lines."""
+
+import math
+import re
+
+# letters of G-code words as found in bytes
+_X = ord('X')
+_Y = ord('Y')
+_Z = ord('Z')
+_E = ord('E')
+_F = ord('F')
+_I = ord('I')
+_J = ord('J')
+_R = ord('R')
+_N = ord('N')
+
+# a word is a letter followed by an optional number
+_WORD = re.compile(rb'([A-Za-z])[ \t]*([-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+))?')
+
+
+def _tokenize(line):
+    """Split a line without blanks between words like "N10G1X5"."""
+    words = [letter.upper() + value for letter, value in _WORD.findall(line)]
+    if words and words[0][0] == _N:
+        del words[0]
+    if words:
+        words[0] = _normalize(words[0])
+    return words
+
+
+def _normalize(cmd):
+    # G01 is G1
+    if len(cmd) > 2 and cmd[1] == 0x30:
+        cmd = cmd[:1] + (cmd[1:].lstrip(b'0') or b'0')
+    return cmd
+
+
+class GCodeInterpreter:
+    """Track the position of the print head over lines of G-code.
+
+    Handles linear moves and arcs (G0-G3), homing (G28), absolute and
+    relative positioning (G90/G91, M82/M83), position offsets (G92),
+    firmware retraction (G10/G11) and tool changes (Tn). Positions are
+    kept in machine coordinates, so they stay on the print bed after
+    G92. Arcs are split into straight moves that deviate at most
+    arc_tolerance from the curve.
+
+    Subclasses get every straight move by _on_move() and a firmware
+    retraction by _on_retract().
+    """
+
+    def __init__(self, arc_tolerance=0.05):
+        """Create an interpreter in the default state of a printer."""
+        self._pos = [0.0, 0.0, 0.0]
+        # G92 offset of machine to programmed position
+        self._g92_offset = [0.0, 0.0, 0.0]
+        self._e = 0.0
+        self._feed = 1500.0
+        self._abs_xyz = True
+        self._abs_e = True
+        self._tool = 0
+        self._num_lines = 0
+        self.set_arc_tolerance(arc_tolerance)
+
+    def set_arc_tolerance(self, tolerance):
+        """Set the maximum distance of arc segments to the curve in mm."""
+        self._arc_tolerance = max(tolerance, 1e-4)
+
+    def get_pos(self):
+        """Return the current (x, y, z) machine position."""
+        return tuple(self._pos)
+
+    def get_tool(self):
+        """Return the active tool."""
+        return self._tool
+
+    def get_state(self):
+        """Return the parser state needed to resume at a later line."""
+        pos = self._pos
+        off = self._g92_offset
+        return (pos[0], pos[1], pos[2], self._e, self._tool,
+                self._abs_xyz, self._abs_e, off[0], off[1], off[2])
+
+    def set_state(self, state):
+        """Resume parsing with a state returned by get_state()."""
+        (x, y, z, self._e, self._tool, self._abs_xyz, self._abs_e,
+         ox, oy, oz) = state
+        self._pos = [x, y, z]
+        self._g92_offset = [ox, oy, oz]
+
+    def feed_line(self, line):
+        """Process a line of G-code given as bytes."""
+        self._num_lines += 1
+        pos = line.find(b';')
+        if pos >= 0:
+            line = line[:pos]
+        words = line.split()
+        if not words:
+            return
+        cmd = words[0].upper()
+        if cmd[1:].isdigit() and cmd[0] != _N:
+            cmd = _normalize(cmd)
+        else:
+            # line number or no blanks between words
+            words = _tokenize(line)
+            if not words:
+                return
+            cmd = words[0]
+        if cmd == b'G1' or cmd == b'G0':
+            self._move(words, 0)
+        elif cmd == b'G2' or cmd == b'G3':
+            self._move(words, cmd[1] - 0x30)
+        elif cmd == b'G92':
+            self._set_pos(words)
+        elif cmd == b'G90':
+            self._abs_xyz = True
+            self._abs_e = True
+        elif cmd == b'G91':
+            self._abs_xyz = False
+            self._abs_e = False
+        elif cmd == b'M82':
+            self._abs_e = True
+        elif cmd == b'M83':
+            self._abs_e = False
+        elif cmd == b'G28':
+            self._home(words)
+        elif cmd == b'G10' or cmd == b'G11':
+            # G10 with P or L sets tool offsets
+            if len(words) == 1:
+                self._on_retract(cmd == b'G10')
+        elif cmd[0] == 0x54 and cmd[1:].isdigit():
+            self._tool = int(cmd[1:])
+
+    def _parse(self, words):
+        """Return X, Y, Z, E, F, I, J and R values of words or None."""
+        x = y = z = e = f = i = j = r = None
+        for word in words[1:]:
+            tag = word[0] & 0xdf
+            if tag == _X:
+                x = float(word[1:])
+            elif tag == _Y:
+                y = float(word[1:])
+            elif tag == _Z:
+                z = float(word[1:])
+            elif tag == _E:
+                e = float(word[1:])
+            elif tag == _F:
+                f = float(word[1:])
+            elif tag == _I:
+                i = float(word[1:])
+            elif tag == _J:
+                j = float(word[1:])
+            elif tag == _R:
+                r = float(word[1:])
+        return x, y, z, e, f, i, j, r
+
+    def _parse_line(self, words):
+        try:
+            return self._parse(words)
+        except ValueError:
+            # words with missing or glued values: tokenize exactly
+            words = [word for word in _tokenize(b" ".join(words))
+                     if len(word) > 1]
+            return self._parse(words)
+
+    def _move(self, words, arc):
+        x, y, z, e, f, i, j, r = self._parse_line(words)
+        pos = self._pos
+        if self._abs_xyz:
+            off = self._g92_offset
+            x = pos[0] if x is None else x + off[0]
+            y = pos[1] if y is None else y + off[1]
+            z = pos[2] if z is None else z + off[2]
+        else:
+            x = pos[0] if x is None else x + pos[0]
+            y = pos[1] if y is None else y + pos[1]
+            z = pos[2] if z is None else z + pos[2]
+        de = 0.0
+        if e is not None:
+            if self._abs_e:
+                de = e - self._e
+                self._e = e
+            else:
+                de = e
+                # keep absolute position for a switch back to M82/G90
+                self._e += e
+        if f is not None and f > 0:
+            self._feed = f
+        if arc:
+            self._arc(x, y, z, de, i, j, r, arc == 2)
+        else:
+            x0, y0, z0 = pos
+            pos[0] = x
+            pos[1] = y
+            pos[2] = z
+            self._on_move(x0, y0, z0, de)
+
+    def _line_to(self, x, y, z, de):
+        pos = self._pos
+        x0, y0, z0 = pos
+        pos[0] = x
+        pos[1] = y
+        pos[2] = z
+        self._on_move(x0, y0, z0, de)
+
+    def _arc(self, x, y, z, de, i, j, r, clockwise):
+        x0, y0, z0 = self._pos
+        if i is not None or j is not None:
+            cx = x0 + (i or 0.0)
+            cy = y0 + (j or 0.0)
+        elif r:
+            # center from radius, negative radius selects the long arc
+            dx = x - x0
+            dy = y - y0
+            d = math.hypot(dx, dy)
+            if not d:
+                self._line_to(x, y, z, de)
+                return
+            h = math.sqrt(max(r * r - d * d / 4.0, 0.0)) / d
+            if clockwise != (r < 0):
+                h = -h
+            cx = (x0 + x) / 2.0 - h * dy
+            cy = (y0 + y) / 2.0 + h * dx
+        else:
+            self._line_to(x, y, z, de)
+            return
+        radius = math.hypot(x0 - cx, y0 - cy)
+        a0 = math.atan2(y0 - cy, x0 - cx)
+        a1 = math.atan2(y - cy, x - cx)
+        angle = a0 - a1 if clockwise else a1 - a0
+        if angle <= 1e-9:
+            # same start and end point is a full circle
+            angle += 2.0 * math.pi
+        num = 1
+        tol = self._arc_tolerance
+        if radius > tol:
+            step = 2.0 * math.acos(1.0 - tol / radius)
+            num = max(int(math.ceil(angle / step)), 1)
+        if clockwise:
+            angle = -angle
+        for n in range(1, num):
+            f = n / num
+            a = a0 + angle * f
+            self._line_to(cx + radius * math.cos(a), cy + radius * math.sin(a),
+                          z0 + (z - z0) * f, de / num)
+        self._line_to(x, y, z, de / num)
+
+    def _set_pos(self, words):
+        pos = self._pos
+        off = self._g92_offset
+        if len(words) == 1:
+            for axis in range(3):
+                off[axis] = pos[axis]
+            self._e = 0.0
+            return
+        values = self._parse_line(words)
+        for axis in range(3):
+            if values[axis] is not None:
+                off[axis] = pos[axis] - values[axis]
+        if values[3] is not None:
+            self._e = values[3]
+
+    def _home(self, words):
+        axes = [word[0] & 0xdf for word in words[1:]]
+        pos = self._pos
+        off = self._g92_offset
+        for axis, tag in enumerate((_X, _Y, _Z)):
+            if not axes or tag in axes:
+                pos[axis] = 0.0
+                off[axis] = 0.0
+
+    def _on_move(self, x0, y0, z0, de):
+        """Handle a straight move from x0, y0, z0 to the current position.
+
+        de is the extruded filament length of the move.
+        """
+        pass
+
+    def _on_retract(self, retract):
+        """Handle a firmware retraction (G10) or recovery (G11)."""
+        pass
+
+    def feed(self, fobj, chunk_size=65536):
+        """Process all lines of a binary file object in chunks."""
+        rest = b""
+        while True:
+            data = fobj.read(chunk_size)
+            if not data:
+                break
+            rest = self.feed_data(rest, data)
+        if rest:
+            self.feed_line(rest)
+
+    def feed_data(self, rest, data):
+        """Process complete lines of rest + data and return the rest."""
+        lines = data.split(b"\n")
+        lines[0] = rest + lines[0]
+        rest = lines.pop()
+        for line in lines:
+            self.feed_line(line)
+        return rest
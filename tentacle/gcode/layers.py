@@ -0,0 +1,222 @@
+"""Index the layers of a G-code file by byte offset."""
+
+import array
+import bisect
+
+from .analyze import GCodeAnalyzer
+from .interp import GCodeInterpreter
+from .segments import SegmentBuffer
+
+
+class LayerIndex:
+    """Compact per-layer index of a G-code file.
+
+    For every layer the Z height, the byte range [start, end) in the
+    file, the number of moves and the parser state at its start are
+    kept in arrays, so even files with thousands of layers need only a
+    few hundred KiB.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self.z = array.array('d')
+        self.start = array.array('Q')
+        self.end = array.array('Q')
+        self.count = array.array('L')
+        # parser state at layer start
+        self._x = array.array('d')
+        self._y = array.array('d')
+        self._e = array.array('d')
+        self._tool = array.array('B')
+        # bit 0: absolute XYZ, bit 1: absolute E
+        self._mode = array.array('B')
+        # G92 offsets of X, Y and Z
+        self._offset = array.array('d')
+
+    def __len__(self):
+        """Return number of layers."""
+        return len(self.z)
+
+    def __repr__(self):
+        """Represent index."""
+        return "LayerIndex(layers=%d)" % len(self.z)
+
+    def add(self, z, start, state):
+        """Add a layer at height z that starts at byte offset start."""
+        if self.z:
+            self.end.append(start)
+        self.z.append(z)
+        self.start.append(start)
+        self.count.append(0)
+        x, y, _, e, tool, abs_xyz, abs_e, ox, oy, oz = state
+        self._x.append(x)
+        self._y.append(y)
+        self._e.append(e)
+        self._tool.append(min(max(tool, 0), 255))
+        self._mode.append(int(abs_xyz) | int(abs_e) << 1)
+        self._offset.extend((ox, oy, oz))
+
+    def finish(self, size):
+        """Close the last layer at the file size."""
+        if len(self.end) < len(self.z):
+            self.end.append(size)
+
+    def get_state(self, n):
+        """Return the parser state at the start of layer n."""
+        mode = self._mode[n]
+        ox, oy, oz = self._offset[n * 3:n * 3 + 3]
+        return (self._x[n], self._y[n], self.z[n], self._e[n],
+                self._tool[n], bool(mode & 1), bool(mode & 2), ox, oy, oz)
+
+    def find_z(self, z):
+        """Return number of the layer printed at height z or -1."""
+        return bisect.bisect_right(self.z, z + 1e-6) - 1
+
+    def find_offset(self, pos):
+        """Return number of the layer containing byte offset pos or -1."""
+        n = bisect.bisect_right(self.start, pos) - 1
+        if n >= 0 and pos >= self.end[n]:
+            return -1
+        return n
+
+
+class LayerIndexer(GCodeAnalyzer):
+    """Build a LayerIndex while analyzing a file.
+
+    A layer starts with the move that set the Z height of its first
+    extrusion, so travels to the layer and Z hops within it stay part
+    of the layer.
+    """
+
+    def __init__(self):
+        """Create indexer."""
+        super().__init__()
+        self.index = LayerIndex()
+        self._offset = 0
+        self._line_offset = 0
+        # offset, state and move number of line that set the current Z
+        self._z_offset = 0
+        self._z_state = self.get_state()
+        self._z_moves = 0
+        self._num_moves = 0
+        self._layer_moves = 0
+
+    def feed_data(self, rest, data):
+        """Process complete lines of rest + data and return the rest."""
+        lines = data.split(b"\n")
+        lines[0] = rest + lines[0]
+        rest = lines.pop()
+        offset = self._offset
+        for line in lines:
+            self._line_offset = offset
+            offset += len(line) + 1
+            self.feed_line(line)
+        self._offset = offset
+        return rest
+
+    def finish(self, rest=b""):
+        """Process the last line and return the LayerIndex."""
+        if rest:
+            self._line_offset = self._offset
+            self._offset += len(rest)
+            self.feed_line(rest)
+        index = self.index
+        if index.z:
+            index.count[-1] = self._num_moves - self._layer_moves
+        index.finish(self._offset)
+        return index
+
+    def _move(self, words, arc):
+        old_z = self._pos[2]
+        state = self.get_state()
+        num_moves = self._num_moves
+        old_moves = self._num_extrude
+        super()._move(words, arc)
+        if self._pos[2] != old_z:
+            self._z_offset = self._line_offset
+            self._z_state = state
+            self._z_moves = num_moves
+        if self._num_extrude != old_moves:
+            index = self.index
+            z = self._pos[2]
+            if not index.z or z >= index.z[-1] + self.layer_step:
+                if index.z:
+                    index.count[-1] = self._z_moves - self._layer_moves
+                self._layer_moves = self._z_moves
+                index.add(z, self._z_offset, self._z_state)
+
+    def _on_move(self, old_x, old_y, old_z, de):
+        super()._on_move(old_x, old_y, old_z, de)
+        self._num_moves += 1
+
+
+class Layer:
+    """The decoded moves of a layer."""
+
+    def __init__(self, number, z, segments, offsets):
+        """Create layer with moves and their byte offsets in the file."""
+        self.number = number
+        self.z = z
+        # SegmentBuffer of moves
+        self.segments = segments
+        # byte offset of line of each segment
+        self.offsets = offsets
+
+    def __repr__(self):
+        """Represent layer."""
+        return "Layer(%d, z=%r, moves=%d)" % (
+            self.number, self.z, len(self.segments))
+
+    def find_move(self, pos):
+        """Return number of the last segment starting before pos."""
+        return max(bisect.bisect_left(self.offsets, pos) - 1, 0)
+
+
+class _LayerDecoder(GCodeInterpreter):
+    """Collect the moves of a layer in a SegmentBuffer."""
+
+    def __init__(self, state, offset, arc_tolerance):
+        super().__init__(arc_tolerance)
+        self.set_state(state)
+        self.segments = SegmentBuffer()
+        self.segments.append(state[0], state[1], False, state[4])
+        self.offsets = array.array('Q', [offset])
+        self.line_offset = offset
+
+    def _on_move(self, old_x, old_y, old_z, de):
+        pos = self._pos
+        x = pos[0]
+        y = pos[1]
+        extrude = de > 0 and (x != old_x or y != old_y)
+        self.segments.append(x, y, extrude, self._tool)
+        self.offsets.append(self.line_offset)
+
+
+def build_index(fobj, chunk_size=65536):
+    """Return a LayerIndex of a binary file object."""
+    indexer = LayerIndexer()
+    rest = b""
+    while True:
+        data = fobj.read(chunk_size)
+        if not data:
+            break
+        rest = indexer.feed_data(rest, data)
+    return indexer.finish(rest)
+
+
+def decode_layer(fobj, index, n, arc_tolerance=0.05):
+    """Return the Layer n of the file.
+
+    The first segment is the position at the start of the layer. Arcs
+    are split into segments within arc_tolerance of the curve.
+    """
+    start = index.start[n]
+    fobj.seek(start)
+    data = fobj.read(index.end[n] - start)
+    decoder = _LayerDecoder(index.get_state(n), start, arc_tolerance)
+    offset = start
+    for line in data.split(b"\n"):
+        decoder.line_offset = offset
+        offset += len(line) + 1
+        decoder.feed_line(line)
+    return Layer(n, index.z[n], decoder.segments, decoder.offsets)
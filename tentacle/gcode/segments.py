@@ -0,0 +1,187 @@
+"""Compact storage of the moves of a layer."""
+
+import array
+import bisect
+
+
+class SegmentBuffer:
+    """Array backed list of moves.
+
+    Every move is stored as its end point in an interleaved x, y array
+    of doubles and a flag byte holding the extrude bit and the tool
+    number. A move is drawn from the end point of the previous one, so
+    the first entry is only a start position. Runs of moves with equal
+    flags are tracked on append to draw them in batches.
+    """
+
+    extrude_flag = 1
+
+    def __init__(self):
+        """Create an empty buffer."""
+        self.xy = array.array('d')
+        self.flags = array.array('B')
+        # first move of every run of equal flags
+        self.runs = array.array('L')
+
+    def __len__(self):
+        """Return number of moves."""
+        return len(self.flags)
+
+    def __getitem__(self, n):
+        """Return move n as (x, y, extrude, tool) tuple."""
+        flag = self.flags[n]
+        n = n * 2 if n >= 0 else len(self.xy) + n * 2
+        return (self.xy[n], self.xy[n + 1], bool(flag & self.extrude_flag),
+                flag >> 1)
+
+    def __repr__(self):
+        """Represent buffer."""
+        return "SegmentBuffer(moves=%d, runs=%d)" % (
+            len(self.flags), len(self.runs))
+
+    def append(self, x, y, extrude, tool):
+        """Add a move to x, y."""
+        flag = (min(max(tool, 0), 127) << 1) | (1 if extrude else 0)
+        flags = self.flags
+        if not flags or flags[-1] != flag:
+            self.runs.append(len(flags))
+        self.xy.append(x)
+        self.xy.append(y)
+        flags.append(flag)
+
+    def get_nbytes(self):
+        """Return number of bytes used by the arrays."""
+        arrays = (self.xy, self.flags, self.runs)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def has_extrusion(self):
+        """Return True if any move extrudes."""
+        flags = self.flags
+        return any(flags[first] & self.extrude_flag for first in self.runs)
+
+    def get_bounds(self):
+        """Return (min_x, max_x, min_y, max_y) or None if empty."""
+        if not self.flags:
+            return None
+        xs = self.xy[0::2]
+        ys = self.xy[1::2]
+        return min(xs), max(xs), min(ys), max(ys)
+
+    def iter_runs(self, start, end):
+        """Yield (first, last + 1, flag) of runs within moves [start, end)."""
+        runs = self.runs
+        num_runs = len(runs)
+        i = max(bisect.bisect_right(runs, start) - 1, 0)
+        while i < num_runs:
+            first = runs[i]
+            if first >= end:
+                break
+            last = runs[i + 1] if i + 1 < num_runs else len(self.flags)
+            yield max(first, start), min(last, end), self.flags[first]
+            i += 1
+
+
+class SegmentDecimator:
+    """Merge moves of a SegmentBuffer that look the same on screen.
+
+    End points are snapped to the pixel grid of x * scale + dx and
+    y * scale + dy. A move that ends in the same pixel as the previous
+    one or continues it in the same direction replaces its end point,
+    so sub-pixel detail of dense infill and curves is dropped. The
+    source is read incrementally by update().
+    """
+
+    def __init__(self, source, scale, dx=0.0, dy=0.0):
+        """Create decimator of source buffer for a pixel mapping."""
+        self.source = source
+        self.scale = scale
+        self._dx = dx
+        self._dy = dy
+        self.segments = SegmentBuffer()
+        # source move of every output move
+        self.moves = array.array('L')
+        self._num_read = 0
+        # first output move changed since last take_dirty()
+        self._dirty = 0
+        # pixels of the last two output points
+        self._ax = self._ay = 0
+        self._tx = self._ty = 0
+
+    def __repr__(self):
+        """Represent decimator."""
+        return "SegmentDecimator(%d -> %d)" % (
+            len(self.source), len(self.segments))
+
+    def update(self):
+        """Process new moves of the source. Return True if any."""
+        src = self.source
+        num = len(src)
+        first = self._num_read
+        if first >= num:
+            return False
+        out = self.segments
+        out_xy = out.xy
+        out_flags = out.flags
+        moves = self.moves
+        scale = self.scale
+        dx = self._dx
+        dy = self._dy
+        ax, ay, tx, ty = self._ax, self._ay, self._tx, self._ty
+        dirty = self._dirty
+        n = len(out_flags)
+        last_flag = out_flags[-1] if n else -1
+        xy = src.xy
+        points = zip(xy[first * 2::2], xy[first * 2 + 1::2],
+                     src.flags[first:])
+        for i, (x, y, flag) in enumerate(points, first):
+            px = int(x * scale + dx)
+            py = int(y * scale + dy)
+            if flag == last_flag and n > 1:
+                if px == tx and py == ty:
+                    merge = True
+                else:
+                    # same direction as last move?
+                    ux = tx - ax
+                    uy = ty - ay
+                    vx = px - tx
+                    vy = py - ty
+                    # last move within a pixel has no direction yet
+                    merge = (ux * vy == uy * vx and
+                             (ux * vx + uy * vy > 0 or not (ux or uy)))
+                if merge:
+                    out_xy[-2] = x
+                    out_xy[-1] = y
+                    moves[-1] = i
+                    tx = px
+                    ty = py
+                    if dirty >= n:
+                        dirty = n - 1
+                    continue
+            else:
+                out.runs.append(n)
+                last_flag = flag
+            out_xy.append(x)
+            out_xy.append(y)
+            out_flags.append(flag)
+            moves.append(i)
+            n += 1
+            ax = tx
+            ay = ty
+            tx = px
+            ty = py
+        self._ax, self._ay, self._tx, self._ty = ax, ay, tx, ty
+        self._dirty = dirty
+        self._num_read = num
+        return True
+
+    def take_dirty(self):
+        """Return first output move changed since last call."""
+        dirty = self._dirty
+        self._dirty = len(self.moves)
+        return dirty
+
+    def find_move(self, move_no):
+        """Return last output move that ends at or before source move."""
+        if move_no < 0:
+            return -1
+        return bisect.bisect_right(self.moves, move_no) - 1
@@ -0,0 +1,72 @@
+"""Track the print head by the read position in the print file."""
+
+
+class PositionTracker:
+    """Map OctoPrint's progress.filepos onto layers and moves.
+
+    filepos is the number of bytes read from the file so far, so the
+    last sent line is the one containing filepos - 1. The layer is
+    found in the LayerIndex, the move within it once the decoded Layer
+    was set.
+    """
+
+    def __init__(self, index=None):
+        """Create tracker for a LayerIndex."""
+        self.set_index(index)
+
+    def set_index(self, index):
+        """Set the LayerIndex of a new file and reset the position."""
+        self._index = index
+        self._layer = None
+        self._file_pos = None
+        self.layer_no = -1
+        self.move_no = -1
+        self.pos = None
+
+    def is_active(self):
+        """Return True if the position is known from the file."""
+        return self.layer_no >= 0
+
+    def get_layer(self):
+        """Return the decoded Layer or None."""
+        return self._layer
+
+    def get_missing_layer(self):
+        """Return number of current layer if it is not decoded or -1."""
+        if self.layer_no >= 0 and (
+                self._layer is None or self._layer.number != self.layer_no):
+            return self.layer_no
+        return -1
+
+    def set_layer(self, layer):
+        """Set a decoded Layer and update the position in it."""
+        if layer.number != self.layer_no:
+            return False
+        self._layer = layer
+        self.move_no = -1
+        return self._update_move()
+
+    def update(self, file_pos):
+        """Update position from filepos. Return True if it changed."""
+        if self._index is None or file_pos == self._file_pos:
+            return False
+        self._file_pos = file_pos
+        layer_no = self._index.find_offset(max(file_pos - 1, 0))
+        changed = layer_no != self.layer_no
+        if changed:
+            self.layer_no = layer_no
+            self.move_no = -1
+            self.pos = None
+        return self._update_move() or changed
+
+    def _update_move(self):
+        layer = self._layer
+        if layer is None or layer.number != self.layer_no:
+            return False
+        move_no = layer.find_move(self._file_pos)
+        if move_no == self.move_no:
+            return False
+        self.move_no = move_no
+        seg = layer.segments[move_no]
+        self.pos = (seg[0], seg[1], layer.z)
+        return True
@@ -78,7 +78,7 @@ class RangeXY:
 class RangeXYZ(RangeXY):
     def __init__(self, x_range=None, y_range=None, z_range=None):
         super().__init__(x_range, y_range)
-        self._z = Range(z_range)
+        self._z = Range(range=z_range)
 
     def reset(self):
         super().reset()
@@ -7,4 +7,5 @@ from .move import MoveWidget  # noqa: F401
 from .temp import TempWidget  # noqa: F401
 from .cam import CameraWidget  # noqa: F401
 from .serial import SerialWidget  # noqa: F401
+from .render import RenderScheduler  # noqa: F401
 from .tool import ToolWidget  # noqa: F401
@@ -26,7 +26,7 @@ class CameraWidget(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(1)
         self.setLayout(layout)
-        self._cam_view = CameraView()
+        self._cam_view = CameraView(model.render)
         layout.addWidget(self._cam_view, 100)
         self._cam_info = QLabel()
         self._cam_info.setAlignment(Qt.AlignCenter)
@@ -60,9 +60,10 @@ class CameraWidget(QWidget):
 class CameraView(QWidget):
     """Show a camera image."""
 
-    def __init__(self):
+    def __init__(self, render):
         """Create camera widget."""
         super().__init__()
+        self._render = render
         self._qimg = None
 
     def set_jpeg_data(self, jpeg_data):
@@ -74,7 +75,7 @@ class CameraView(QWidget):
             self._qimg = qimg
         d = time.time() - t
         # (re)draw frame
-        self.repaint()
+        self._render.schedule(self)
         logging.info("cam get: %6.3f ms", d * 1000.0)
 
     def paintEvent(self, _):
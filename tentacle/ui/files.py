@@ -1,16 +1,32 @@
 """File Set Tab."""
 
 import logging
+import os
 
-from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QSize, pyqtSlot
+from PyQt5.QtCore import (
+    Qt, QAbstractItemModel, QAbstractListModel, QModelIndex, QSize, QTimer,
+    pyqtSlot
+)
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QHBoxLayout, QPushButton,
-    QTreeView, QStyle, QMessageBox
+    QTreeView, QStyle, QMessageBox, QLineEdit, QComboBox, QProgressBar,
+    QFileDialog
 )
 
+from tentacle.util import ts_to_hms
 from tentacle.client import FileDir, FileGCode
 
 
+def file_icon(node, style, thumbs):
+    """Return thumbnail of file node or a generic icon."""
+    # thumbnails are loaded once the file date is known
+    if thumbs and node.date:
+        icon = thumbs.get_icon(node.get_path(), node.date)
+        if icon:
+            return icon
+    return style.standardIcon(QStyle.SP_FileIcon)
+
+
 class FileTreeModel(QAbstractItemModel):
     """Represent a file system tree."""
 
@@ -19,6 +35,76 @@ class FileTreeModel(QAbstractItemModel):
         super().__init__(parent)
         self.root = root
         self.style = style
+        self._file_model = None
+        self._thumbs = None
+
+    def attach(self, file_model):
+        """Follow the node changes of a FileModel."""
+        self._file_model = file_model
+        file_model.beginLoadDir.connect(self._on_begin_load_dir)
+        file_model.endLoadDir.connect(self._on_end_load_dir)
+        file_model.beginInsertNode.connect(self._on_begin_insert_node)
+        file_model.endInsertNode.connect(self._on_end_insert_node)
+        file_model.beginRemoveNode.connect(self._on_begin_remove_node)
+        file_model.endRemoveNode.connect(self._on_end_remove_node)
+        file_model.updateNode.connect(self._on_update_node)
+
+    def set_thumbs(self, thumbs):
+        """Show file thumbnails of a ThumbCache."""
+        self._thumbs = thumbs
+        thumbs.updateThumb.connect(self._on_update_thumb)
+
+    def _on_update_thumb(self, path):
+        if self._file_model:
+            node = self._file_model.get_node(path)
+            if node:
+                self._on_update_node(node)
+
+    def set_root(self, root):
+        """Replace the whole tree."""
+        self.beginResetModel()
+        self.root = root
+        self.endResetModel()
+
+    def node_index(self, node):
+        """Return index of given node."""
+        if node is self.root or node.parent is None:
+            return QModelIndex()
+        return self.createIndex(node.get_row(), 0, node)
+
+    def _in_tree(self, node):
+        while node.parent:
+            node = node.parent
+        return node is self.root
+
+    def _on_begin_insert_node(self, dir_node, row):
+        if self._in_tree(dir_node):
+            self.beginInsertRows(self.node_index(dir_node), row, row)
+
+    def _on_end_insert_node(self, dir_node, _):
+        if self._in_tree(dir_node):
+            self.endInsertRows()
+
+    def _on_begin_remove_node(self, dir_node, row):
+        if self._in_tree(dir_node):
+            self.beginRemoveRows(self.node_index(dir_node), row, row)
+
+    def _on_end_remove_node(self, dir_node, _):
+        if self._in_tree(dir_node):
+            self.endRemoveRows()
+
+    def _on_begin_load_dir(self, dir_node, num):
+        if num and self._in_tree(dir_node):
+            self.beginInsertRows(self.node_index(dir_node), 0, num - 1)
+
+    def _on_end_load_dir(self, dir_node, num):
+        if num and self._in_tree(dir_node):
+            self.endInsertRows()
+
+    def _on_update_node(self, node):
+        if self._in_tree(node):
+            idx = self.node_index(node)
+            self.dataChanged.emit(idx, idx)
 
     def rowCount(self, parent):
         """Return number of rows in parent."""
@@ -30,6 +116,28 @@ class FileTreeModel(QAbstractItemModel):
             return node.num_children()
         return 0
 
+    def hasChildren(self, parent):
+        """Return True if parent has or may have children."""
+        if not parent.isValid():
+            node = self.root
+        else:
+            node = parent.internalPointer()
+        if isinstance(node, FileDir):
+            return not node.loaded or node.num_children() > 0
+        return False
+
+    def canFetchMore(self, parent):
+        """Return True if parent is a folder that is not loaded yet."""
+        if not parent.isValid():
+            return False
+        node = parent.internalPointer()
+        return isinstance(node, FileDir) and not node.loaded
+
+    def fetchMore(self, parent):
+        """Load contents of a lazy folder."""
+        if self._file_model and parent.isValid():
+            self._file_model.load_folder(parent.internalPointer())
+
     def columnCount(self, _):
         """Return number of columns in parent."""
         return 1
@@ -62,13 +170,7 @@ class FileTreeModel(QAbstractItemModel):
         if parent_node == self.root:
             return QModelIndex()
 
-        # row of parent
-        if parent_node.parent:
-            parent_row = parent_node.parent.get_children().index(parent_node)
-        else:
-            parent_row = 0
-
-        return self.createIndex(parent_row, 0, parent_node)
+        return self.createIndex(parent_node.get_row(), 0, parent_node)
 
     def data(self, index, role):
         """Return data of given index."""
@@ -85,7 +187,7 @@ class FileTreeModel(QAbstractItemModel):
             if isinstance(node, FileDir):
                 return self.style.standardIcon(QStyle.SP_DirIcon)
             else:
-                return self.style.standardIcon(QStyle.SP_FileIcon)
+                return file_icon(node, self.style, self._thumbs)
         elif role != Qt.DisplayRole:
             return None
 
@@ -106,9 +208,79 @@ class FileTreeModel(QAbstractItemModel):
         return None
 
 
+class FileListModel(QAbstractListModel):
+    """Represent a flat list of files, e.g. search results."""
+
+    def __init__(self, style, parent=None):
+        """Create an empty list model."""
+        super().__init__(parent)
+        self.style = style
+        self._nodes = []
+        self._thumbs = None
+
+    def set_thumbs(self, thumbs):
+        """Show file thumbnails of a ThumbCache."""
+        self._thumbs = thumbs
+        thumbs.updateThumb.connect(self._on_update_thumb)
+
+    def _on_update_thumb(self, path):
+        name = path.rpartition('/')[2]
+        for row, node in enumerate(self._nodes):
+            if node.name == name and node.get_path() == path:
+                idx = self.createIndex(row, 0, node)
+                self.dataChanged.emit(idx, idx)
+
+    def set_nodes(self, nodes):
+        """Replace the list of file nodes."""
+        self.beginResetModel()
+        self._nodes = nodes
+        self.endResetModel()
+
+    def node_index(self, node):
+        """Return index of given node or an invalid index."""
+        try:
+            row = self._nodes.index(node)
+        except ValueError:
+            return QModelIndex()
+        return self.createIndex(row, 0, node)
+
+    def rowCount(self, parent):
+        """Return number of files."""
+        if parent.isValid():
+            return 0
+        return len(self._nodes)
+
+    def index(self, row, column, parent):
+        """Return index of file in row."""
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self._nodes[row])
+
+    def data(self, index, role):
+        """Return data of given index."""
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.SizeHintRole:
+            return QSize(160, 20)
+        elif role == Qt.DecorationRole:
+            return file_icon(node, self.style, self._thumbs)
+        elif role == Qt.DisplayRole:
+            return node.get_path()
+        return None
+
+
 class FilesWidget(QWidget):
     """File Set Tab shows all files."""
 
+    # label, sort key, reverse
+    sort_modes = (
+        ("Name", "name", False),
+        ("Newest", "date", True),
+        ("Largest", "size", True),
+        ("Printed", "printed", True)
+    )
+
     def __init__(self, model, client):
         """Create a new file set tab."""
         super().__init__()
@@ -117,6 +289,23 @@ class FilesWidget(QWidget):
         # connect to model
         self._model.files.updateFileSet.connect(self._on_update_file_set)
         self._model.files.selectedFile.connect(self._on_selected_file)
+        self._model.files.updateMeta.connect(self._on_update_meta)
+        self._model.files.addedFile.connect(self._on_files_changed)
+        self._model.files.removedFile.connect(self._on_files_changed)
+        self._model.files.removedFolder.connect(self._on_files_changed)
+        self._model.files.endLoadDir.connect(self._on_files_changed)
+        self._model.files.updateNode.connect(self._on_update_node)
+        self._info_path = None
+        # merge bursts of file events into one search
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(200)
+        self._search_timer.timeout.connect(self._update_search)
+        # upload
+        self._upload_dir = "/media"
+        self._uploader = model.uploader
+        self._uploader.uploadProgress.connect(self._on_upload_progress)
+        self._uploader.uploadDone.connect(self._on_upload_done)
         # layout
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
@@ -126,13 +315,45 @@ class FilesWidget(QWidget):
         layout.addLayout(hlayout)
         hlayout.addWidget(QLabel("Selected:"))
         self._l_selected_file = QLabel("n/a")
-        hlayout.addWidget(self._l_selected_file)
-        # dir tree
+        hlayout.addWidget(self._l_selected_file, 1)
+        self._b_upload = QPushButton("Upload")
+        self._b_upload.clicked.connect(self._on_upload)
+        hlayout.addWidget(self._b_upload)
+        # upload progress
+        self._p_upload = QProgressBar()
+        self._p_upload.setRange(0, 1000)
+        self._p_upload.hide()
+        layout.addWidget(self._p_upload)
+        # search and sort
+        hlayout = QHBoxLayout()
+        layout.addLayout(hlayout)
+        self._e_search = QLineEdit()
+        self._e_search.setPlaceholderText("Search")
+        self._e_search.setClearButtonEnabled(True)
+        self._e_search.textChanged.connect(self._update_search)
+        hlayout.addWidget(self._e_search)
+        # shown while folders are loaded for the search
+        self._l_search_partial = QLabel("Loading...")
+        self._l_search_partial.hide()
+        hlayout.addWidget(self._l_search_partial)
+        self._c_sort = QComboBox()
+        for mode in self.sort_modes:
+            self._c_sort.addItem(mode[0])
+        self._c_sort.currentIndexChanged.connect(self._update_search)
+        hlayout.addWidget(self._c_sort)
+        # dir tree or search result list
         self._t_files = QTreeView()
         layout.addWidget(self._t_files)
         self._t_files.setRootIsDecorated(False)
         self._t_files.setAlternatingRowColors(True)
         self._t_files.setHeaderHidden(True)
+        self._tree_model = FileTreeModel(self._model.files.get_root(),
+                                         self.style(), self)
+        self._tree_model.attach(self._model.files)
+        self._list_model = FileListModel(self.style(), self)
+        self._tree_model.set_thumbs(model.thumbs)
+        self._list_model.set_thumbs(model.thumbs)
+        self._set_view_model(self._tree_model)
         # button row
         hlayout = QHBoxLayout()
         hlayout.setContentsMargins(0, 0, 0, 0)
@@ -151,19 +372,80 @@ class FilesWidget(QWidget):
         hlayout.addWidget(self._b_delete)
         self._enable_buttons()
 
-    def _on_update_file_set(self, file_set):
-        self._file_set = file_set
-        self._model = FileTreeModel(file_set, self.style())
-        self._t_files.setModel(self._model)
+    def configure(self, cfg):
+        """Configure widget from config."""
+        if 'upload_dir' in cfg:
+            self._upload_dir = os.path.expanduser(cfg['upload_dir'])
+
+    def _set_view_model(self, model):
+        if self._t_files.model() is model:
+            return
+        self._t_files.setModel(model)
         sel_model = self._t_files.selectionModel()
         sel_model.selectionChanged.connect(self._on_selection_change)
 
+    def _is_searching(self):
+        return bool(self._e_search.text()) or self._c_sort.currentIndex() > 0
+
+    def _set_current_path(self, path):
+        node = self._model.files.get_node(path)
+        if node:
+            idx = self._t_files.model().node_index(node)
+            if idx.isValid():
+                self._t_files.setCurrentIndex(idx)
+                self._t_files.scrollTo(idx)
+
+    @pyqtSlot()
+    def _update_search(self):
+        path = self._get_current_path()
+        if self._is_searching():
+            # results are partial until all lazy folders arrived
+            num_pending = self._model.files.load_all_folders()
+            self._l_search_partial.setVisible(num_pending > 0)
+            _, key, reverse = self.sort_modes[self._c_sort.currentIndex()]
+            text = self._e_search.text()
+            nodes = self._model.files.search(text, key, reverse)
+            self._list_model.set_nodes(nodes)
+            self._set_view_model(self._list_model)
+        else:
+            self._l_search_partial.hide()
+            self._list_model.set_nodes([])
+            self._set_view_model(self._tree_model)
+        if path:
+            self._set_current_path(path)
+        self._enable_buttons()
+
+    def _on_files_changed(self, *_):
+        if self._is_searching():
+            self._search_timer.start()
+
+    def _on_update_node(self, node):
+        # sort keys of a shown result may have changed
+        if self._is_searching() and \
+                self._list_model.node_index(node).isValid():
+            self._search_timer.start()
+
+    def _on_update_file_set(self, file_set):
+        # keep current file across a full update
+        path = self._get_current_path()
+        self._tree_model.set_root(file_set)
+        if self._is_searching():
+            self._update_search()
+        elif path:
+            self._set_current_path(path)
+        self._enable_buttons()
+
     def _on_selected_file(self, path):
         logging.info("selected file: %s", path)
         self._l_selected_file.setText(path)
 
     def _on_selection_change(self):
         self._enable_buttons()
+        # get meta of selected file in background
+        cur_idx = self._t_files.currentIndex()
+        node = cur_idx.internalPointer()
+        if isinstance(node, FileGCode):
+            self._model.files.prefetch_meta(node.get_path())
 
     def _enable_buttons(self):
         is_gcode = False
@@ -176,7 +458,7 @@ class FilesWidget(QWidget):
                 is_dir = isinstance(data, FileDir)
         self._b_select.setEnabled(is_gcode)
         self._b_print.setEnabled(is_gcode)
-        self._b_info.setEnabled(is_gcode)
+        self._b_info.setEnabled(is_gcode and self._info_path is None)
         self._b_delete.setEnabled(is_gcode or is_dir)
 
     def _get_current_path(self):
@@ -196,23 +478,86 @@ class FilesWidget(QWidget):
 
     @pyqtSlot()
     def _on_info(self):
-        info = self._client.file_info(self._get_current_path())
-        from pprint import pprint
-        pprint(info)
+        path = self._get_current_path()
+        meta = self._model.files.get_meta(path)
+        if meta:
+            self._show_info(path, meta)
+        else:
+            # wait for meta fetched in background
+            self._info_path = path
+            self._enable_buttons()
+
+    @pyqtSlot(str, object)
+    def _on_update_meta(self, path, meta):
+        if path != self._info_path:
+            return
+        self._info_path = None
+        self._enable_buttons()
+        self._show_info(path, meta)
+
+    def _show_info(self, path, meta):
+        if not meta:
+            QMessageBox.warning(self, "File Info", "No info for: " + path)
+            return
         lines = [
-            "Name: " + info['display'],
-            "Size: " + str(info['size'])
+            "Name: " + path,
+            "Size: " + str(meta.size)
         ]
-        gcode_analysis = info['gcodeAnalysis']
-        if gcode_analysis:
-            dim = gcode_analysis['dimensions']
+        if meta.dims:
             lines += [
-                "SizeX: %8.3f" % dim['width'],
-                "SizeY: %8.3f" % dim['height'],
-                "SizeZ: %8.3f" % dim['depth'],
+                "SizeX: %8.3f" % meta.dims[0],
+                "SizeY: %8.3f" % meta.dims[1],
+                "SizeZ: %8.3f" % meta.dims[2],
             ]
+        if meta.layers:
+            lines.append("Layers: %d" % meta.layers)
+        if meta.est_time:
+            lines.append("Time: %02d:%02d:%02d" % ts_to_hms(meta.est_time))
+        for tool_no, length in enumerate(meta.filament):
+            lines.append("Filament T%d: %.0f mm" % (tool_no, length))
         QMessageBox.information(self, "File Info", "\n".join(lines))
 
+    def _get_target_dir(self):
+        cur_idx = self._t_files.currentIndex()
+        node = cur_idx.internalPointer() if cur_idx.isValid() else None
+        if isinstance(node, FileGCode):
+            node = node.parent
+        if isinstance(node, FileDir):
+            return node.get_path()
+        return ""
+
+    @pyqtSlot()
+    def _on_upload(self):
+        if self._uploader.is_busy():
+            self._uploader.cancel()
+            return
+        dlg = QFileDialog(self, "Upload", self._upload_dir,
+                          "G-code (*.gcode *.gco *.g);;All files (*)")
+        dlg.setOption(QFileDialog.DontUseNativeDialog)
+        dlg.setFileMode(QFileDialog.ExistingFile)
+        dlg.resize(self.window().size())
+        if not dlg.exec_():
+            return
+        file_name = dlg.selectedFiles()[0]
+        target_dir = self._get_target_dir()
+        if self._uploader.start(file_name, target_dir):
+            self._b_upload.setText("Cancel")
+            self._p_upload.setValue(0)
+            self._p_upload.setFormat(os.path.basename(file_name) + " %p%")
+            self._p_upload.show()
+
+    def _on_upload_progress(self, sent, total):
+        if total:
+            self._p_upload.setValue(sent * 1000 // total)
+
+    def _on_upload_done(self, file_name, error):
+        self._b_upload.setText("Upload")
+        self._p_upload.hide()
+        if error and error != "cancelled":
+            QMessageBox.warning(self, "Upload",
+                                "Upload of %s failed:\n%s" % (
+                                    os.path.basename(file_name), error))
+
     @pyqtSlot()
     def _on_delete(self):
         self._client.delete(self._get_current_path())
@@ -4,16 +4,123 @@ import time
 import logging
 import math
 
-from PyQt5.QtCore import pyqtSlot
-from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QColor
+from PyQt5.QtCore import Qt, pyqtSlot, pyqtSignal
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QSlider, QLabel, QPushButton
+)
+from PyQt5.QtGui import (
+    QPainter, QColor, QPixmap, QPen, QPolygonF, QTransform, QImage, qRgb
+)
 
+from tentacle.gcode import (
+    GCodeInterpreter, HeightMap, LayerCache, PositionTracker, SegmentBuffer,
+    SegmentDecimator
+)
 from tentacle.range import RangeXYZ, RangeXY
 
 
+def _to_polygon(xy, first, last):
+    """Return points [first, last) of an x, y array as QPolygonF."""
+    num = last - first
+    poly = QPolygonF(num)
+    ptr = poly.data()
+    ptr.setsize(num * 16)
+    memoryview(ptr)[:] = memoryview(xy)[first * 2:last * 2].cast('B')
+    return poly
+
+
+class _LiveInterpreter(GCodeInterpreter):
+    """Pass the moves of sent G-code lines to the view."""
+
+    def __init__(self, view):
+        super().__init__()
+        self._view = view
+
+    def _on_move(self, old_x, old_y, old_z, de):
+        pos = self._pos
+        extrude = de > 0 and (pos[0] != old_x or pos[1] != old_y)
+        self._view._add_move(pos, extrude, self._tool)
+
+    def _home(self, words):
+        super()._home(words)
+        self._view._on_home()
+
+
 class GCodeWidget(QWidget):
+    """The gcode tab with a layer view and a scrub slider."""
+
+    def __init__(self, model, client):
+        """Create gcode widget."""
+        super().__init__()
+        self._model = model
+        self._client = client
+        self._heights = []
+        # ui
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(1)
+        self.setLayout(layout)
+        self._view = GCodeView(model, client)
+        self._view.updateHistory.connect(self._on_update_history)
+        layout.addWidget(self._view, 100)
+        hlayout = QHBoxLayout()
+        layout.addLayout(hlayout)
+        self._s_layer = QSlider(Qt.Horizontal)
+        self._s_layer.setRange(0, 0)
+        self._s_layer.valueChanged.connect(self._on_scrub)
+        hlayout.addWidget(self._s_layer, 100)
+        self._l_layer = QLabel("Live")
+        hlayout.addWidget(self._l_layer)
+        self._b_live = QPushButton("Live")
+        self._b_live.clicked.connect(self._on_live)
+        hlayout.addWidget(self._b_live)
+
+    def configure(self, cfg):
+        """Configure widget from config."""
+        self._view.configure(cfg)
+
+    def suspend(self):
+        """Stop drawing while hidden."""
+        self._view.suspend()
+
+    def resume(self):
+        """Draw again when shown."""
+        self._view.resume()
+
+    @pyqtSlot()
+    def _on_update_history(self):
+        slider = self._s_layer
+        live = slider.value() == slider.maximum()
+        self._heights = self._view.get_heights()
+        slider.blockSignals(True)
+        slider.setRange(0, len(self._heights))
+        if live:
+            slider.setValue(len(self._heights))
+        slider.blockSignals(False)
+        if not live:
+            self._on_scrub(slider.value())
+
+    @pyqtSlot(int)
+    def _on_scrub(self, value):
+        if value < len(self._heights):
+            z = self._heights[value]
+            self._l_layer.setText("Z %.2f" % z)
+            self._view.show_history(z)
+        else:
+            self._l_layer.setText("Live")
+            self._view.show_history(None)
+
+    @pyqtSlot()
+    def _on_live(self):
+        self._s_layer.setValue(self._s_layer.maximum())
+
+
+class GCodeView(QWidget):
     """A gcode graph widget."""
 
+    # the layers available in history changed
+    updateHistory = pyqtSignal()
+
     def __init__(self, model, client):
         """Create graph widget."""
         super().__init__()
@@ -22,6 +129,10 @@ class GCodeWidget(QWidget):
         self._client = client
         self._model.sendGCode.connect(self._on_send_gcode)
         self._model.updateBusyFiles.connect(self._on_update_busy_files)
+        self._model.updateProgress.connect(self._on_update_progress)
+        self._model.files.updateMeta.connect(self._on_update_meta)
+        self._model.layers.indexReady.connect(self._on_index_ready)
+        self._model.layers.layerReady.connect(self._on_layer_ready)
         # ranges
         self._def_range = RangeXY()
         self._meta_range = RangeXYZ()
@@ -29,19 +140,44 @@ class GCodeWidget(QWidget):
         self._grid_x = 10
         self._grid_y = 10
         self._enabled = False
+        # position from progress.filepos if the file is indexed
+        self._tracker = PositionTracker()
+        # off-screen background and layer with the geometry they are for
+        self._bg_pixmap = None
+        self._layer_pixmap = None
+        self._geo_key = None
+        self._pens = {}
+        # finished layers of this print
+        self._cache = LayerCache()
+        self._history_z = None
+        self._history = None
+        self._interp = _LiveInterpreter(self)
+        self._suspended = False
+        # highest extrusion on the bed so far
+        self._show_height = True
+        self._height_map = None
+        self._height_image = None
+        self._height_colors = {}
+        # file of the print, kept when homing resets the position
+        self._file = None
         self._reset_state()
 
     def _reset_state(self):
         self._pos = [0.0, 0.0, 0.0]
-        self._slice = []
+        self._set_slice(SegmentBuffer())
+        # layer left for a Z hop
+        self._parked = None
         self._cur_z = 0.0
         self._width = 0
         self._height = 0
         self._tool = 0
-        self._file = None
-        self._last_drawn = 0
         self._last_range = None
         self._cur_range = RangeXY()
+        # layer of file index shown in slice
+        self._layer = -1
+        self._layer_full = False
+        # move of slice at filepos or -1 if not tracked
+        self._move_no = -1
 
     def configure(self, cfg):
         """Configure widget from config."""
@@ -55,85 +191,264 @@ class GCodeWidget(QWidget):
             self._grid_x = float(cfg['grid_x'])
         if 'grid_y' in cfg:
             self._grid_y = float(cfg['grid_y'])
+        if 'cache_layers' in cfg:
+            self._cache = LayerCache(int(cfg['cache_layers']))
+        if 'height_map' in cfg:
+            self._show_height = bool(int(cfg['height_map']))
 
     @pyqtSlot(object)
     def _on_update_busy_files(self, files):
         if not files:
             logging.info("gcode: off")
             self._enabled = False
+            self._file = None
+            self._model.layers.load(None)
         else:
             self._enabled = True
             self._reset_state()
+            self._tracker.set_index(None)
+            self._cache.clear()
+            self._interp = _LiveInterpreter(self)
+            self._height_map = None
+            self._height_image = None
             self._file = files[0]
             self._set_meta_range(self._file)
+            node = self._model.files.get_node(self._file)
+            self._model.layers.load(self._file, getattr(node, 'date', None))
+            self.updateHistory.emit()
 
     def _set_meta_range(self, name):
         logging.info("gcode: get meta for: %s", name)
         meta = self._model.files.get_meta(name)
         if meta:
-            self._meta_range = RangeXYZ(meta.range_x,
-                                        meta.range_y,
-                                        meta.range_z)
-            logging.info("gcode: meta range: %r", self._meta_range)
+            self._apply_meta(meta)
         else:
-            logging.error("gcode: no meta available for: %s", name)
+            logging.info("gcode: waiting for meta of: %s", name)
+
+    @pyqtSlot(str, object)
+    def _on_update_meta(self, path, meta):
+        if meta and self._enabled and path == self._file:
+            self._apply_meta(meta)
+            self._schedule_paint()
+
+    def _apply_meta(self, meta):
+        self._meta_range = RangeXYZ(meta.range_x,
+                                    meta.range_y,
+                                    meta.range_z)
+        logging.info("gcode: meta range: %r", self._meta_range)
+
+    @pyqtSlot(str, object)
+    def _on_index_ready(self, path, index):
+        if index and self._enabled and path == self._file:
+            self._tracker.set_index(index)
+            self._request_layer()
+            self.updateHistory.emit()
+
+    @pyqtSlot(object)
+    def _on_update_progress(self, progress):
+        if self._enabled and self._tracker.update(progress.file_pos):
+            self._apply_tracker()
+            self._schedule_paint()
+
+    def _apply_tracker(self):
+        tracker = self._tracker
+        layer_no = tracker.layer_no
+        if layer_no < 0:
+            return
+        if layer_no != self._layer:
+            index = self._model.layers.get_index()
+            self._set_layer(layer_no, index.z[layer_no])
+        missing = tracker.get_missing_layer()
+        if missing >= 0:
+            self._model.layers.request_layer(missing)
+        if tracker.pos:
+            self._pos = list(tracker.pos)
+            self._move_no = tracker.move_no
+
+    def _set_layer(self, layer_no, z):
+        logging.info("gcode: layer %d: z=%s", layer_no, z)
+        self._store_slice()
+        self._layer = layer_no
+        self._cur_z = z
+        self._set_slice(self._cache.get(z) or SegmentBuffer())
+        self._layer_full = False
+        self._move_no = -1
+        if self._last_range:
+            self._last_range.merge(self._cur_range)
+        elif self._cur_range.is_valid():
+            self._last_range = self._cur_range
+        self._cur_range = RangeXY()
+        # heights end at the new layer
+        self.updateHistory.emit()
+
+    def _request_layer(self):
+        index = self._model.layers.get_index()
+        if index:
+            self._layer = index.find_z(self._cur_z)
+            self._model.layers.request_layer(self._layer)
+
+    @pyqtSlot(str, int, object)
+    def _on_layer_ready(self, path, number, layer):
+        if not self._enabled or path != self._file:
+            return
+        if number != self._layer:
+            # a past layer for the history
+            self._cache.put(layer.z, layer.segments)
+            if self._history_z == layer.z:
+                self._set_history(layer.segments)
+            return
+        logging.info("gcode: full layer %d: lines=%d",
+                     number, len(layer.segments))
+        self._set_slice(layer.segments)
+        self._layer_full = True
+        self._cur_range = RangeXY()
+        bounds = layer.segments.get_bounds()
+        if bounds:
+            self._cur_range.update(bounds[0], bounds[2])
+            self._cur_range.update(bounds[1], bounds[3])
+        # the complete layer is known so it can be part of last range
+        if self._last_range:
+            self._last_range.merge(self._cur_range)
+        if self._tracker.set_layer(layer):
+            self._apply_tracker()
+        self._schedule_paint()
 
     @pyqtSlot(str)
     def _on_send_gcode(self, line):
         """Process gcode."""
-        words = line.split()
-        if not words:
+        if self._tracker.is_active():
+            # position is known exactly from the file
             return
-        cmd = words[0]
-        if cmd == 'G0':
-            self._parse_move(words[1:], False)
-        elif cmd == 'G1':
-            self._parse_move(words[1:], True)
-        elif cmd == 'G28':  # auto home
-            self._reset_state()
-            self.repaint()
-        elif cmd == 'T0':
-            self._tool = 0
-        elif cmd == 'T1':
-            self._tool = 1
-        else:
-            logging.info("gcode: %s", line)
-
-    def _parse_move(self, words, extrude):
-        # update X, Y, or Z
-        for word in words:
-            tag = word[0]
-            try:
-                val = float(word[1:])
-                if tag in ('X', 'Y', 'Z'):
-                    self._pos[ord(tag) - ord('X')] = val
-            except ValueError as e:
-                logging.error("error parsing move Gcode: %s", tag)
+        self._interp.feed_line(line.encode('ascii', 'replace'))
+
+    def _on_home(self):
+        self._reset_state()
+        self._schedule_paint()
+
+    def _add_move(self, pos, extrude, tool):
+        self._pos = list(pos)
+        self._tool = tool
         # z inc?
+        stored = False
         if self._cur_z != self._pos[2]:
-            self.repaint()
-            self._cur_z = self._pos[2]
-            logging.info("last slice: lines=%d, z=%s",
-                         len(self._slice), self._cur_z)
-            self._slice = []
-            self._last_drawn = time.time()
+            stored = self._store_slice()
+            parked = self._parked
+            if self._slice.has_extrusion():
+                # a travel only slice (Z hop) keeps the layer parked
+                parked = self._park_slice()
             if self._last_range:
                 self._last_range.merge(self._cur_range)
             else:
                 self._last_range = self._cur_range
-            logging.info("last range: %r", self._last_range)
-            self._cur_range = RangeXY()
+            self._cur_z = self._pos[2]
+            logging.info("last slice: lines=%d, z=%s",
+                         len(self._slice), self._cur_z)
+            if parked and parked[0] == self._cur_z:
+                # back from a Z hop: continue drawing where we left
+                self._unpark_slice(parked)
+            else:
+                self._parked = parked
+                # continue a layer that was left for longer
+                self._set_slice(self._cache.get(self._cur_z) or
+                                SegmentBuffer())
+                logging.info("last range: %r", self._last_range)
+                self._cur_range = RangeXY()
+                self._layer_full = False
+                self._request_layer()
+        if stored:
+            # heights end at the new Z
+            self.updateHistory.emit()
         # store new line
         x = self._pos[0]
         y = self._pos[1]
         self._cur_range.update(x, y)
-        self._slice.append((x, y, extrude, self._tool))
-        # repaint every 100ms
-        t = time.time()
-        delta = t - self._last_drawn
-        if delta > 0.1:
-            self.repaint()
-            self._last_drawn = t
+        if not self._layer_full:
+            self._slice.append(x, y, extrude, self._tool)
+        self._schedule_paint()
+
+    def _park_slice(self):
+        """Return state of the current slice to continue it later."""
+        return (self._cur_z, self._slice, self._display, self._layer_pixmap,
+                self._geo_key, self._num_drawn, self._drawn_move,
+                self._height_read, self._layer, self._layer_full,
+                self._cur_range)
+
+    def _unpark_slice(self, parked):
+        (_, self._slice, display, layer_pixmap, geo_key, num_drawn,
+         drawn_move, self._height_read, self._layer, self._layer_full,
+         self._cur_range) = parked
+        self._parked = None
+        if display is not None and display.source is self._slice and \
+                geo_key == self._geo_key and self._history is None:
+            self._display = display
+            self._layer_pixmap = layer_pixmap
+            self._num_drawn = num_drawn
+            self._drawn_move = drawn_move
+        else:
+            self._display = None
+            self._num_drawn = 0
+            self._drawn_move = -1
+
+    def _schedule_paint(self):
+        if not self._suspended:
+            self._model.render.schedule(self)
+
+    def suspend(self):
+        """Only track the print while hidden."""
+        self._suspended = True
+
+    def resume(self):
+        """Redraw with the moves tracked while hidden."""
+        self._suspended = False
+        self._schedule_paint()
+
+    def _store_slice(self):
+        """Keep the finished slice and return True if it is in history."""
+        # finished layer is printed completely
+        self._feed_height_map(len(self._slice))
+        # keep finished layer for the history
+        if self._slice.has_extrusion():
+            self._cache.put(self._cur_z, self._slice)
+            return True
+        return False
+
+    def get_heights(self):
+        """Return Z heights of the past layers that can be shown."""
+        index = self._model.layers.get_index()
+        if index and self._layer >= 0:
+            return list(index.z[:self._layer])
+        return [z for z in self._cache.get_heights() if z < self._cur_z]
+
+    def show_history(self, z):
+        """Show the past layer at height z or the live one if None."""
+        if z == self._history_z:
+            return
+        self._history_z = z
+        segments = None
+        if z is not None:
+            segments = self._cache.get(z)
+            if segments is None:
+                # not seen yet: decode it from the downloaded file
+                index = self._model.layers.get_index()
+                if index:
+                    self._model.layers.request_layer(index.find_z(z))
+                segments = SegmentBuffer()
+        self._set_history(segments)
+
+    def _set_history(self, segments):
+        self._history = segments
+        self._display = None
+        self._schedule_paint()
+
+    def _set_slice(self, segments):
+        self._slice = segments
+        # screen space simplified slice that is actually drawn
+        self._display = None
+        # segments drawn to layer pixmap and tracked move they are drawn for
+        self._num_drawn = 0
+        self._drawn_move = -1
+        # moves of slice added to height map
+        self._height_read = 0
 
     def paintEvent(self, _):
         """Redraw graph."""
@@ -154,12 +469,17 @@ class GCodeWidget(QWidget):
 
         # draw xy geo
         if xy_range:
-            map_func, off, size = self._get_map_func(w, h, xy_range)
+            map_func, off, size, transform = self._get_map_func(
+                w, h, xy_range)
             if map_func:
-                self._draw_box(qp, off, size)
-                self._draw_grid(qp, map_func, xy_range, off, size)
-                self._draw_layer(qp, map_func)
-                self._draw_cursor(qp, map_func)
+                self._update_pixmaps(w, h, xy_range, map_func, off, size,
+                                     transform)
+                qp.drawPixmap(0, 0, self._bg_pixmap)
+                if self._show_height and self._history is None:
+                    self._draw_height_map(qp, transform)
+                qp.drawPixmap(0, 0, self._layer_pixmap)
+                if self._history is None:
+                    self._draw_cursor(qp, map_func)
 
         # draw z bar
         if z_range:
@@ -196,7 +516,7 @@ class GCodeWidget(QWidget):
         x_range = xy_range.get_x_range()
         y_range = xy_range.get_y_range()
         if not x_range.is_valid() or not y_range.is_valid():
-            return None, None, None
+            return None, None, None, None
 
         # calc scale
         x_array = x_range.get_array()
@@ -212,8 +532,142 @@ class GCodeWidget(QWidget):
             return (int((seg[0] - x_array[0]) * scale) + off[0],
                     int((seg[1] - y_array[0]) * scale) + off[1])
 
+        # same mapping for batched drawing of segments
+        transform = QTransform(scale, 0, 0, scale,
+                               off[0] - x_array[0] * scale,
+                               off[1] - y_array[0] * scale)
+
         size = [int(x_size * scale), int(y_size * scale)]
-        return func, off, size
+        return func, off, size, transform
+
+    def _update_pixmaps(self, w, h, xy_range, map_func, off, size,
+                        transform):
+        # background only changes with size or range
+        geo_key = (w, h, tuple(xy_range.get_x_range().get_array()),
+                   tuple(xy_range.get_y_range().get_array()))
+        if geo_key != self._geo_key:
+            self._geo_key = geo_key
+            self._bg_pixmap = QPixmap(w, h)
+            self._bg_pixmap.fill(Qt.transparent)
+            qp = QPainter(self._bg_pixmap)
+            self._draw_box(qp, off, size)
+            self._draw_grid(qp, map_func, xy_range, off, size)
+            qp.end()
+            self._layer_pixmap = None
+            # simplification depends on the pixel grid
+            self._display = None
+            # split arcs to half pixel precision
+            tolerance = 0.5 / transform.m11()
+            self._interp.set_arc_tolerance(tolerance)
+            self._model.layers.set_arc_tolerance(tolerance)
+        display = self._display
+        if display is None:
+            source = self._slice
+            if self._history is not None:
+                source = self._history
+            display = SegmentDecimator(source, transform.m11(),
+                                       transform.dx(), transform.dy())
+            self._display = display
+            self._layer_pixmap = None
+        display.update()
+        segs = display.segments
+        # layer pixmap only gets the segments added since last frame
+        move_no = -1
+        if self._history is None:
+            move_no = display.find_move(self._move_no)
+        if self._layer_pixmap is None or move_no < self._drawn_move:
+            self._layer_pixmap = QPixmap(w, h)
+            self._num_drawn = 0
+            self._drawn_move = -1
+        # the last move may have been extended by new ones
+        start = min(self._num_drawn, display.take_dirty())
+        if start == 0:
+            self._layer_pixmap.fill(Qt.transparent)
+        num = len(segs)
+        if start == num and self._drawn_move == move_no:
+            return
+        qp = QPainter(self._layer_pixmap)
+        # moves printed since last frame are drawn again as done
+        if move_no > self._drawn_move:
+            end = min(move_no + 1, start)
+            self._draw_layer(qp, transform, segs, move_no,
+                             self._drawn_move + 1, end)
+            self._drawn_move = move_no
+        self._draw_layer(qp, transform, segs, move_no, start, num)
+        self._num_drawn = num
+        qp.end()
+
+    def _get_height_map(self):
+        height_map = self._height_map
+        if height_map is None:
+            xy_range, _ = self._pick_ranges()
+            if not xy_range:
+                return None
+            map_func, _, _, transform = self._get_map_func(
+                self.width(), self.height(), xy_range)
+            if not map_func:
+                return None
+            # raster the print area at the current display resolution
+            if self._meta_range.is_valid():
+                xy_range = self._meta_range
+            elif self._def_range.is_valid():
+                xy_range = self._def_range
+            x_array = xy_range.get_x_range().get_array()
+            y_array = xy_range.get_y_range().get_array()
+            max_z = 100.0
+            z_range = self._meta_range.get_z_range()
+            if z_range.is_valid():
+                max_z = max(z_range.get_array()[1], 1.0)
+            height_map = HeightMap(x_array[0], y_array[0],
+                                   x_array[1], y_array[1],
+                                   1.0 / transform.m11(), max_z)
+            self._height_map = height_map
+            logging.info("gcode: %r", height_map)
+        return height_map
+
+    def _feed_height_map(self, end):
+        if not self._show_height or end <= self._height_read:
+            return
+        height_map = self._get_height_map()
+        if height_map:
+            height_map.add_moves(self._slice, self._height_read, end,
+                                 self._cur_z)
+            self._height_read = end
+
+    def _draw_height_map(self, qp, transform):
+        # only moves already printed
+        if self._tracker.is_active():
+            self._feed_height_map(self._move_no + 1)
+        else:
+            self._feed_height_map(len(self._slice))
+        height_map = self._height_map
+        if not height_map:
+            return
+        if height_map.take_dirty() or self._height_image is None:
+            image = QImage(bytes(height_map.pixels), height_map.width,
+                           height_map.height, height_map.stride,
+                           QImage.Format_Indexed8)
+            image.setColorTable(self._get_height_colors(height_map.max_level))
+            self._height_image = image
+        cell = height_map.cell
+        qp.save()
+        qp.setTransform(QTransform(cell, 0, 0, cell, height_map.x0,
+                                   height_map.y0) * transform)
+        qp.drawImage(0, 0, self._height_image)
+        qp.restore()
+
+    def _get_height_colors(self, max_level):
+        # the higher the brighter, relative to the top
+        colors = self._height_colors.get(max_level)
+        if colors is None:
+            colors = [0] * 256
+            for level in range(1, HeightMap.num_levels + 1):
+                f = 0.25 + 0.75 * min(level / max(max_level, 1), 1.0)
+                colors[level] = qRgb(int(150 * f), int(140 * f), int(90 * f))
+                colors[level | 0x80] = qRgb(int(90 * f), int(140 * f),
+                                            int(150 * f))
+            self._height_colors = {max_level: colors}
+        return colors
 
     def _draw_box(self, qp, off, size):
         qp.setPen(QColor(64, 64, 64))
@@ -241,29 +695,47 @@ class GCodeWidget(QWidget):
             qp.drawLine(off[0], y, off[0] + size[0], y)
             y_pos += y_grid
 
-    def _draw_layer(self, qp, map_func):
-        # draw sketch
-        rapid_col = QColor(0, 220, 0)
-        tool_cols = (QColor(255, 255, 0), QColor(0, 255, 255))
-        last_pos = None
-        last_col = None
-        for seg in self._slice:
-            pos = map_func(seg)
-            if last_pos:
-                # adjust color
-                extrude = seg[2]
-                tool = seg[3]
-                if extrude:
-                    col = tool_cols[tool]
+    def _draw_layer(self, qp, transform, segs, move_no, start, end):
+        # draw moves [start, end) as polylines batched by colour
+        batches = {}
+        for first, last, flag in segs.iter_runs(max(start, 1), end):
+            # moves after the tracked position are not printed yet
+            if first <= move_no < last - 1:
+                batches.setdefault((flag, True), []).append(
+                    (first, move_no + 1))
+                first = move_no + 1
+            done = move_no < 0 or first <= move_no
+            batches.setdefault((flag, done), []).append((first, last))
+        if not batches:
+            return
+        # a move starts at the end point of the previous one
+        base = max(start, 1) - 1
+        points = _to_polygon(segs.xy, base, end)
+        qp.save()
+        qp.setTransform(transform)
+        for key, runs in batches.items():
+            qp.setPen(self._get_pen(*key))
+            for first, last in runs:
+                qp.drawPolyline(points.mid(first - 1 - base, last - first + 1))
+        qp.restore()
+
+    def _get_pen(self, flag, done):
+        pen = self._pens.get((flag, done))
+        if pen is None:
+            tool = (flag >> 1) % 2
+            if flag & SegmentBuffer.extrude_flag:
+                if done:
+                    col = (QColor(255, 255, 0), QColor(0, 255, 255))[tool]
                 else:
-                    col = rapid_col
-                if col != last_col:
-                    qp.setPen(col)
-                    last_col = col
-                # draw line
-                # pylint: disable=E1136
-                qp.drawLine(last_pos[0], last_pos[1], pos[0], pos[1])
-            last_pos = pos
+                    col = (QColor(96, 96, 64), QColor(64, 96, 96))[tool]
+            elif done:
+                col = QColor(0, 220, 0)
+            else:
+                col = QColor(32, 80, 32)
+            # cosmetic pen keeps its width under the transform
+            pen = QPen(col, 0)
+            self._pens[(flag, done)] = pen
+        return pen
 
     def _draw_cursor(self, qp, map_func):
         # draw cursor
@@ -276,7 +748,8 @@ class GCodeWidget(QWidget):
     def _draw_z(self, qp, h, z_range):
         z_array = z_range.get_array()
         z_size = z_array[1] - z_array[0]
-        z_pos = self._cur_z - z_array[0]
+        z = self._cur_z if self._history_z is None else self._history_z
+        z_pos = z - z_array[0]
         y = int(z_pos * (h-2) / z_size)
         # bar
         qp.setPen(QColor(64, 64, 64))
@@ -13,7 +13,7 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import pyqtSlot, Qt
 
 from tentacle.util import ts_to_hms
-from tentacle.client import JobData, ProgressData, TempData
+from tentacle.client import JobData, ProgressData, TempData, heater_tool_no
 
 
 class JobWidget(QWidget):
@@ -52,16 +52,16 @@ class JobWidget(QWidget):
         # fill table
         self._l_user = QTableWidgetItem()
         self._l_file_name = QTableWidgetItem()
-        self._l_f0 = QTableWidgetItem()
-        self._l_f1 = QTableWidgetItem()
+        self._l_fil = QTableWidgetItem()
+        self._l_fil_sum = QTableWidgetItem()
         self._l_file_size = QTableWidgetItem()
         self._l_current_z = QTableWidgetItem()
         t.setItem(0, 0, QTableWidgetItem("File"))
         t.setItem(0, 1, self._l_file_name)
         t.setItem(0, 2, self._l_user)
         t.setItem(1, 0, QTableWidgetItem("Filament"))
-        t.setItem(1, 1, self._l_f0)
-        t.setItem(1, 2, self._l_f1)
+        t.setItem(1, 1, self._l_fil)
+        t.setItem(1, 2, self._l_fil_sum)
         t.setItem(2, 0, QTableWidgetItem("CurrentZ"))
         t.setItem(2, 1, self._l_current_z)
         # progress
@@ -74,12 +74,12 @@ class JobWidget(QWidget):
         t.setItem(4, 0, QTableWidgetItem("Size"))
         t.setItem(4, 1, self._l_file_pos)
         t.setItem(4, 2, self._l_file_size)
-        # temp
-        self._l_t0 = QTableWidgetItem()
-        self._l_t1 = QTableWidgetItem()
+        # temp: tools and other heaters
+        self._l_tools = QTableWidgetItem()
+        self._l_heaters = QTableWidgetItem()
         t.setItem(5, 0, QTableWidgetItem("Temps"))
-        t.setItem(5, 1, self._l_t0)
-        t.setItem(5, 2, self._l_t1)
+        t.setItem(5, 1, self._l_tools)
+        t.setItem(5, 2, self._l_heaters)
         # progress bar with control buttons
         hb = QHBoxLayout()
         hb.setContentsMargins(0, 0, 0, 0)
@@ -93,19 +93,46 @@ class JobWidget(QWidget):
         self._b_pause = QPushButton("Pause")
         self._b_pause.clicked.connect(self.on_pause)
         hb.addWidget(self._b_pause)
+        # latest data per handler while the tab is hidden
+        self._suspended = False
+        self._pending = {}
+
+    def suspend(self):
+        """Keep only the latest updates while hidden."""
+        self._suspended = True
+
+    def resume(self):
+        """Show the latest updates received while hidden."""
+        self._suspended = False
+        pending = self._pending
+        self._pending = {}
+        for handler, data in pending.items():
+            handler(data)
+
+    def _defer(self, handler, data):
+        if self._suspended:
+            self._pending[handler] = data
+            return True
+        return False
 
     @pyqtSlot(JobData)
     def on_updatedJob(self, data):
         """React on changes in job parameters."""
+        if self._defer(self.on_updatedJob, data):
+            return
         self._l_user.setText("@" + data.user)
         self._l_file_name.setText(data.file)
         self._l_file_size.setText(str(data.size))
-        self._l_f0.setText("%3.2f" % data.fl0)
-        self._l_f1.setText("%3.2f" % data.fl1)
+        # per tool lengths and the sum
+        fil = data.filament
+        self._l_fil.setText(" / ".join("%3.2f" % f for f in fil))
+        self._l_fil_sum.setText("%3.2f" % sum(fil) if len(fil) > 1 else "")
 
     @pyqtSlot(ProgressData)
     def on_updateProgress(self, data):
         """React on changes in progress."""
+        if self._defer(self.on_updateProgress, data):
+            return
         self._p_completion.setValue(int(data.completion))
         hms = ts_to_hms(data.time)
         self._l_time.setText("%02d:%02d:%02d" % hms)
@@ -118,6 +145,8 @@ class JobWidget(QWidget):
     @pyqtSlot(float)
     def on_updateCurrentZ(self, z):
         """React on Z axis change."""
+        if self._defer(self.on_updateCurrentZ, z):
+            return
         if z < 0.0:
             self._l_current_z.setText("N/A")
         else:
@@ -126,12 +155,19 @@ class JobWidget(QWidget):
     @pyqtSlot(TempData)
     def on_updateTemps(self, data):
         """Handle Temp Update."""
-        t0 = data.tool0
-        t1 = data.tool1
-        txt0 = "%6.2f / %6.2f" % t0
-        txt1 = "%6.2f / %6.2f" % t1
-        self._l_t0.setText(txt0)
-        self._l_t1.setText(txt1)
+        if self._defer(self.on_updateTemps, data):
+            return
+        tools = []
+        others = []
+        values = data.values
+        for idx, name in enumerate(data.heaters):
+            txt = "%3.0f/%3.0f" % (values[idx * 2], values[idx * 2 + 1])
+            if heater_tool_no(name) is not None:
+                tools.append(txt)
+            else:
+                others.append(name[0:1].upper() + ":" + txt)
+        self._l_tools.setText("  ".join(tools))
+        self._l_heaters.setText("  ".join(others))
 
     @pyqtSlot(str)
     def on_updateState(self, state):
@@ -0,0 +1,98 @@
+"""Rate limited repaints of the UI widgets."""
+
+import time
+import logging
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QRegion
+
+
+class RenderScheduler(QObject):
+    """Collect repaint requests of widgets and flush them at a fixed rate.
+
+    Widgets call schedule() instead of repaint(). Requests for a widget
+    that is already waiting are merged into one paint of the united
+    region. Pending paints of widgets that got hidden are dropped.
+    """
+
+    def __init__(self, fps=15, stats_interval=60):
+        """Create scheduler with maximum frames per second."""
+        super().__init__()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._flush)
+        self.set_fps(fps)
+        self._stats_interval = stats_interval
+        self._last_flush = 0.0
+        # widget -> QRegion or None for the whole widget
+        self._dirty = {}
+        self._stats_time = time.monotonic()
+        self.reset_stats()
+
+    def set_fps(self, fps):
+        """Set maximum frames per second."""
+        self._interval = 1.0 / max(fps, 1)
+
+    def schedule(self, widget, rect=None):
+        """Repaint rect of widget or all of it with the next frame."""
+        self._requests += 1
+        if widget in self._dirty:
+            self._merged += 1
+            region = self._dirty[widget]
+            if region is not None:
+                if rect is None:
+                    self._dirty[widget] = None
+                else:
+                    self._dirty[widget] = region.united(QRegion(rect))
+        else:
+            self._dirty[widget] = None if rect is None else QRegion(rect)
+        if not self._timer.isActive():
+            # next frame not before the interval has passed
+            delay = self._last_flush + self._interval - time.monotonic()
+            self._timer.start(max(int(delay * 1000), 0))
+
+    def get_stats(self):
+        """Return dict of frames, paints, requests, merged and dropped."""
+        return {
+            "frames": self._frames,
+            "paints": self._paints,
+            "requests": self._requests,
+            "merged": self._merged,
+            "dropped": self._dropped
+        }
+
+    def reset_stats(self):
+        """Reset the counters returned by get_stats()."""
+        self._frames = 0
+        self._paints = 0
+        self._requests = 0
+        self._merged = 0
+        self._dropped = 0
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        dirty = self._dirty
+        self._dirty = {}
+        for widget, region in dirty.items():
+            if not widget.isVisible():
+                self._dropped += 1
+            elif region is None:
+                widget.repaint()
+                self._paints += 1
+            else:
+                widget.repaint(region)
+                self._paints += 1
+        self._frames += 1
+        self._log_stats()
+
+    def _log_stats(self):
+        now = time.monotonic()
+        delta = now - self._stats_time
+        if not self._stats_interval or delta < self._stats_interval:
+            return
+        stats = self.get_stats()
+        logging.info("render: %.1f fps, paints=%d, requests=%d, merged=%d, "
+                     "dropped=%d", stats["frames"] / delta, stats["paints"],
+                     stats["requests"], stats["merged"], stats["dropped"])
+        self._stats_time = now
+        self.reset_stats()
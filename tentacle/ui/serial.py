@@ -1,6 +1,7 @@
 """The serial tab."""
 
 import time
+import collections
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QPlainTextEdit, QHBoxLayout, QPushButton
@@ -43,6 +44,9 @@ class SerialWidget(QWidget):
         hlayout.addWidget(self._b_disconnect)
         # state
         self._last_ts = None
+        # lines received while the tab is hidden
+        self._suspended = False
+        self._pending = collections.deque(maxlen=1000)
 
     def configure(self, cfg):
         """Configure widget from config file."""
@@ -55,6 +59,17 @@ class SerialWidget(QWidget):
             fnt.setFamily(family)
         self._w_log.setFont(fnt)
 
+    def suspend(self):
+        """Only record log lines while hidden."""
+        self._suspended = True
+
+    def resume(self):
+        """Show the log lines recorded while hidden."""
+        self._suspended = False
+        for fmt, delta, line in self._pending:
+            self._w_log.appendHtml(fmt % (delta, line))
+        self._pending.clear()
+
     def _on_update_state(self, state):
         if state == "Offline":
             connect = True
@@ -78,14 +93,17 @@ class SerialWidget(QWidget):
         return delta
 
     def _on_send_raw(self, line):
-        delta = self._calc_delta()
-        txt = '<font color="#0F0">TX %04d: %s</font>' % (delta, line)
-        self._w_log.appendHtml(txt)
+        self._add_line('<font color="#0F0">TX %04d: %s</font>', line)
 
     def _on_recv_raw(self, line):
+        self._add_line("RX %04d: %s", line)
+
+    def _add_line(self, fmt, line):
         delta = self._calc_delta()
-        txt = "RX %04d: %s" % (delta, line)
-        self._w_log.appendHtml(txt)
+        if self._suspended:
+            self._pending.append((fmt, delta, line))
+        else:
+            self._w_log.appendHtml(fmt % (delta, line))
 
     def _on_connect(self):
         self._client.connect()
@@ -2,17 +2,91 @@
 
 import logging
 import time
+from array import array
 
-from PyQt5.QtCore import pyqtSlot, QPoint
-from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QColor, QFontMetrics, QFont
+from PyQt5.QtCore import pyqtSlot, QPoint, QRect, Qt
+from PyQt5.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QPushButton,
+    QButtonGroup
+)
+from PyQt5.QtGui import QPainter, QColor, QFontMetrics, QFont, QPixmap
 
-from tentacle.client import TempData
+from tentacle.client import TempData, heater_tool_no
 from tentacle.util import ts_to_hms
 
 
 class TempWidget(QWidget):
-    """A temperature graph widget."""
+    """The temperature tab with a graph and zoom buttons."""
+
+    # (label, seconds shown or None for all samples)
+    zooms = (
+        ("5m", 300),
+        ("30m", 1800),
+        ("2h", 7200),
+        ("All", None)
+    )
+
+    def __init__(self, model, client):
+        """Create temperature widget."""
+        super().__init__()
+        self._model = model
+        self._client = client
+        # ui
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(1)
+        self.setLayout(layout)
+        self._view = TempView(model, client)
+        layout.addWidget(self._view, 100)
+        hlayout = QHBoxLayout()
+        hlayout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(hlayout)
+        self._but_grp = QButtonGroup(self)
+        for idx, zoom in enumerate(self.zooms):
+            button = QPushButton(zoom[0])
+            button.setCheckable(True)
+            self._but_grp.addButton(button, idx)
+            hlayout.addWidget(button)
+        self._but_grp.buttonClicked[int].connect(self._on_zoom)
+        self._but_grp.button(0).setChecked(True)
+        self._view.set_span(self.zooms[0][1])
+
+    def configure(self, cfg):
+        """Configure widget from config file."""
+        self._view.configure(cfg)
+
+    def suspend(self):
+        """Only record samples while hidden."""
+        self._view.suspend()
+
+    def resume(self):
+        """Redraw with the samples recorded while hidden."""
+        self._view.resume()
+
+    @pyqtSlot(int)
+    def _on_zoom(self, idx):
+        self._view.set_span(self.zooms[idx][1])
+
+
+class TempView(QWidget):
+    """A temperature graph widget.
+
+    Every column of the plot shows min, max and average of one time
+    step, so short spikes stay visible at any zoom. The columns are
+    read from the finest level of the temperature history that still
+    covers the shown span, so a redraw only reads a bounded ring and
+    never all samples recorded.
+    """
+
+    temps_per_row = 3
+    # time lines: first step with at least tick_dist pixels
+    tick_steps = (60, 300, 900, 1800, 3600, 10800, 21600, 43200, 86400)
+    tick_dist = 24
+    # connect columns not more than this many seconds apart
+    max_gap = 30
 
     def __init__(self, model, client):
         """Create graph widget."""
@@ -21,30 +95,50 @@ class TempWidget(QWidget):
         self._model = model
         self._client = client
         self._model.updateTemps.connect(self.on_updateTemps)
+        self._model.updateHeaters.connect(self.on_updateHeaters)
         self.min_y = 0
         self.max_y = 100
         self.step_y = 10
         self.font_family = None
         self.font_size = 8
-        # data buf
-        self.data_len = 320
-        self.data_buf = [None] * self.data_len
-        self.data_pos = 0
-        # tick step: 60s
-        self.tick_step = 60
-        self.tick_last_ts = None
+        # seconds shown or None for all samples
+        self._span = None
+        # seconds per column and column index drawn at x=1
+        self._period = 1.0
+        self._first_col = 0
+        self._tick_step = 60
+        # min, max and average sum of the newest column
+        self._col = None
+        self._col_min = None
+        self._col_max = None
+        self._col_sum = None
+        self._col_num = 0
+        # average of the column drawn before
+        self._prev_col = None
+        self._prev_avg = None
         # colors
         self.col_bg = QColor(0, 0, 0)
         self.col_grid = QColor(64, 64, 64)
         self.col_txt = QColor(255, 255, 255)
+        # (target, actual) color per heater index
         self.col_temps = (
-            QColor(128, 100, 100),
-            QColor(255, 200, 200),
-            QColor(100, 128, 100),
-            QColor(200, 255, 200),
-            QColor(100, 100, 128),
-            QColor(200, 200, 255),
+            (QColor(128, 100, 100), QColor(255, 200, 200)),
+            (QColor(100, 128, 100), QColor(200, 255, 200)),
+            (QColor(100, 100, 128), QColor(200, 200, 255)),
+            (QColor(128, 128, 100), QColor(255, 255, 200)),
+            (QColor(128, 100, 128), QColor(255, 200, 255)),
+            (QColor(100, 128, 128), QColor(200, 255, 255)),
         )
+        self.col_plot = QColor(32, 32, 32)
+        # plot scrolled by one column per time step and static grid labels
+        self._plot_pixmap = None
+        self._grid_pixmap = None
+        self._suspended = False
+        # start with the last sample the model already knows
+        self._last_data = None
+        raw = self._model.get_temp_history().get_raw()
+        for ts, values in raw.get_last(1):
+            self._last_data = TempData(ts, self._model.get_heaters(), values)
 
     def configure(self, cfg):
         """Configure widget from config file."""
@@ -58,34 +152,88 @@ class TempWidget(QWidget):
             self.font_size = int(cfg["font_size"])
         if "font_family" in cfg:
             self.font_family = cfg["font_family"]
+        self._plot_pixmap = None
+        self._grid_pixmap = None
+
+    def set_span(self, span):
+        """Show the last span seconds or all samples if None."""
+        if span == self._span:
+            return
+        self._span = span
+        self._plot_pixmap = None
+        if not self._suspended:
+            self._model.render.schedule(self)
+
+    def get_span(self):
+        """Return seconds shown or None for all samples."""
+        return self._span
 
     @pyqtSlot(TempData)
     def on_updateTemps(self, data):
         """Temperature data processing."""
-        self.data_buf[self.data_pos] = data
-        self.data_pos += 1
-        # scroll buffer to left
-        if self.data_pos == self.data_len:
-            self.data_pos = self.data_len - 1
-            self.data_buf = self.data_buf[1:] + [None]
-        # tick this data (will draw a vertical bar in graph)?
-        self._calc_tick(data)
-        # redraw widget
-        self.repaint()
-
-    def _calc_tick(self, data):
-        ts = (data.time // self.tick_step) * self.tick_step
-        tick = False
-        if self.tick_last_ts is None:
-            self.tick_last_ts = ts
-            tick = True
+        prev = self._last_data
+        self._last_data = data
+        if self._suspended:
+            # redraw all when shown again
+            self._plot_pixmap = None
+            return
+        rect = None
+        if self._plot_pixmap:
+            rect = self._plot_sample(data)
+        render = self._model.render
+        if rect is None or prev is None or \
+                len(prev.heaters) != len(data.heaters):
+            # redraw widget with next frame
+            render.schedule(self)
+            return
+        # only the new column and the texts changed
+        render.schedule(self, rect)
+        for text_rect in self._get_text_rects(self.width(), self.height()):
+            render.schedule(self, text_rect)
+
+    @pyqtSlot(object)
+    def on_updateHeaters(self, heaters):
+        """Redraw from the history of the new heater layout."""
+        self._plot_pixmap = None
+
+    def suspend(self):
+        """Only record samples while hidden."""
+        self._suspended = True
+
+    def resume(self):
+        """Redraw with the samples recorded while hidden."""
+        self._suspended = False
+        self._model.render.schedule(self)
+
+    def _get_last_data(self):
+        return self._last_data
+
+    def _setup_columns(self, w):
+        """Derive time step of a column from the span to show."""
+        num = max(w - 2, 1)
+        end = self._last_data.time if self._last_data else 0
+        start = self._model.get_temp_history().get_start_time()
+        if start is None:
+            start = end
+        if self._span:
+            period = self._span / num
         else:
-            delta = ts - self.tick_last_ts
-            if delta >= self.tick_step:
-                self.tick_last_ts = ts
-                tick = True
-        # store tick flag
-        data.tick = tick
+            # double the step to keep a quarter of the plot free
+            period = 1.0
+            while (end - start) / period > num * 3 // 4:
+                period *= 2
+        self._period = period
+        self._first_col = max(int(end // period) - num + 1,
+                              int(start // period))
+        for step in self.tick_steps:
+            if step / period >= self.tick_dist:
+                break
+        self._tick_step = step
+
+    def _is_tick(self, col):
+        period = self._period
+        step = self._tick_step
+        return int(col * period // step) != int((col - 1) * period // step)
 
     def resizeEvent(self, e):
         """React on initial widget resize."""
@@ -112,15 +260,8 @@ class TempWidget(QWidget):
         self.t_scl = height / self.t_h
         # map func
         self.map_y = lambda x: int(self.t_start - x * self.t_scl)
-        # shrink buffer?
-        if self.data_len > width:
-            shrink = self.data_len - width
-            self.data_len = width
-            self.data_buf = self.data_buf[shrink:]
-            if self.data_pos > shrink:
-                self.data_pos -= shrink
-            else:
-                self.data_pos = 0
+        self._plot_pixmap = None
+        self._grid_pixmap = None
 
     def paintEvent(self, _):
         """Redraw graph."""
@@ -134,23 +275,199 @@ class TempWidget(QWidget):
         logging.debug("temp paint: %6.3f ms", d * 1000.0)
 
     def _draw(self, qp, w, h):
+        pixmap = self._plot_pixmap
+        if pixmap is None or pixmap.width() != w or pixmap.height() != h:
+            self._redraw_plot(w, h)
+        if self._grid_pixmap is None:
+            self._redraw_grid_text(w, h)
+        qp.drawPixmap(0, 0, self._plot_pixmap)
+        qp.drawPixmap(0, 0, self._grid_pixmap)
+        # texts
+        qp.setPen(self.col_txt)
+        qp.setFont(self.f)
+        self._draw_time(qp, w)
+        self._draw_temps_text(qp, w, h)
+
+    def _redraw_plot(self, w, h):
+        self._plot_pixmap = QPixmap(w, h)
+        qp = QPainter(self._plot_pixmap)
         # blank
         qp.setPen(self.col_bg)
-        qp.setBrush(QColor(32, 32, 32))
+        qp.setBrush(self.col_plot)
         qp.drawRect(0, 0, w, h)
         # grid
+        self._setup_columns(w)
         self._draw_grid(qp, w)
-        # plot graph
-        x = 1
-        last_data = None
-        for data in self.data_buf:
-            self._draw_data(qp, x, h, data, last_data)
-            last_data = data
-            x += 1
-        # texts
+        self._draw_background(qp, 1, w - 2, h)
+        # plot columns from the history incl. the one left of the plot
+        qp.setClipRect(1, 0, w - 2, h)
+        self._col = None
+        self._prev_col = None
+        history = self._model.get_temp_history()
+        period = self._period
+        start = (self._first_col - 1) * period
+        end = self._last_data.time if self._last_data else 0
+        ring = history.find_level(period, start)
+        raw = ring.get_period() == 0
+        # place buckets at their center but not after the last sample
+        center = ring.get_period() / 2
+        for ts, values in ring.get_since(start):
+            col = int(min(ts + center, end) // period)
+            if col != self._col:
+                # draw column once complete
+                if self._col is not None:
+                    self._draw_column(qp, h, False)
+                self._next_column(col)
+            self._add_values(values, raw)
+        if self._col is not None:
+            self._draw_column(qp, h, False)
+        qp.end()
+
+    def _plot_sample(self, data):
+        """Draw column of the new sample and return the changed rect."""
+        pixmap = self._plot_pixmap
+        w = pixmap.width()
+        h = pixmap.height()
+        values = data.values
+        col = int(data.time // self._period)
+        if self._col_min is not None and len(self._col_min) != len(values):
+            # heater layout changed
+            self._col = None
+        if col != self._col:
+            self._next_column(col)
+        self._add_values(values, True)
+        max_x = w - 2
+        x = col - self._first_col + 1
+        if x < 1:
+            # time went back
+            self._plot_pixmap = None
+            return None
+        if x > max_x:
+            if not self._span:
+                # show all: next time step
+                self._plot_pixmap = None
+                return None
+            shift = x - max_x
+            self._first_col += shift
+            qp = QPainter(pixmap)
+            qp.setClipRect(1, 0, max_x, h)
+            if shift < max_x:
+                pixmap.scroll(-shift, 0, QRect(1, 0, max_x, h))
+            self._draw_background(qp, max(max_x - shift + 1, 1), max_x, h)
+            self._draw_column(qp, h)
+            qp.end()
+            return QRect(1, 0, max_x, h)
+        qp = QPainter(pixmap)
+        qp.setClipRect(1, 0, max_x, h)
+        x0 = self._draw_column(qp, h)
+        qp.end()
+        return QRect(x0, 0, x - x0 + 1, h)
+
+    def _next_column(self, col):
+        """Start a new column and keep average of the current one."""
+        if self._col is not None and self._col_num:
+            self._prev_col = self._col
+            self._prev_avg = self._get_avg()
+        else:
+            self._prev_col = None
+        self._col = col
+        self._col_num = 0
+
+    def _add_values(self, values, raw):
+        """Add a raw sample or a (min, max, avg) record to the column."""
+        if raw:
+            mins = maxs = avgs = values
+        else:
+            mins = values[0::3]
+            maxs = values[1::3]
+            avgs = values[2::3]
+        if not self._col_num:
+            self._col_min = array('d', mins)
+            self._col_max = array('d', maxs)
+            self._col_sum = array('d', avgs)
+        else:
+            col_min = self._col_min
+            col_max = self._col_max
+            col_sum = self._col_sum
+            for i in range(len(col_min)):
+                if mins[i] < col_min[i]:
+                    col_min[i] = mins[i]
+                if maxs[i] > col_max[i]:
+                    col_max[i] = maxs[i]
+                col_sum[i] += avgs[i]
+        self._col_num += 1
+
+    def _get_avg(self):
+        num = self._col_num
+        return array('d', [v / num for v in self._col_sum])
+
+    def _draw_background(self, qp, x0, x1, h):
+        """Clear columns x0 to x1 and draw grid and time lines."""
+        if x1 < x0:
+            return
+        qp.fillRect(x0, 1, x1 - x0 + 1, h - 1, self.col_plot)
+        qp.setPen(self.col_grid)
+        off = self.min_y
+        while off <= self.max_y:
+            y = self.map_y(off)
+            qp.drawLine(x0, y, x1, y)
+            off += self.step_y
+        col = self._first_col + x0 - 1
+        for x in range(x0, x1 + 1):
+            if self._is_tick(col):
+                qp.drawLine(x, 1, x, h - 1)
+            col += 1
+
+    def _draw_column(self, qp, h, clear=True):
+        """Draw the newest column and return the first x redrawn."""
+        col = self._col
+        mins = self._col_min
+        maxs = self._col_max
+        avgs = self._get_avg()
+        prev = self._prev_avg
+        x = col - self._first_col + 1
+        x0 = x
+        px = None
+        prev_col = self._prev_col
+        if prev_col is not None and \
+                col - prev_col <= max(2, self.max_gap / self._period):
+            px = prev_col - self._first_col + 1
+            x0 = max(px + 1, 1)
+        # columns after the previous one are redrawn completely
+        if clear:
+            self._draw_background(qp, x0, x, h)
+        map_y = self.map_y
+        col_temps = self.col_temps
+        num_cols = len(col_temps)
+        if px is not None and px < x - 1:
+            # lines over columns without samples
+            clip = qp.clipRegion()
+            qp.setClipRect(x0, 0, x - x0, h, Qt.IntersectClip)
+            for i in range(len(avgs)):
+                qp.setPen(col_temps[(i // 2) % num_cols][(i + 1) % 2])
+                qp.drawLine(px, map_y(prev[i]), x, map_y(avgs[i]))
+            qp.setClipRegion(clip)
+        # temp values: (actual, target) pairs, target drawn first
+        for i in range(0, len(avgs), 2):
+            cols = col_temps[(i // 2) % num_cols]
+            for j, c in ((i + 1, cols[0]), (i, cols[1])):
+                y_min = map_y(mins[j])
+                y_max = map_y(maxs[j])
+                if px == x - 1:
+                    # span from the previous average
+                    y = map_y(prev[j])
+                    y_min = max(y_min, y)
+                    y_max = min(y_max, y)
+                qp.setPen(c)
+                qp.drawLine(x, y_max, x, y_min)
+        return x0
+
+    def _redraw_grid_text(self, w, h):
+        self._grid_pixmap = QPixmap(w, h)
+        self._grid_pixmap.fill(Qt.transparent)
+        qp = QPainter(self._grid_pixmap)
         self._draw_grid_text(qp)
-        self._draw_time(qp, w)
-        self._draw_temps_text(qp, w, h)
+        qp.end()
 
     def _draw_grid(self, qp, w):
         qp.setPen(self.col_grid)
@@ -160,33 +477,6 @@ class TempWidget(QWidget):
             qp.drawLine(0, y, w, y)
             off += self.step_y
 
-    def _draw_data(self, qp, x, h, data, last_data):
-        if not data or not last_data:
-            return
-        # tick?
-        if data.tick:
-            qp.setPen(self.col_grid)
-            qp.drawLine(x, 1, x, h - 1)
-        # temp values
-        if data.bed and last_data.bed:
-            self._draw_temp(qp, x, data.bed, last_data.bed, 0)
-        if data.tool0 and last_data.tool0:
-            self._draw_temp(qp, x, data.tool0, last_data.tool0, 2)
-        if data.tool1 and last_data.tool1:
-            self._draw_temp(qp, x, data.tool1, last_data.tool1, 4)
-
-    def _draw_temp(self, qp, x, val_pair, last_val_pair, col_off):
-        # target temp
-        qp.setPen(self.col_temps[col_off])
-        yl = self.map_y(last_val_pair[1])
-        yn = self.map_y(val_pair[1])
-        qp.drawLine(x - 1, yl, x, yn)
-        # current val
-        qp.setPen(self.col_temps[col_off + 1])
-        yl = self.map_y(last_val_pair[0])
-        yn = self.map_y(val_pair[0])
-        qp.drawLine(x - 1, yl, x, yn)
-
     def _draw_grid_text(self, qp):
         qp.setPen(self.col_txt)
         qp.setFont(self.f)
@@ -198,10 +488,19 @@ class TempWidget(QWidget):
             qp.drawText(tr, 0, str(off))
             off += self.step_y * 2
 
+    def _get_text_rects(self, w, h):
+        """Return the bands of the texts that change with each sample."""
+        rects = [QRect(0, 0, w, self.time_tr.height() + 2)]
+        last_data = self._get_last_data()
+        if last_data:
+            per_row = self.temps_per_row
+            rows = (last_data.get_num_heaters() + per_row - 1) // per_row
+            height = rows * self.fm.height() + 2
+            rects.append(QRect(0, h - height, w, height))
+        return rects
+
     def _draw_time(self, qp, w):
-        if self.data_pos == 0:
-            return
-        last_data = self.data_buf[self.data_pos - 1]
+        last_data = self._get_last_data()
         if not last_data:
             return
         ts = last_data.time
@@ -213,28 +512,36 @@ class TempWidget(QWidget):
         qp.drawText(tr, 0, time_str)
 
     def _draw_temps_text(self, qp, w, h):
-        if self.data_pos == 0:
-            return
-        last_data = self.data_buf[self.data_pos - 1]
+        last_data = self._get_last_data()
         if not last_data:
             return
-        if last_data.bed:
-            self._draw_temp_text(qp, w, h, last_data.bed, 0, "B")
-        if last_data.tool0:
-            self._draw_temp_text(qp, w, h, last_data.tool0, 1, "0")
-        if last_data.tool1:
-            self._draw_temp_text(qp, w, h, last_data.tool1, 2, "1")
-
-    def _draw_temp_text(self, qp, w, h, vals, off, txt):
+        num = last_data.get_num_heaters()
+        for idx, name in enumerate(last_data.heaters):
+            vals = last_data.get(idx)
+            self._draw_temp_text(qp, w, h, vals, idx, num,
+                                 self._heater_label(name))
+
+    def _heater_label(self, name):
+        tool_no = heater_tool_no(name)
+        if tool_no is not None:
+            return str(tool_no)
+        return name[0:1].upper()
+
+    def _draw_temp_text(self, qp, w, h, vals, idx, num, txt):
         txt = "%s: %7.2f/%4.0f" % (txt, vals[0], vals[1])
         tr = self.fm.boundingRect(txt)
-        if off == 0:
+        # up to three labels per row: left, right and centered
+        per_row = self.temps_per_row
+        row = idx // per_row
+        col = idx % per_row
+        num_cols = min(num - row * per_row, per_row)
+        if col == 0:
             tr.moveLeft(2)
-        elif off == 1:
-            tr.moveCenter(QPoint(w // 2, 0))
-        else:
+        elif col == num_cols - 1:
             tr.moveRight(w - 2)
-        tr.moveBottom(h - 2)
-        c = self.col_temps[off * 2 + 1]
+        else:
+            tr.moveCenter(QPoint(w * col // (num_cols - 1), 0))
+        tr.moveBottom(h - 2 - row * tr.height())
+        c = self.col_temps[idx % len(self.col_temps)][1]
         qp.setPen(c)
         qp.drawText(tr, 0, txt)
@@ -2,7 +2,7 @@
 
 import logging
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, pyqtSlot
 from PyQt5.QtWidgets import (
     QWidget,
     QGridLayout,
@@ -15,11 +15,16 @@ from PyQt5.QtWidgets import (
     QSlider
 )
 
+from tentacle.client import heater_tool_no
+
 
 class ToolWidget(QWidget):
     """Tool Operations Widget."""
 
     default_amount = 5
+    default_tool_temps = (180, 210)
+    default_bed_temps = (50, 60)
+    default_other_temps = (40, 50)
 
     def __init__(self, model, client):
         """Create a new Tool widget."""
@@ -27,76 +32,20 @@ class ToolWidget(QWidget):
         self._model = model
         self._client = client
         self._model.updateTemps.connect(self.on_update_temps)
-        # param
-        self._t0_temps = [1, 2]
-        self._t1_temps = [1, 2]
-        self._bd_temps = [1, 2]
+        self._model.updateHeaters.connect(self.on_update_heaters)
+        # param: preset temps per config prefix
+        self._temps = {}
+        # heater rows: (temp label, target label)
+        self._rows = []
+        self._heaters = ()
         # layout
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
         # --- target temp ---
-        # tool0
-        self._t0_label = QLabel("Tool0")
-        self._t0_temp = QLabel("000")
-        self._t0_target = QLabel("000")
-        self._t0_off = QPushButton("Off")
-        self._t0_off.clicked.connect(lambda: self._set_tool(0, 0))
-        self._t0_set1 = QPushButton("180")
-        self._t0_set1.clicked.connect(
-            lambda: self._set_tool(0, self._t0_temps[0]))
-        self._t0_set2 = QPushButton("210")
-        self._t0_set2.clicked.connect(
-            lambda: self._set_tool(0, self._t0_temps[1]))
-        # tool1
-        self._t1_label = QLabel("Tool1")
-        self._t1_temp = QLabel("000")
-        self._t1_target = QLabel("000")
-        self._t1_off = QPushButton("Off")
-        self._t1_off.clicked.connect(lambda: self._set_tool(1, 0))
-        self._t1_set1 = QPushButton("180")
-        self._t1_set1.clicked.connect(
-            lambda: self._set_tool(1, self._t1_temps[0]))
-        self._t1_set2 = QPushButton("210")
-        self._t1_set2.clicked.connect(
-            lambda: self._set_tool(1, self._t1_temps[1]))
-        # bed
-        self._bd_label = QLabel("Bed")
-        self._bd_temp = QLabel("000")
-        self._bd_target = QLabel("000")
-        self._bd_off = QPushButton("Off")
-        self._bd_off.clicked.connect(lambda: self._set_bed(0))
-        self._bd_set1 = QPushButton("180")
-        self._bd_set1.clicked.connect(
-            lambda: self._set_bed(self._bd_temps[0]))
-        self._bd_set2 = QPushButton("210")
-        self._bd_set2.clicked.connect(
-            lambda: self._set_bed(self._bd_temps[1]))
-        # tool, bed grid
-        grid = QGridLayout()
-        grid.setContentsMargins(0, 0, 0, 0)
-        layout.addLayout(grid)
-        # tool0
-        grid.addWidget(self._t0_label, 0, 0)
-        grid.addWidget(self._t0_temp, 0, 1)
-        grid.addWidget(self._t0_off, 0, 2)
-        grid.addWidget(self._t0_set1, 0, 3)
-        grid.addWidget(self._t0_set2, 0, 4)
-        grid.addWidget(self._t0_target, 0, 5)
-        # tool1
-        grid.addWidget(self._t1_label, 1, 0)
-        grid.addWidget(self._t1_temp, 1, 1)
-        grid.addWidget(self._t1_off, 1, 2)
-        grid.addWidget(self._t1_set1, 1, 3)
-        grid.addWidget(self._t1_set2, 1, 4)
-        grid.addWidget(self._t1_target, 1, 5)
-        # bed
-        grid.addWidget(self._bd_label, 2, 0)
-        grid.addWidget(self._bd_temp, 2, 1)
-        grid.addWidget(self._bd_off, 2, 2)
-        grid.addWidget(self._bd_set1, 2, 3)
-        grid.addWidget(self._bd_set2, 2, 4)
-        grid.addWidget(self._bd_target, 2, 5)
+        self._grid = QGridLayout()
+        self._grid.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(self._grid)
         # --- filament ---
         # filament
         hlayout = QHBoxLayout()
@@ -110,17 +59,13 @@ class ToolWidget(QWidget):
         self._b_retract.clicked.connect(self._on_retract)
         hlayout.addWidget(self._b_retract)
         # tool selection
-        but_grp = QButtonGroup()
+        self._but_grp = QButtonGroup(self)
         hlayout = QHBoxLayout()
         hlayout.setContentsMargins(0, 0, 0, 0)
         layout.addLayout(hlayout)
-        self._rb_tool0 = QRadioButton("Tool 0")
-        self._rb_tool0.setChecked(True)
-        hlayout.addWidget(self._rb_tool0)
-        but_grp.addButton(self._rb_tool0)
-        self._rb_tool1 = QRadioButton("Tool 1")
-        hlayout.addWidget(self._rb_tool1)
-        but_grp.addButton(self._rb_tool1)
+        self._tool_layout = QHBoxLayout()
+        self._tool_layout.setContentsMargins(0, 0, 0, 0)
+        hlayout.addLayout(self._tool_layout)
         # amount
         hlayout.addSpacing(1)
         self._b_dec_amount = QPushButton("-")
@@ -145,40 +90,112 @@ class ToolWidget(QWidget):
         lay.addWidget(self._b_reset_rate)
         # fill
         layout.addStretch(1)
+        # heaters already known?
+        heaters = self._model.get_heaters()
+        if heaters:
+            self._setup_heaters(heaters)
 
     def configure(self, cfg):
         """Configure widget from config."""
-        temp_map = {
-            't0_temp1': ('_t0_temps', 0, '_t0_set1'),
-            't0_temp2': ('_t0_temps', 1, '_t0_set2'),
-            't1_temp1': ('_t1_temps', 0, '_t1_set1'),
-            't1_temp2': ('_t1_temps', 1, '_t1_set2'),
-            'bed_temp1': ('_bd_temps', 0, '_bd_set1'),
-            'bed_temp2': ('_bd_temps', 1, '_bd_set2')
-        }
-        for key in temp_map:
-            if key in cfg:
-                var, idx, widget = temp_map[key]
-                array = getattr(self, var)
-                temp = cfg[key]
-                array[idx] = int(temp)
-                getattr(self, widget).setText(str(temp))
+        # keys: <prefix>_temp<n> with prefix tN, bed, chamber, ...
+        for key in cfg:
+            prefix, _, num = key.rpartition('_temp')
+            if prefix and num in ('1', '2'):
+                temps = self._temps.setdefault(
+                    prefix, list(self._default_temps(prefix)))
+                temps[int(num) - 1] = int(cfg[key])
+        if self._heaters:
+            self._setup_heaters(self._heaters)
+
+    def _cfg_prefix(self, heater):
+        tool_no = heater_tool_no(heater)
+        if tool_no is not None:
+            return "t%d" % tool_no
+        return heater
+
+    def _default_temps(self, prefix):
+        if prefix == "bed":
+            return self.default_bed_temps
+        elif prefix.startswith("t"):
+            return self.default_tool_temps
+        return self.default_other_temps
+
+    def _heater_label(self, heater):
+        tool_no = heater_tool_no(heater)
+        if tool_no is not None:
+            return "Tool%d" % tool_no
+        return heater.capitalize()
+
+    @pyqtSlot(object)
+    def on_update_heaters(self, heaters):
+        """Rebuild heater rows and tool selection for given heaters."""
+        self._setup_heaters(heaters)
+
+    def _setup_heaters(self, heaters):
+        self._heaters = heaters
+        self._clear_layout(self._grid)
+        self._clear_layout(self._tool_layout)
+        self._rows = []
+        for row, heater in enumerate(heaters):
+            prefix = self._cfg_prefix(heater)
+            temps = self._temps.get(prefix, self._default_temps(prefix))
+            temp = QLabel("000")
+            target = QLabel("000")
+            off = QPushButton("Off")
+            off.clicked.connect(
+                lambda _, h=heater: self._set_target(h, 0))
+            set1 = QPushButton(str(temps[0]))
+            set1.clicked.connect(
+                lambda _, h=heater, t=temps[0]: self._set_target(h, t))
+            set2 = QPushButton(str(temps[1]))
+            set2.clicked.connect(
+                lambda _, h=heater, t=temps[1]: self._set_target(h, t))
+            widgets = (QLabel(self._heater_label(heater)), temp, off,
+                       set1, set2, target)
+            for col, widget in enumerate(widgets):
+                self._grid.addWidget(widget, row, col)
+            self._rows.append((temp, target))
+        # tool selection
+        first = True
+        for heater in heaters:
+            tool_no = heater_tool_no(heater)
+            if tool_no is None:
+                continue
+            rb = QRadioButton("Tool %d" % tool_no)
+            rb.setChecked(first)
+            first = False
+            self._tool_layout.addWidget(rb)
+            self._but_grp.addButton(rb, tool_no)
+
+    def _clear_layout(self, layout):
+        while layout.count():
+            item = layout.takeAt(0)
+            widget = item.widget()
+            if widget:
+                if isinstance(widget, QRadioButton):
+                    self._but_grp.removeButton(widget)
+                widget.deleteLater()
 
     def on_update_temps(self, data):
-        self._t0_temp.setText(str(data.tool0[0]))
-        self._t1_temp.setText(str(data.tool1[0]))
-        self._bd_temp.setText(str(data.bed[0]))
-        self._t0_target.setText(str(data.tool0[1]))
-        self._t1_target.setText(str(data.tool1[1]))
-        self._bd_target.setText(str(data.bed[1]))
-
-    def _set_tool(self, num, temp):
-        logging.info("set tool target: %d: %d", num, temp)
-        self._client.tool_target(num, temp)
-
-    def _set_bed(self, temp):
-        logging.info("set bed target: %d", temp)
-        self._client.bed_target(temp)
+        """Show actual and target temps of all heaters."""
+        if data.heaters is not self._heaters:
+            return
+        values = data.values
+        for idx, (temp, target) in enumerate(self._rows):
+            temp.setText(str(values[idx * 2]))
+            target.setText(str(values[idx * 2 + 1]))
+
+    def _set_target(self, heater, temp):
+        logging.info("set target: %s: %d", heater, temp)
+        tool_no = heater_tool_no(heater)
+        if tool_no is not None:
+            self._client.tool_target(tool_no, temp)
+        elif heater == "bed":
+            self._client.bed_target(temp)
+        elif heater == "chamber":
+            self._client.chamber_target(temp)
+        else:
+            logging.error("can't set target of heater: %s", heater)
 
     def _setup_flow_rate_slider(self):
         slider = QSlider(Qt.Horizontal)
@@ -214,7 +231,8 @@ class ToolWidget(QWidget):
             self._t_amount.setText(str(val))
 
     def _get_tool(self):
-        return 0 if self._rb_tool0.isChecked() else 1
+        tool_no = self._but_grp.checkedId()
+        return tool_no if tool_no >= 0 else 0
 
     def _get_amount(self):
         try:
@@ -1,5 +1,8 @@
 """Some helper functions."""
 
+import os
+import tempfile
+
 
 def ts_to_hms(t):
     """Convert timestamp in seconds to (hours, minutes, seconds)."""
@@ -10,3 +13,20 @@ def ts_to_hms(t):
     minutes -= hours * 60
     hours = hours % 24
     return hours, minutes, seconds
+
+
+def atomic_write(file_name, data):
+    """Write bytes to a file so readers see either old or new contents."""
+    dir_name = os.path.dirname(file_name) or "."
+    os.makedirs(dir_name, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=dir_name, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fobj:
+            fobj.write(data)
+            fobj.flush()
+            os.fsync(fobj.fileno())
+        os.replace(tmp_name, file_name)
+    except OSError:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise